@@ -0,0 +1,222 @@
+"""
+Background media analysis.
+
+Uploads are queued on ``AnalysisPipeline``; a bounded process pool runs every
+registered analyzer for the file's type and hands the result to a callback
+that stores it. Request threads only enqueue - they never wait on analysis.
+
+Analyzers are local stand-ins for the AWS services the UI shows
+(Rekognition labels, Transcribe text, Comprehend sentiment). Register more
+with ``@analyzer("name", kinds...)``; each gets ``(path, ext, meta)`` and
+returns a JSON-serialisable value stored under ``name``.
+"""
+
+import os
+import re
+import struct
+import threading
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+IMAGE_EXT = {"jpg", "jpeg", "png", "gif"}
+VIDEO_EXT = {"mp4"}
+AUDIO_EXT = {"mp3", "wav"}
+
+ANALYZERS = []  # (name, kinds, fn) - run in registration order
+
+
+def analyzer(name, *kinds):
+    def register(fn):
+        ANALYZERS.append((name, set(kinds), fn))
+        return fn
+
+    return register
+
+
+def kind_of(ext):
+    if ext in IMAGE_EXT:
+        return "image"
+    if ext in VIDEO_EXT:
+        return "video"
+    if ext in AUDIO_EXT:
+        return "audio"
+    return "other"
+
+
+# ===================== ANALYZERS =====================
+def image_size(path):
+    """Read (width, height) from a PNG/GIF/JPEG header without decoding the image."""
+    with open(path, "rb") as f:
+        head = f.read(26)
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                length = struct.unpack(">H", f.read(2))[0]
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack(">xHH", f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    return None
+
+
+@analyzer("rekognition", "image", "video")
+def detect_labels(path, ext, meta):
+    kind = kind_of(ext)
+    labels = [{"Name": kind.capitalize(), "Confidence": 99.0}]
+
+    size = image_size(path) if kind == "image" else None
+    if size:
+        width, height = size
+        if width > height:
+            labels.append({"Name": "Landscape", "Confidence": 90.0})
+        elif height > width:
+            labels.append({"Name": "Portrait", "Confidence": 90.0})
+        else:
+            labels.append({"Name": "Square", "Confidence": 90.0})
+        if max(width, height) >= 1920:
+            labels.append({"Name": "High Resolution", "Confidence": 95.0})
+
+    return {"labels": labels, "width": size[0] if size else None, "height": size[1] if size else None}
+
+
+@analyzer("transcribe", "audio", "video")
+def transcribe(path, ext, meta):
+    if ext == "wav":
+        with wave.open(path, "rb") as w:
+            seconds = w.getnframes() / float(w.getframerate() or 1)
+        return f"[{seconds:.1f}s of audio - speech recognition runs in AWS mode]"
+    return "[speech recognition runs in AWS mode]"
+
+
+POSITIVE_WORDS = {"happy", "fun", "love", "best", "great", "good", "party", "holiday", "vacation", "wedding", "birthday", "win"}
+NEGATIVE_WORDS = {"sad", "bad", "accident", "broken", "fail", "failed", "angry", "worst", "lost", "damage"}
+
+
+@analyzer("comprehend", "image", "video", "audio")
+def detect_sentiment(path, ext, meta):
+    words = re.findall(r"[a-z]+", " ".join([meta.get("filename", "")] + meta.get("tags", [])).lower())
+    score = sum(w in POSITIVE_WORDS for w in words) - sum(w in NEGATIVE_WORDS for w in words)
+    sentiment = "POSITIVE" if score > 0 else "NEGATIVE" if score < 0 else "NEUTRAL"
+    return {"sentiment": sentiment, "key_phrases": meta.get("tags", [])}
+
+
+def run_analyzers(path, ext, meta):
+    """Worker-process entry point."""
+    kind = kind_of(ext)
+    return {name: fn(path, ext, meta) for name, kinds, fn in ANALYZERS if kind in kinds}
+
+
+# ===================== PIPELINE =====================
+class AnalysisPipeline:
+    """
+    At most ``workers * 2`` jobs are handed to the process pool at a time;
+    the rest wait in a local backlog, so the pool's own queue stays bounded
+    and ``submit`` never blocks. ``on_done(media_id, result, error)`` is
+    called from the pool's callback thread when a job finishes - or from the
+    submitting thread with the exception if the job can't be handed to the
+    pool at all. When a worker process dies the pool breaks: it is replaced,
+    and every job it failed gets one more try on the new pool before it is
+    reported failed. Results are not kept here; ``on_done`` stores them.
+    """
+
+    def __init__(self, workers, on_done):
+        self.workers = max(1, workers)
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+        self._backlog = deque()  # (media_id, path, ext, meta, attempt)
+        self._in_flight = 0
+
+    def submit(self, media_id, path, ext, meta):
+        with self._lock:
+            self._backlog.append((media_id, path, ext, meta, 0))
+            started, failed = self._fill()
+        self._report(failed)
+        self._watch(started)
+
+    def pending(self):
+        with self._lock:
+            return len(self._backlog) + self._in_flight
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _fill(self):
+        # caller holds self._lock; returns the jobs it started and those it couldn't
+        started = []
+        failed = []
+        while self._backlog and self._in_flight < self.workers * 2 and not self._closed:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            job = self._backlog.popleft()
+            media_id, path, ext, meta, attempt = job
+            pool = self._pool
+            try:
+                future = pool.submit(run_analyzers, path, ext, meta)
+            except Exception as e:
+                if not isinstance(e, BrokenProcessPool):
+                    failed.append((media_id, e))
+                elif self._broken(pool, job):
+                    failed.append((media_id, e))
+                continue
+            started.append((job, future, pool))
+            self._in_flight += 1
+        return started, failed
+
+    def _broken(self, pool, job):
+        """
+        A worker process died. Caller holds self._lock: replace the pool (once
+        per broken pool) and give ``job`` one more try on the new one. Returns
+        True if the job already had its retry and has failed for good.
+        """
+        if self._pool is pool:
+            pool.shutdown(wait=False)
+            self._pool = None
+        media_id, path, ext, meta, attempt = job
+        if attempt > 0:
+            return True
+        self._backlog.appendleft((media_id, path, ext, meta, attempt + 1))
+        return False
+
+    def _report(self, failed):
+        # outside the lock, like on_done for finished jobs
+        for media_id, error in failed:
+            self.on_done(media_id, None, error)
+
+    def _watch(self, started):
+        # outside the lock: add_done_callback runs inline if the job already finished
+        for job, future, pool in started:
+            future.add_done_callback(lambda f, job=job, pool=pool: self._finished(job, f, pool))
+
+    def _finished(self, job, future, pool):
+        error = None
+        result = None
+        try:
+            result = future.result()
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            self._in_flight -= 1
+            # jobs in flight when a worker died fail with it - including innocent ones, so retry
+            retried = isinstance(error, BrokenProcessPool) and not self._closed and not self._broken(pool, job)
+            started, failed = self._fill()
+
+        if not retried:
+            self.on_done(job[0], result, error)
+        self._report(failed)
+        self._watch(started)
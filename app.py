@@ -1,29 +1,302 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Blueprint, Flask, current_app, g, render_template, request, redirect, url_for, session, jsonify, send_file
+import click
+import functools
+import hashlib
+import mimetypes
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 from werkzeug.utils import secure_filename
 
-app = Flask(__name__, template_folder="templates", static_folder="static")
-app.secret_key = "snapstream_secret_key_here"
-
-# Session cookie fixes
-app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
-app.config["SESSION_COOKIE_SECURE"] = False
+from analysis import AnalysisPipeline
+from assets import MIMETYPES as ASSET_MIMETYPES, Assets
+from blob_store import BlobStore
+from derivatives import SIZES as THUMBNAIL_SIZES, DerivativeCache, can_render
+from chunked_upload import ChunkedUploads, StreamingRequest, UploadError
+from metrics import Metrics, SlowRequestProfiler, timed_calls
+from notify_hub import NotificationHub, stream as sse_stream
+from object_store import open_objects
+from reclaim import Reclaimer
+from search_index import TYPE_GROUPS, SearchIndex
+from sessions import ServerSessionInterface
+from storage import CachedUserStore, create_storage
 
 # ===================== CONFIG =====================
 UPLOAD_FOLDER = "static/uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024  # 100MB
+INCOMING_FOLDER = os.path.join(UPLOAD_FOLDER, ".incoming")
+DERIVATIVE_FOLDER = "cache/derivatives"  # thumbnails / posters, served via /api/media/<id>/thumbnail
+OBJECT_CACHE_FOLDER = "cache/objects"  # local copies of S3 blobs for analysis / thumbnails
+PROFILE_OUTPUT = "cache/profiles/slow-requests.folded"  # folded stacks of slow requests (see metrics.py)
+ASSET_FOLDER = "static/dist"  # minified, fingerprinted, precompressed CSS / JS (see assets.py)
+StreamingRequest.incoming_dir = INCOMING_FOLDER
 
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "mp4", "mp3", "wav"}
 
-# ===================== IN-MEMORY DATABASE =====================
-users = {}  # email -> {username,email,password}
-media_files = []  # list of dict
-notifications = []  # list of dict
+bp = Blueprint("snapstream", __name__, cli_group=None)
+
+# ===================== DATABASE =====================
+# Set up by create_app() - one app per process
+storage = None
+users = None  # email -> {username,email,password}
+media_store = None  # id -> media dict, indexed per owner
+search_index = None  # tags / filename tokens -> media, per owner, in this worker
+notification_store = None  # capped per-user inboxes
+versions = None  # per-user change counters behind the read APIs' ETags
+notify_hub = None  # live pushes to this worker's SSE streams
+blob_store = None  # content-addressed, one copy per digest (local disk or S3)
+derivative_cache = None
+chunked_uploads = None
+analysis_pipeline = None
+reclaimer = None  # removes deleted accounts' data in the background
+event_sink = None  # event_sink(subject, message): operator alerts, e.g. SNS in AWS mode
+metrics = None  # request / backend timings for /metrics, None when METRICS_ENABLED is off
+profiler = None  # samples slow requests' stacks when PROFILE_SLOW_MS is set
+assets = None  # built CSS / JS, served from /assets/<hashed name>
+
+
+# ===================== APP FACTORY =====================
+def create_app(config=None, on_event=None, aws=None, metrics_sources=None):
+    """
+    Build the app on the storage backend named by ``STORAGE_URL``.
+    app.py (local) and app_aws.py (DynamoDB + SNS) both serve these routes;
+    ``config`` overrides the defaults below, ``aws`` is the shared AWSClients,
+    ``metrics_sources`` maps names to extra ``stats()`` callables for /metrics.
+    """
+    global storage, users, media_store, search_index, notification_store, notify_hub, versions
+    global blob_store, derivative_cache, chunked_uploads, analysis_pipeline, reclaimer, event_sink
+    global metrics, profiler, assets
+
+    app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.request_class = StreamingRequest
+    app.secret_key = "snapstream_secret_key_here"
+
+    # Session cookie fixes
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
+    app.config["SESSION_COOKIE_SECURE"] = False
+
+    # Server-side sessions (see sessions.py), kept in STORAGE_URL's backend: seconds a login
+    # stays valid without being used, and how many sessions memory:// holds (LRU)
+    app.config["SESSION_TTL"] = 7 * 24 * 3600
+    app.config["SESSION_MAX_ENTRIES"] = 100000
+    # Seconds a worker trusts its copy of a user's session generation: "log out everywhere"
+    # applies at once on the worker that handled it, on the others within this long
+    app.config["SESSION_GENERATION_TTL"] = 5
+
+    app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+    app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024  # 100MB (single request)
+    app.config["MAX_UPLOAD_SIZE"] = 100 * 1024 * 1024  # 100MB (whole chunked upload)
+    app.config["UPLOAD_CHUNK_SIZE"] = 5 * 1024 * 1024  # 5MB per PUT
+    app.config["DIRECT_UPLOAD_WINDOW"] = 3600  # seconds from presign to /api/upload/direct/complete
+    app.config["DERIVATIVE_CACHE_BYTES"] = 512 * 1024 * 1024  # 512MB, LRU evicted
+
+    # Behind Nginx: hand /api/media/<id>/content off with X-Accel-Redirect to an internal
+    # location aliased to UPLOAD_FOLDER (e.g. "/protected-uploads/"). None = Flask sends the file.
+    app.config["MEDIA_X_ACCEL_PREFIX"] = None
+
+    # Where blob bodies live: "" = UPLOAD_FOLDER on this disk, or
+    # "s3://bucket/prefix?endpoint_url=http://localhost:9000" (see object_store.py).
+    # With S3, content is served via presigned URLs and browsers can upload straight
+    # to the bucket (/api/upload/presign), which needs a CORS rule allowing PUT.
+    app.config["OBJECT_STORAGE_URL"] = os.environ.get("SNAPSTREAM_OBJECTS", "")
+    app.config["OBJECT_CACHE_BYTES"] = 1024 * 1024 * 1024  # 1GB of local S3 copies, LRU evicted
+
+    # Search index (per worker): owners kept in memory. With sqlite / dynamodb an owner's
+    # index is reloaded when their media version shows another worker's write.
+    app.config["SEARCH_INDEX_OWNERS"] = 1000
+
+    # Largest page a list API returns (?limit=...&cursor=...)
+    app.config["PAGE_SIZE_MAX"] = 100
+
+    # Most ids one /api/media/bulk/* request may name
+    app.config["BULK_MAX_ITEMS"] = 500
+
+    # Deleted accounts: media removed per batch, pause between batches, and how often
+    # each worker looks for unfinished jobs (e.g. left over from a restart)
+    app.config["RECLAIM_BATCH"] = 100
+    app.config["RECLAIM_PAUSE"] = 0.05
+    app.config["RECLAIM_POLL_SECONDS"] = 30
+
+    # Media analysis worker processes (default: one per core)
+    app.config["ANALYSIS_WORKERS"] = int(os.environ.get("SNAPSTREAM_ANALYSIS_WORKERS", os.cpu_count() or 1))
+
+    # Notifications kept per user (oldest dropped first)
+    app.config["NOTIFICATION_RETENTION"] = 500
+
+    # Server-Sent Events: events buffered per open stream before it must resync, and the
+    # keep-alive interval, which is also how often a stream checks the store for notifications
+    # raised on other workers
+    app.config["SSE_BUFFER_SIZE"] = 100
+    app.config["SSE_HEARTBEAT_SECONDS"] = 15
+
+    # Recompute dashboard counters on every stats call and compare (tests / debugging only)
+    app.config["STATS_CONSISTENCY_CHECK"] = os.environ.get("SNAPSTREAM_STATS_CHECK") == "1"
+
+    # "memory://" (single process), "sqlite:///path/to/snapstream.db" (shared by all Gunicorn
+    # workers) or "dynamodb://us-east-1" - see storage/__init__.py
+    app.config["STORAGE_URL"] = os.environ.get("SNAPSTREAM_STORAGE", "memory://")
+
+    # Per-worker user lookup cache for the sqlite / dynamodb backends. TTL bounds how long
+    # another worker can still see an old password or username; 0 disables the cache.
+    app.config["USER_CACHE_SIZE"] = 10000
+    app.config["USER_CACHE_TTL"] = 30
+    app.config["USER_CACHE_NEGATIVE_TTL"] = 5
+
+    # Mixed into every API ETag: change it when a read API's response format changes,
+    # so clients drop what they cached from the old version
+    app.config["ETAG_SALT"] = ""
+
+    # Prometheus metrics at /metrics (per worker). With a token set, scrapers must send
+    # "Authorization: Bearer <token>"; without one keep /metrics off the public proxy.
+    app.config["METRICS_ENABLED"] = os.environ.get("SNAPSTREAM_METRICS", "1") == "1"
+    app.config["METRICS_TOKEN"] = os.environ.get("SNAPSTREAM_METRICS_TOKEN")
+
+    # Sampling profiler: requests slower than this many ms get their stacks appended to
+    # PROFILE_OUTPUT as folded stacks (flamegraph.pl / speedscope). 0 = off.
+    app.config["PROFILE_SLOW_MS"] = float(os.environ.get("SNAPSTREAM_PROFILE_SLOW_MS", 0))
+    app.config["PROFILE_INTERVAL_MS"] = 5
+
+    # Build the CSS / JS bundles when a worker starts (otherwise on the first page render).
+    # In debug mode changed sources are rebuilt on the next page load.
+    app.config["ASSETS_BUILD_ON_STARTUP"] = True
+    app.config["ASSET_MAX_AGE"] = 365 * 24 * 3600  # hashed names never change content
+
+    app.config.update(config or {})
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+    assets = Assets(app.static_folder, ASSET_FOLDER)
+    if app.config["ASSETS_BUILD_ON_STARTUP"]:
+        assets.build()
+
+    metrics = Metrics() if app.config["METRICS_ENABLED"] else None
+    profiler = None
+    if app.config["PROFILE_SLOW_MS"]:
+        profiler = SlowRequestProfiler(
+            app.config["PROFILE_SLOW_MS"], PROFILE_OUTPUT, app.config["PROFILE_INTERVAL_MS"]
+        )
+
+    storage = create_storage(
+        app.config["STORAGE_URL"], app.config["NOTIFICATION_RETENTION"], aws, app.config["SESSION_MAX_ENTRIES"]
+    )
+    notification_writer_stats = getattr(storage.notifications, "stats", None)  # SQLite's batching writer
+    if metrics is not None:
+        backend = app.config["STORAGE_URL"].split(":", 1)[0]
+        storage = storage._make(timed_calls(store, metrics, backend, kind) for kind, store in zip(storage._fields, storage))
+    users = storage.users
+    if app.config["USER_CACHE_TTL"] and not app.config["STORAGE_URL"].startswith("memory://"):
+        users = CachedUserStore(
+            users, app.config["USER_CACHE_SIZE"], app.config["USER_CACHE_TTL"], app.config["USER_CACHE_NEGATIVE_TTL"]
+        )
+    media_store = storage.media
+    media_store.check_counters = app.config["STATS_CONSISTENCY_CHECK"]
+    notification_store = storage.notifications
+    versions = storage.versions
+    shared = not app.config["STORAGE_URL"].startswith("memory://")
+    search_index = SearchIndex(
+        media_store,
+        (lambda email: versions.get(email).get("media", 0)) if shared else None,
+        (lambda email, wanted: versions.changes(email, "media", wanted)) if shared else None,
+        app.config["SEARCH_INDEX_OWNERS"],
+    )
+    app.session_interface = ServerSessionInterface(
+        storage.sessions,
+        session_generation,
+        app.config["SESSION_TTL"],
+        skip_paths=(app.static_url_path + "/", "/assets/"),  # no store lookup per CSS / JS / image
+        generation_ttl=app.config["SESSION_GENERATION_TTL"],
+    )
+    notify_hub = NotificationHub(app.config["SSE_BUFFER_SIZE"])
+    objects = open_objects(
+        app.config["OBJECT_STORAGE_URL"], UPLOAD_FOLDER, OBJECT_CACHE_FOLDER, app.config["OBJECT_CACHE_BYTES"], aws
+    )
+    if metrics is not None:
+        objects = timed_calls(objects, metrics, "s3" if objects.remote else "filesystem", "objects")
+    blob_store = BlobStore(objects, storage.blob_refs)
+    derivative_cache = DerivativeCache(DERIVATIVE_FOLDER, app.config["DERIVATIVE_CACHE_BYTES"])
+    chunked_uploads = ChunkedUploads(
+        INCOMING_FOLDER, app.config["UPLOAD_CHUNK_SIZE"], app.config["MAX_UPLOAD_SIZE"]
+    )
+    analysis_pipeline = AnalysisPipeline(app.config["ANALYSIS_WORKERS"], analysis_done)
+    if reclaimer is not None:
+        reclaimer.close()
+    reclaimer = Reclaimer(
+        storage.reclaim_jobs,
+        reclaim_media_batch,
+        finish_reclaim,
+        batch_size=app.config["RECLAIM_BATCH"],
+        pause=app.config["RECLAIM_PAUSE"],
+        poll_seconds=app.config["RECLAIM_POLL_SECONDS"],
+    )
+    reclaimer.start()
+    event_sink = on_event
+
+    if metrics is not None:
+        sources = {
+            "search_index": search_index.stats,
+            "reclaim": reclaimer.stats,
+            "sessions": app.session_interface.stats,
+        }
+        if isinstance(users, CachedUserStore):
+            sources["user_cache"] = users.stats
+        if notification_writer_stats is not None:
+            sources["notification_writer"] = notification_writer_stats
+        if aws is not None:
+            sources["aws"] = aws.stats
+        if profiler is not None:
+            sources["profiler"] = profiler.stats
+        sources.update(metrics_sources or {})
+        for name, stats_fn in sources.items():
+            metrics.add_collector(name, stats_fn)
+
+    app.register_blueprint(bp)
+    return app
+
+
+# ===================== CLI =====================
+@bp.cli.command("build-assets")
+@click.option("--prune", is_flag=True, help="Also delete built files from earlier builds.")
+def build_assets_command(prune):
+    """Bundle, minify and precompress the CSS / JS into static/dist."""
+    for name, filename in sorted(assets.build().items()):
+        print(f"{name} -> {filename}")
+    if prune:
+        print(f"Removed {assets.prune()} old file(s)")
+
+
+@bp.cli.command("create-tables")
+def create_tables_command():
+    """Create any missing DynamoDB table for STORAGE_URL (AWS or a local stand-in)."""
+    url = current_app.config["STORAGE_URL"]
+    if not url.startswith("dynamodb://"):
+        print(f"{url}: nothing to do, tables are created on startup")
+        return
+
+    from storage import dynamodb
+
+    resource, prefix, _ = dynamodb.from_url(url)
+    created = dynamodb.ensure_tables(resource, prefix)
+    print("Created: " + ", ".join(created) if created else "All tables exist")
+
+
+@bp.cli.command("reclaim")
+@click.option("--run", is_flag=True, help="Process the pending jobs now instead of only listing them.")
+def reclaim_command(run):
+    """List deleted accounts whose data is still being removed."""
+    pending = reclaimer.jobs.pending()
+    for email in pending:
+        job = reclaimer.status(email) or {}
+        print(f"{email}: {job.get('state')}, {job.get('media_reclaimed', 0)} media removed in {job.get('batches', 0)} batches")
+    if not pending:
+        print("No pending account deletions")
+    elif run:
+        # in the foreground, instead of this process's background thread
+        reclaimer.close()
+        runner = Reclaimer(
+            reclaimer.jobs, reclaim_media_batch, finish_reclaim, batch_size=reclaimer.batch_size, pause=reclaimer.pause
+        )
+        print(f"Finished {runner.run_pending()} of {len(pending)}")
 
 
 # ===================== HELPERS =====================
@@ -39,90 +312,390 @@ def require_login():
     return "user_email" in session
 
 
+def session_generation(email):
+    return versions.get(email).get("sessions", 0)
+
+
+def end_sessions(email):
+    """Log ``email`` out on every device: their sessions are dropped when next used."""
+    versions.bump(email, "sessions")
+    current_app.session_interface.forget(email)
+
+
+def media_changed(email, media_ids):
+    """
+    Bump ``email``'s media version (ETags, other workers' search indexes),
+    recording the ids of the media the write touched; ours keeps up.
+    """
+    search_index.seen(email, versions.bump(email, "media", media_ids))
+
+
 def add_notification(email, title, message):
-    notifications.insert(
-        0,
-        {
-            "id": str(uuid.uuid4()),
-            "email": email,
-            "title": title,
-            "message": message,
-            "status": "Unread",
-            "time": now(),
-        },
-    )
+    note = {
+        "id": str(uuid.uuid4()),
+        "email": email,
+        "title": title,
+        "message": message,
+        "status": "Unread",
+        "time": now(),
+    }
+    def stored(seq):
+        # published once stored, so the event id is the note's sequence number
+        versions.bump(email, "notifications")
+        notify_hub.publish(email, seq, note)
 
+    notification_store.add(note, stored)
 
-# ===================== IMPORTANT FIX (CLEAR OLD LOGIN ON SERVER RESTART) =====================
-@app.before_request
-def clear_old_session_once():
-    # Server restart ke baad browser me purana session cookie bacha rehta hai
-    # Ye code 1 baar session clear karega, taaki home open par login na dikhe
-    if session.get("fresh_start") != True:
-        session.clear()
-        session["fresh_start"] = True
+
+def send_event(subject, message):
+    if event_sink is not None:
+        event_sink(subject, message)
+
+
+def count_error(source):
+    if metrics is not None:
+        metrics.incr("snapstream_background_errors_total", source=source)
+
+
+def parse_tags(tags):
+    return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
+
+def store_upload(email, filename, src_path, tags, digest=None):
+    """
+    Hand a fully received file (spooled multipart field or assembled chunks)
+    to the blob store and create its media record. New content is renamed
+    into place (or uploaded to S3), duplicate content is dropped and shares
+    the existing blob.
+    """
+    ext = filename.rsplit(".", 1)[1].lower()
+    size = os.path.getsize(src_path)
+
+    stored_name, _ = blob_store.put_file(src_path, ext, digest)
+    return add_media(email, filename, stored_name, size, tags)
+
+
+def add_media(email, filename, stored_name, size, tags):
+    """Create the media record for a stored blob and start analysis / thumbnails."""
+    ext = filename.rsplit(".", 1)[1].lower()
+    media_id = str(uuid.uuid4())
+
+    media_obj = {
+        "id": media_id,
+        "email": email,
+        "filename": filename,
+        "stored_name": stored_name,
+        "type": ext,
+        "size_kb": round(size / 1024, 2),
+        "uploaded_at": now(),
+        "status": "Processing",
+        "tags": tags,
+    }
+
+    media_store.add(media_obj)
+    search_index.add(media_obj)
+    media_changed(email, [media_id])
+    if metrics is not None:
+        metrics.incr("snapstream_upload_bytes_total", size)
+    add_notification(email, "Upload Completed", f"{filename} uploaded successfully!")
+
+    def process(path):
+        analysis_pipeline.submit(media_id, path, ext, {"filename": filename, "tags": tags})
+        derivative_cache.generate(media_id, path, ext)
+
+    with_local_copy(stored_name, process, on_error=lambda e: analysis_done(media_id, None, e))
+    return media_obj
+
+
+def remove_media(media_ids):
+    """
+    Delete media records and everything hanging off them - index entries,
+    analysis results, thumbnails and blob references - with one backend
+    call per kind where the backend allows it. Returns the deleted records.
+    """
+    deleted = media_store.delete_many(media_ids)
+    for email in {m["email"] for m in deleted}:
+        media_changed(email, [m["id"] for m in deleted if m["email"] == email])
+    release_media(deleted)
+    return deleted
+
+
+def release_media(deleted):
+    """Everything besides the records themselves, for already deleted media."""
+    search_index.remove_many(deleted)
+    for media in deleted:
+        derivative_cache.drop(media["id"])
+    try:
+        blob_store.release_many([m["stored_name"] for m in deleted])
+    except Exception as e:
+        print("Blob delete error:", e)
+        count_error("blob_delete")
+
+
+def reclaim_media_batch(email, limit):
+    """One batch of a deleted account's media (reclaim.Reclaimer); returns how many were removed."""
+    items, _ = media_store.page(email, limit)
+    remove_media([m["id"] for m in items])
+    return len(items)
+
+
+def finish_reclaim(email):
+    # no media left: drop the owner's counters (and anything a stale session uploaded
+    # since the last batch), notifications and any index entry
+    leftover = media_store.delete_owner(email)
+    release_media(leftover)
+    notification_store.clear(email)
+    search_index.drop_owner(email)
+    media_changed(email, [m["id"] for m in leftover])
+    versions.bump(email, "notifications")
+
+
+def with_local_copy(stored_name, fn, on_error=None):
+    """
+    Call ``fn(path)`` with a local copy of the blob. Local storage: right away.
+    S3: from a background thread once the object is downloaded (or found in
+    the local cache), so requests never wait on S3.
+    """
+    if not blob_store.objects.remote:
+        fn(blob_store.local_path(stored_name))
+        return
+
+    def fetch():
+        try:
+            path = blob_store.local_path(stored_name)
+        except Exception as e:
+            print("Blob download error:", stored_name, e)
+            count_error("blob_download")
+            if on_error is not None:
+                on_error(e)
+            return
+        fn(path)
+
+    threading.Thread(target=fetch, name="blob-fetch", daemon=True).start()
+
+
+def analysis_done(media_id, result, error):
+    # Runs on the analysis pool's callback thread, not a request thread (or the
+    # uploading thread, if the job couldn't be queued). The analysis is saved
+    # before the status flips, so a "Completed" record always has it.
+    if result is not None:
+        media_store.save_analysis(media_id, result)
+    media = media_store.set_status(media_id, "Failed" if error else "Completed")
+    if media is None:
+        return  # deleted while it was being analysed
+    media_changed(media["email"], [media_id])
+    if error:
+        add_notification(media["email"], "Processing Failed", f"Analysis of {media['filename']} failed.")
+    else:
+        add_notification(media["email"], "Analysis Complete", f"{media['filename']} has been analyzed.")
+
+
+def version_etag(email, kinds):
+    """
+    Weak ETag for this request's response given the user's current
+    ``kinds`` versions. The URL (query included), user and salt are hashed
+    in, so one tag never validates another page's or another user's data.
+    """
+    current = versions.get(email)
+    stamp = ".".join(f"{kind[0]}{current.get(kind, 0)}" for kind in kinds)
+    key = "|".join([current_app.config["ETAG_SALT"], versions.epoch, email, request.full_path, stamp])
+    return f"{stamp}-{hashlib.sha256(key.encode()).hexdigest()[:16]}"
+
+
+def versioned(*kinds):
+    """
+    Conditional GET for a read API whose response only changes when the
+    user's ``kinds`` data does: If-None-Match with the current ETag gets a
+    304 before the view runs, so nothing is loaded or serialized.
+    """
+
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not require_login():
+                return view(*args, **kwargs)
+
+            # read the versions before the data: a write in between only makes the tag stale
+            etag = version_etag(session["user_email"], kinds)
+            if request.if_none_match.contains_weak(etag):
+                resp = current_app.response_class(status=304)
+            else:
+                resp = current_app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.headers["Cache-Control"] = "private, no-cache"  # always revalidate
+            return resp
+
+        return wrapper
+
+    return decorate
+
+
+def page_args():
+    """
+    Parse ?limit=&cursor=&fields= for list APIs.
+    Returns (limit, cursor, fields) or raises ValueError with a user message.
+    No limit given = full list (old clients). The cursor is opaque here;
+    the store rejects one it didn't issue.
+    """
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    fields = request.args.get("fields")
+
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError("limit must be a positive integer")
+        limit = min(int(limit), current_app.config["PAGE_SIZE_MAX"])
+
+    cursor = cursor or None
+
+    if fields:
+        fields = {f.strip() for f in fields.split(",") if f.strip()} | {"id"}
+
+    return limit, cursor, fields
+
+
+def project(items, fields):
+    if not fields:
+        return items
+    return [{k: v for k, v in item.items() if k in fields} for item in items]
+
+
+# ===================== METRICS =====================
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler is not None:
+        g.profile_token = profiler.begin()
+
+
+@bp.after_app_request
+def record_request(response):
+    # streamed responses (SSE, file bodies) are timed up to their headers
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if metrics is not None:
+        metrics.observe_request(request.method, route, response.status_code, elapsed, request.content_length or 0)
+    if profiler is not None and "profile_token" in g:
+        profiler.end(g.pop("profile_token"), f"{request.method} {route}", elapsed)
+    return response
+
+
+@bp.teardown_app_request
+def stop_request_profile(error=None):
+    # after_request didn't run (the response couldn't be built): just stop sampling
+    if profiler is not None and "profile_token" in g:
+        profiler.end(g.pop("profile_token"), "", 0)
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if metrics is None:
+        return jsonify({"success": False, "message": "Metrics disabled"}), 404
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    return current_app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ===================== STATIC ASSETS =====================
+@bp.app_context_processor
+def asset_helpers():
+    return {"asset_url": asset_url}
+
+
+def asset_url(name):
+    """URL of the built, fingerprinted version of ``name`` (e.g. "js/core.js")."""
+    return url_for(".asset", filename=assets.url_path(name, watch=current_app.debug))
+
+
+@bp.route("/assets/<path:filename>", methods=["GET"])
+def asset(filename):
+    found = assets.variant(filename, lambda coding: request.accept_encodings[coding])
+    if found is None:
+        return jsonify({"success": False, "message": "Not found"}), 404
+    path, encoding = found
+
+    resp = send_file(
+        os.path.abspath(path),
+        mimetype=ASSET_MIMETYPES.get(os.path.splitext(filename)[1], "application/octet-stream"),
+        download_name=os.path.basename(filename),
+        conditional=True,
+        max_age=current_app.config["ASSET_MAX_AGE"],
+    )
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
 
 
 # ===================== PAGES ROUTES (HTML) =====================
-@app.route("/")
+@bp.route("/")
 def index():
     return render_template("index.html")
 
 
-@app.route("/login", methods=["GET"])
+@bp.route("/login", methods=["GET"])
 def login_page():
     return render_template("login.html")
 
 
-@app.route("/register", methods=["GET"])
+@bp.route("/register", methods=["GET"])
 def register_page():
     return render_template("register.html")
 
 
-@app.route("/dashboard")
+@bp.route("/dashboard")
 def dashboard():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("dashboard.html")
 
 
-@app.route("/upload")
+@bp.route("/upload")
 def upload():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("upload.html")
 
 
-@app.route("/media")
+@bp.route("/media")
 def media():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("media.html")
 
 
-@app.route("/media_detail")
+@bp.route("/media_detail")
 def media_detail():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("media_detail.html")
 
 
-@app.route("/notifications")
+@bp.route("/notifications")
 def notification_page():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("notifications.html")
 
 
-@app.route("/profile")
+@bp.route("/profile")
 def profile():
     if not require_login():
-        return redirect(url_for("login_page"))
+        return redirect(url_for(".login_page"))
     return render_template("profile.html")
 
 
 # ===================== AUTH APIs =====================
-@app.route("/api/register", methods=["POST"])
+@bp.route("/api/register", methods=["POST"])
 def api_register():
     data = request.get_json(force=True)
     username = data.get("username", "").strip()
@@ -132,50 +705,62 @@ def api_register():
     if not username or not email or not password:
         return jsonify({"success": False, "message": "All fields required"}), 400
 
-    if email in users:
+    if reclaimer.status(email) is not None:
+        return jsonify({"success": False, "message": "This account is still being deleted, try again shortly"}), 409
+
+    if not users.add({"username": username, "email": email, "password": password}):
         return jsonify({"success": False, "message": "Email already exists"}), 409
 
-    users[email] = {"username": username, "email": email, "password": password}
+    # the account was deleted between the check and the insert: its reclamation
+    # would remove this account's data, so back out (delete records the job first)
+    if reclaimer.status(email) is not None:
+        users.delete(email)
+        return jsonify({"success": False, "message": "This account is still being deleted, try again shortly"}), 409
+
     add_notification(email, "Welcome!", "Your SnapStream account created successfully.")
+    send_event("New User Signup", email)
 
     return jsonify({"success": True, "message": "Registered successfully", "redirect": "/login"}), 201
 
 
-@app.route("/api/login", methods=["POST"])
+@bp.route("/api/login", methods=["POST"])
 def api_login():
     data = request.get_json(force=True)
     email = data.get("email", "").strip().lower()
     password = data.get("password", "").strip()
 
-    if email not in users:
+    user = users.get(email, consistent=True)
+    if user is None:
         return jsonify({"success": False, "message": "User not found"}), 404
 
-    if users[email]["password"] != password:
+    if user["password"] != password:
         return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
     session["user_email"] = email
-    session["username"] = users[email]["username"]
+    session["username"] = user["username"]
 
     add_notification(email, "Login Success", "You logged in successfully.")
+    send_event("User Login", email)
 
     return jsonify(
         {
             "success": True,
             "message": "Login success",
             "redirect": "/dashboard",
-            "user": {"email": email, "username": users[email]["username"]},
+            "user": {"email": email, "username": user["username"]},
         }
     ), 200
 
 
-@app.route("/api/logout", methods=["POST"])
+@bp.route("/api/logout", methods=["POST"])
 def api_logout():
+    if require_login():
+        end_sessions(session["user_email"])
     session.clear()
-    session["fresh_start"] = True  # taaki loop na ho
     return jsonify({"success": True, "message": "Logged out", "redirect": "/"}), 200
 
 
-@app.route("/api/me", methods=["GET"])
+@bp.route("/api/me", methods=["GET"])
 def api_me():
     if not require_login():
         return jsonify({"success": False, "message": "Not logged in"}), 401
@@ -183,14 +768,15 @@ def api_me():
     email = session["user_email"]
     username = session.get("username")
 
-    if (not username) and (email in users):
-        username = users[email]["username"]
+    if not username:
+        user = users.get(email)
+        username = user["username"] if user else None
 
     return jsonify({"success": True, "user": {"email": email, "username": username or "User"}}), 200
 
 
 # ===================== PROFILE APIs =====================
-@app.route("/api/profile/update", methods=["POST"])
+@bp.route("/api/profile/update", methods=["POST"])
 def api_profile_update():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
@@ -203,17 +789,16 @@ def api_profile_update():
 
     email = session["user_email"]
 
-    if email not in users:
+    if users.update(email, username=username) is None:
         return jsonify({"success": False, "message": "User not found"}), 404
 
-    users[email]["username"] = username
     session["username"] = username
 
     add_notification(email, "Profile Updated", "Your username updated successfully.")
     return jsonify({"success": True, "message": "Profile updated", "username": username}), 200
 
 
-@app.route("/api/profile/change-password", methods=["POST"])
+@bp.route("/api/profile/change-password", methods=["POST"])
 def api_change_password_local():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
@@ -230,87 +815,83 @@ def api_change_password_local():
 
     email = session["user_email"]
 
-    if email not in users:
+    user = users.get(email, consistent=True)
+    if user is None:
         return jsonify({"success": False, "message": "User not found"}), 404
 
-    if users[email]["password"] != current_password:
+    if user["password"] != current_password:
         return jsonify({"success": False, "message": "Current password is incorrect"}), 401
 
-    users[email]["password"] = new_password
+    users.update(email, password=new_password)
     add_notification(email, "Password Updated", "Your password updated successfully.")
 
     return jsonify({"success": True, "message": "Password updated successfully"}), 200
 
 
-@app.route("/api/profile/delete-account", methods=["POST"])
+@bp.route("/api/profile/delete-account", methods=["POST"])
 def api_delete_account():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
     email = session["user_email"]
 
-    if email not in users:
+    if users.get(email, consistent=True) is None:
         session.clear()
-        session["fresh_start"] = True
         return jsonify({"success": False, "message": "User not found"}), 404
 
-    del users[email]
-
-    global media_files
-    user_media = [m for m in media_files if m["email"] == email]
+    # recorded before the user row goes, so the data is never left without a job
+    # (and api_register can tell the email is still taken)
+    reclaimer.submit(email)
 
-    for m in user_media:
-        try:
-            path = os.path.join(app.config["UPLOAD_FOLDER"], m["stored_name"])
-            if os.path.exists(path):
-                os.remove(path)
-        except:
-            pass
-
-    media_files = [m for m in media_files if m["email"] != email]
+    if not users.delete(email):
+        # a concurrent delete removed the row after our check; this job is its reclamation
+        session.clear()
+        return jsonify({"success": False, "message": "User not found"}), 404
 
-    global notifications
-    notifications = [n for n in notifications if n["email"] != email]
+    # media, blobs, thumbnails and notifications are removed in the background
+    search_index.drop_owner(email)
+    notify_hub.disconnect(email)
 
+    end_sessions(email)
     session.clear()
-    session["fresh_start"] = True
 
     return jsonify({"success": True, "message": "Account deleted successfully", "redirect": "/"}), 200
 
 
 # ===================== DASHBOARD APIs =====================
-@app.route("/api/dashboard/stats", methods=["GET"])
+@bp.route("/api/dashboard/stats", methods=["GET"])
+@versioned("media")
 def dashboard_stats():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
-    email = session["user_email"]
-    user_media = [m for m in media_files if m["email"] == email]
-
-    total = len(user_media)
-    processing = len([m for m in user_media if m["status"] == "Processing"])
-    completed = len([m for m in user_media if m["status"] == "Completed"])
-    failed = len([m for m in user_media if m["status"] == "Failed"])
+    stats = media_store.stats(session["user_email"])
 
     return jsonify(
-        {"success": True, "total_uploads": total, "processing": processing, "completed": completed, "failed": failed}
+        {
+            "success": True,
+            "total_uploads": stats["total"],
+            "processing": stats["Processing"],
+            "completed": stats["Completed"],
+            "failed": stats["Failed"],
+        }
     ), 200
 
 
-@app.route("/api/dashboard/activity", methods=["GET"])
+@bp.route("/api/dashboard/activity", methods=["GET"])
+@versioned("media")
 def dashboard_activity():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
     email = session["user_email"]
-    user_media = [m for m in media_files if m["email"] == email]
-    user_media.sort(key=lambda x: x["uploaded_at"], reverse=True)
+    user_media = media_store.list_owner(email, limit=10)
 
-    return jsonify({"success": True, "activity": user_media[:10]}), 200
+    return jsonify({"success": True, "activity": user_media}), 200
 
 
 # ===================== MEDIA APIs =====================
-@app.route("/api/upload", methods=["POST"])
+@bp.route("/api/upload", methods=["POST"])
 def api_upload():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
@@ -331,166 +912,663 @@ def api_upload():
         return jsonify({"success": False, "message": "File type not supported"}), 400
 
     filename = secure_filename(file.filename)
-    ext = filename.rsplit(".", 1)[1].lower()
 
-    media_id = str(uuid.uuid4())
-    stored_name = f"{media_id}_{filename}"
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], stored_name)
+    copy_path = None
+    try:
+        spool_path = getattr(file.stream, "name", None)
+        hasher = getattr(file.stream, "hasher", None)
+        if not isinstance(spool_path, str):
+            # Not spooled to disk (custom request class off) - fall back to a copy
+            spool_path = copy_path = os.path.join(INCOMING_FOLDER, f"{uuid.uuid4().hex}.spool")
+            file.save(spool_path)
+            hasher = None
+        file.stream.flush()
+        digest = hasher.hexdigest() if hasher else None
+        media_obj = store_upload(session["user_email"], filename, spool_path, parse_tags(tags), digest)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"File save error: {str(e)}"}), 500
+    finally:
+        if copy_path is not None:
+            # stored uploads were moved away; a failed one must not stay in INCOMING_FOLDER
+            try:
+                os.remove(copy_path)
+            except FileNotFoundError:
+                pass
+
+    return jsonify(
+        {"success": True, "message": "Upload successful", "media_id": media_obj["id"], "media": media_obj}
+    ), 201
+
+
+@bp.route("/api/upload/init", methods=["POST"])
+def api_upload_init():
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    data = request.get_json(force=True)
+    filename = secure_filename(data.get("filename", ""))
+    size = data.get("size")
+
+    if not filename:
+        return jsonify({"success": False, "message": "No file selected"}), 400
+
+    if not allowed_file(filename):
+        return jsonify({"success": False, "message": "File type not supported"}), 400
+
+    if not isinstance(size, int):
+        return jsonify({"success": False, "message": "File size required"}), 400
+
+    tags = data.get("custom_tags", "") or data.get("tags", "")
 
     try:
-        file.save(save_path)
+        manifest = chunked_uploads.init(session["user_email"], filename, size, parse_tags(tags))
+    except UploadError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+
+    return jsonify(
+        {
+            "success": True,
+            "upload_id": manifest["upload_id"],
+            "chunk_size": manifest["chunk_size"],
+            "total_chunks": manifest["total_chunks"],
+        }
+    ), 201
+
+
+@bp.route("/api/upload/<upload_id>", methods=["GET"])
+def api_upload_status(upload_id):
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    try:
+        manifest = chunked_uploads.get(upload_id, session["user_email"])
+    except UploadError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+
+    return jsonify(
+        {
+            "success": True,
+            "upload_id": upload_id,
+            "chunk_size": manifest["chunk_size"],
+            "total_chunks": manifest["total_chunks"],
+            "received": sorted(manifest["received"]),
+            "missing": chunked_uploads.missing(manifest),
+        }
+    ), 200
+
+
+@bp.route("/api/upload/<upload_id>/chunks/<int:index>", methods=["PUT"])
+def api_upload_chunk(upload_id, index):
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    try:
+        received = chunked_uploads.write_chunk(upload_id, session["user_email"], index, request.stream)
+    except UploadError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+
+    return jsonify({"success": True, "index": index, "received": received}), 200
+
+
+@bp.route("/api/upload/<upload_id>/complete", methods=["POST"])
+def api_upload_complete(upload_id):
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    email = session["user_email"]
+
+    try:
+        manifest = chunked_uploads.finish(upload_id, email)
+    except UploadError as e:
+        return jsonify({"success": False, "message": e.message}), e.status
+
+    try:
+        media_obj = store_upload(email, manifest["filename"], chunked_uploads.part_path(upload_id), manifest["tags"])
     except Exception as e:
         return jsonify({"success": False, "message": f"File save error: {str(e)}"}), 500
+    finally:
+        chunked_uploads.discard(upload_id)
 
-    media_obj = {
-        "id": media_id,
-        "email": session["user_email"],
-        "filename": filename,
-        "stored_name": stored_name,
-        "type": ext,
-        "size_kb": round(os.path.getsize(save_path) / 1024, 2),
-        "uploaded_at": now(),
-        "status": "Completed",
-        "tags": [t.strip() for t in tags.split(",") if t.strip()],
-    }
+    return jsonify(
+        {"success": True, "message": "Upload successful", "media_id": media_obj["id"], "media": media_obj}
+    ), 201
 
-    media_files.insert(0, media_obj)
-    add_notification(session["user_email"], "Upload Completed", f"{filename} uploaded successfully!")
 
-    return jsonify({"success": True, "message": "Upload successful", "media_id": media_id, "media": media_obj}), 201
+def direct_upload_tokens():
+    return URLSafeTimedSerializer(current_app.secret_key, salt="direct-upload")
 
 
-@app.route("/api/media", methods=["GET"])
-def api_media_list():
+next_direct_sweep = 0.0  # time.time() after which this worker sweeps abandoned direct uploads again
+
+
+def expire_direct_uploads():
+    """
+    Delete browser-direct uploads whose token ran out before /complete was
+    called - at most once per upload window per worker, in the background.
+    """
+    global next_direct_sweep
+    window = current_app.config["DIRECT_UPLOAD_WINDOW"]
+    if time.time() < next_direct_sweep:
+        return
+    next_direct_sweep = time.time() + window
+    # twice the window: older than any token that could still complete
+    before = time.time() - 2 * window
+
+    def sweep():
+        try:
+            blob_store.expire_unreferenced("direct/", before)
+        except Exception as e:
+            print("Direct upload sweep error:", e)
+            count_error("direct_sweep")
+
+    threading.Thread(target=sweep, name="direct-sweep", daemon=True).start()
+
+
+@bp.route("/api/upload/presign", methods=["POST"])
+def api_upload_presign():
+    """
+    Browser-direct upload (S3 only): returns a presigned PUT URL for a fresh
+    object key plus a token to hand to /api/upload/direct/complete afterwards.
+    The file body never passes through Flask.
+    """
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    data = request.get_json(force=True)
+    filename = secure_filename(data.get("filename", ""))
+    size = data.get("size")
+
+    if not filename:
+        return jsonify({"success": False, "message": "No file selected"}), 400
+
+    if not allowed_file(filename):
+        return jsonify({"success": False, "message": "File type not supported"}), 400
+
+    if not isinstance(size, int) or size < 1:
+        return jsonify({"success": False, "message": "File size required"}), 400
+
+    if size > current_app.config["MAX_UPLOAD_SIZE"]:
+        return jsonify({"success": False, "message": "File too large"}), 413
+
+    ext = filename.rsplit(".", 1)[1].lower()
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    # not content-addressed: the server never sees the bytes to hash them
+    key = f"direct/{uuid.uuid4().hex}.{ext}"
+
+    url = blob_store.objects.presign_put(key, content_type, size)
+    if url is None:
+        return jsonify({"success": False, "message": "Direct uploads need S3 storage"}), 400
+    expire_direct_uploads()
+
+    tags = parse_tags(data.get("custom_tags", "") or data.get("tags", ""))
+    token = direct_upload_tokens().dumps(
+        {"email": session["user_email"], "key": key, "filename": filename, "size": size, "tags": tags}
+    )
+
+    return jsonify(
+        {
+            "success": True,
+            "upload_url": url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "token": token,
+        }
+    ), 201
+
+
+@bp.route("/api/upload/direct/complete", methods=["POST"])
+def api_upload_direct_complete():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
     email = session["user_email"]
-    user_media = [m for m in media_files if m["email"] == email]
-    return jsonify({"success": True, "media": user_media}), 200
+    data = request.get_json(force=True)
+
+    try:
+        upload = direct_upload_tokens().loads(
+            data.get("token", ""), max_age=current_app.config["DIRECT_UPLOAD_WINDOW"]
+        )
+    except SignatureExpired:
+        return jsonify({"success": False, "message": "Upload expired"}), 410
+    except BadSignature:
+        return jsonify({"success": False, "message": "Invalid upload token"}), 400
+
+    if upload["email"] != email:
+        return jsonify({"success": False, "message": "Upload not found"}), 404
+
+    key = upload["key"]
+    head = blob_store.objects.head(key)
+    if head is None:
+        return jsonify({"success": False, "message": "File not uploaded yet"}), 409
+
+    if head["size"] != upload["size"]:
+        blob_store.objects.delete_many([key])
+        return jsonify({"success": False, "message": "Uploaded file size does not match"}), 400
+
+    # the reference doubles as a replay guard: one media record per token
+    if blob_store.refs.incr(key) > 1:
+        blob_store.refs.decr(key)
+        return jsonify({"success": False, "message": "Upload already completed"}), 409
+
+    media_obj = add_media(email, upload["filename"], key, upload["size"], upload["tags"])
+
+    return jsonify(
+        {"success": True, "message": "Upload successful", "media_id": media_obj["id"], "media": media_obj}
+    ), 201
+
+
+@bp.route("/api/media", methods=["GET"])
+@versioned("media")
+def api_media_list():
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    try:
+        limit, cursor, fields = page_args()
+        user_media, next_cursor = media_store.page(session["user_email"], limit, cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify(
+        {
+            "success": True,
+            "media": project(user_media, fields),
+            "next_cursor": next_cursor,
+        }
+    ), 200
 
 
-@app.route("/api/media/<media_id>", methods=["GET"])
+@bp.route("/api/media/search", methods=["GET"])
+@versioned("media")
+def api_media_search():
+    """
+    ?q=beach sun*        every word must match a filename token or tag token;
+                         "a|b" = either, a trailing * = prefix
+    ?tags=trip,2024      exact tags; &match=any for either instead of all
+    ?type=image|video|audio  &month=YYYY-MM  &sort=latest|oldest
+    plus the usual ?limit=&cursor=&fields=. With &facets=1 the response
+    counts the matches per type and month, before the type / month filters.
+    """
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    args = request.args
+    media_type = args.get("type") or None
+    if media_type and media_type not in set(TYPE_GROUPS.values()):
+        return jsonify({"success": False, "message": "Unknown media type"}), 400
+
+    try:
+        limit, cursor, fields = page_args()
+        items, next_cursor, total, facets = search_index.search(
+            session["user_email"],
+            q=args.get("q", ""),
+            tags=args.get("tags", "").split(","),
+            match_all=args.get("match", "all") != "any",
+            type=media_type,
+            month=args.get("month") or None,
+            oldest_first=args.get("sort") == "oldest",
+            limit=limit or current_app.config["PAGE_SIZE_MAX"],
+            cursor=cursor,
+            facets=args.get("facets") == "1",
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify(
+        {
+            "success": True,
+            "media": project(items, fields),
+            "total": total,
+            "facets": facets,
+            "next_cursor": next_cursor,
+        }
+    ), 200
+
+
+@bp.route("/api/media/<media_id>", methods=["GET"])
+@versioned("media")
 def api_media_detail(media_id):
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
     email = session["user_email"]
-    media = next((m for m in media_files if m["id"] == media_id and m["email"] == email), None)
+    media = media_store.get(media_id, email)
 
     if not media:
         return jsonify({"success": False, "message": "Media not found"}), 404
 
-    analysis = {
-        "rekognition": {"labels": [{"Name": "Person", "Confidence": 95}]},
-        "transcribe": "Sample transcript will appear here (demo).",
-        "comprehend": {"sentiment": "POSITIVE"},
-    }
+    analysis = media_store.get_analysis(media_id) or {}
 
     return jsonify({"success": True, "media": media, "analysis": analysis}), 200
 
 
-@app.route("/api/media/<media_id>", methods=["DELETE"])
-def api_media_delete(media_id):
+@bp.route("/api/media/<media_id>/thumbnail", methods=["GET"])
+def api_media_thumbnail(media_id):
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    media = media_store.get(media_id, session["user_email"])
+
+    if not media:
+        return jsonify({"success": False, "message": "Media not found"}), 404
+
+    size = request.args.get("size", "sm")
+    if size not in THUMBNAIL_SIZES:
+        return jsonify({"success": False, "message": "Unknown thumbnail size"}), 400
+
+    path = derivative_cache.get(media_id, size)
+    if path:
+        try:
+            resp = send_file(path, mimetype="image/jpeg", max_age=86400, conditional=True)
+        except FileNotFoundError:
+            resp = None  # evicted by another worker since get(): render it again below
+        if resp is not None:
+            resp.cache_control.public = False
+            resp.cache_control.private = True
+            return resp
+
+    # Not rendered yet (or evicted): queue it and fall back to the original for images
+    if can_render(media["type"]):
+        with_local_copy(
+            media["stored_name"], lambda path: derivative_cache.generate(media_id, path, media["type"], [size])
+        )
+    if media["type"] in {"jpg", "jpeg", "png", "gif"}:
+        return redirect(url_for(".api_media_content", media_id=media_id))
+
+    return jsonify({"success": False, "message": "Preview not available"}), 404
+
+
+@bp.route("/api/media/<media_id>/content", methods=["GET"])
+def api_media_content(media_id):
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
     email = session["user_email"]
-    media = next((m for m in media_files if m["id"] == media_id and m["email"] == email), None)
+    media = media_store.get(media_id, email)
 
     if not media:
         return jsonify({"success": False, "message": "Media not found"}), 404
 
-    try:
-        path = os.path.join(app.config["UPLOAD_FOLDER"], media["stored_name"])
-        if os.path.exists(path):
-            os.remove(path)
-    except:
-        pass
+    download = request.args.get("download") == "1"
+
+    # S3: the client fetches it from the bucket (Range and caching handled there)
+    url = blob_store.download_url(media["stored_name"], media["filename"], download)
+    if url:
+        return redirect(url)
+
+    path = blob_store.local_path(media["stored_name"])
+    if not os.path.exists(path):
+        return jsonify({"success": False, "message": "Media file missing"}), 404
+
+    accel_prefix = current_app.config["MEDIA_X_ACCEL_PREFIX"]
+    if accel_prefix:
+        resp = current_app.response_class()
+        resp.headers["X-Accel-Redirect"] = accel_prefix + media["stored_name"]
+        if download:
+            resp.headers["Content-Disposition"] = f'attachment; filename="{media["filename"]}"'
+        return resp
+
+    # conditional=True gives Range/206, If-None-Match / If-Modified-Since / 304, and
+    # streams through wsgi.file_wrapper (sendfile under Gunicorn) instead of Python reads.
+    # Blobs are content-addressed, so the digest is a strong ETag.
+    resp = send_file(
+        path,
+        conditional=True,
+        etag=os.path.basename(path).split(".", 1)[0],
+        max_age=86400,
+        as_attachment=download,
+        download_name=media["filename"],
+    )
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.headers["Accept-Ranges"] = "bytes"  # advertise seeking on full responses too
+    return resp
 
-    media_files.remove(media)
+
+@bp.route("/api/media/<media_id>", methods=["DELETE"])
+def api_media_delete(media_id):
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    email = session["user_email"]
+    media = media_store.get(media_id, email)
+
+    if not media:
+        return jsonify({"success": False, "message": "Media not found"}), 404
+
+    remove_media([media_id])
     add_notification(email, "Media Deleted", f"{media['filename']} deleted successfully.")
     return jsonify({"success": True, "message": "Deleted"}), 200
 
 
+def bulk_ids(data):
+    """The ``ids`` list of a bulk request, deduplicated; raises ValueError with a user message."""
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+        raise ValueError("ids must be a non-empty list")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > current_app.config["BULK_MAX_ITEMS"]:
+        raise ValueError(f"At most {current_app.config['BULK_MAX_ITEMS']} items per request")
+    return ids
+
+
+@bp.route("/api/media/bulk/delete", methods=["POST"])
+def api_media_bulk_delete():
+    """{"ids": [...]} -> deletes the caller's media among them; one notification for all."""
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    email = session["user_email"]
+
+    try:
+        ids = bulk_ids(request.get_json(force=True))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    owned = media_store.get_many(ids, email)
+    deleted = remove_media([m["id"] for m in owned])
+    deleted_ids = {m["id"] for m in deleted}
+
+    if len(deleted) == 1:
+        add_notification(email, "Media Deleted", f"{deleted[0]['filename']} deleted successfully.")
+    elif deleted:
+        add_notification(email, "Media Deleted", f"{len(deleted)} files deleted successfully.")
+
+    return jsonify(
+        {
+            "success": True,
+            "message": f"Deleted {len(deleted)} of {len(ids)}",
+            "deleted": [i for i in ids if i in deleted_ids],
+            "not_found": [i for i in ids if i not in deleted_ids],
+        }
+    ), 200
+
+
+@bp.route("/api/media/bulk/tags", methods=["POST"])
+def api_media_bulk_tags():
+    """
+    {"ids": [...], "add": "a,b", "remove": "c"} or {"ids": [...], "set": "a,b"}
+    (lists work too) -> updated tags of the caller's media among ``ids``.
+    """
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    email = session["user_email"]
+    data = request.get_json(force=True)
+
+    try:
+        ids = bulk_ids(data)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    def tag_list(value):
+        return parse_tags(",".join(value) if isinstance(value, list) else value)
+
+    replace = tag_list(data["set"]) if data.get("set") is not None else None
+    add = tag_list(data.get("add"))
+    remove = {t.lower() for t in tag_list(data.get("remove"))}
+
+    if replace is None and not add and not remove:
+        return jsonify({"success": False, "message": "Nothing to change"}), 400
+
+    new_tags = {}
+    for media in media_store.get_many(ids, email):
+        tags = list(replace) if replace is not None else list(media["tags"])
+        present = {t.lower() for t in tags}
+        tags += [t for t in add if t.lower() not in present]
+        tags = [t for t in tags if t.lower() not in remove]
+        if tags != media["tags"]:
+            new_tags[media["id"]] = tags
+
+    updated = media_store.set_tags_many(new_tags) if new_tags else []
+    search_index.update_many(updated)
+    if updated:
+        media_changed(email, [m["id"] for m in updated])
+        plural = "s" if len(updated) > 1 else ""
+        add_notification(email, "Tags Updated", f"Tags updated on {len(updated)} file{plural}.")
+
+    return jsonify(
+        {
+            "success": True,
+            "message": f"Updated {len(updated)} of {len(ids)}",
+            "media": [{"id": m["id"], "tags": m["tags"]} for m in updated],
+        }
+    ), 200
+
+
 # ===================== NOTIFICATION APIs =====================
-@app.route("/api/notifications", methods=["GET"])
+@bp.route("/api/notifications", methods=["GET"])
+@versioned("notifications")
 def api_notifications():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
+    try:
+        limit, cursor, fields = page_args()
+        user_notes, next_cursor = notification_store.page(session["user_email"], limit, cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    return jsonify(
+        {
+            "success": True,
+            "notifications": project(user_notes, fields),
+            "next_cursor": next_cursor,
+        }
+    ), 200
+
+
+@bp.route("/api/notifications/unread-count", methods=["GET"])
+@versioned("notifications")
+def api_notifications_unread_count():
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
+    return jsonify({"success": True, "unread": notification_store.unread_count(session["user_email"])}), 200
+
+
+@bp.route("/api/notifications/stream", methods=["GET"])
+def api_notifications_stream():
+    if not require_login():
+        return jsonify({"success": False, "message": "Login required"}), 401
+
     email = session["user_email"]
-    user_notes = [n for n in notifications if n["email"] == email]
-    return jsonify({"success": True, "notifications": user_notes}), 200
+    sub = notify_hub.subscribe(email)
+
+    # EventSource sends Last-Event-ID when it reconnects, app.js passes ?last_id= when a new
+    # page opens the stream: either way the stream replays what was missed, ids only go up
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_id", "")
+    last_id = int(last_event_id) if last_event_id.isdigit() else None
+
+    return current_app.response_class(
+        sse_stream(
+            notify_hub,
+            sub,
+            lambda after_seq, limit: notification_store.since(email, after_seq, limit),
+            last_id,
+            current_app.config["SSE_HEARTBEAT_SECONDS"],
+            current_app.config["SSE_BUFFER_SIZE"],
+        ),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@app.route("/api/notifications/read-all", methods=["POST"])
+@bp.route("/api/notifications/read-all", methods=["POST"])
 def api_notifications_read_all():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
-    email = session["user_email"]
-    for n in notifications:
-        if n["email"] == email:
-            n["status"] = "Read"
+    notification_store.mark_all_read(session["user_email"])
+    versions.bump(session["user_email"], "notifications")
 
     return jsonify({"success": True, "message": "All marked as read"}), 200
 
 
-@app.route("/api/notifications/clear-all", methods=["POST"])
+@bp.route("/api/notifications/clear-all", methods=["POST"])
 def api_notifications_clear_all():
     if not require_login():
         return jsonify({"success": False, "message": "Login required"}), 401
 
-    email = session["user_email"]
-    global notifications
-    notifications = [n for n in notifications if n["email"] != email]
+    notification_store.clear(session["user_email"])
+    versions.bump(session["user_email"], "notifications")
     return jsonify({"success": True, "message": "All cleared"}), 200
 
 
 # ===================== FIX .html ROUTES =====================
-@app.route("/login.html")
+@bp.route("/login.html")
 def login_html():
-    return redirect(url_for("login_page"))
+    return redirect(url_for(".login_page"))
 
 
-@app.route("/register.html")
+@bp.route("/register.html")
 def register_html():
-    return redirect(url_for("register_page"))
+    return redirect(url_for(".register_page"))
 
 
-@app.route("/dashboard.html")
+@bp.route("/dashboard.html")
 def dashboard_html():
-    return redirect(url_for("dashboard"))
+    return redirect(url_for(".dashboard"))
 
 
-@app.route("/upload.html")
+@bp.route("/upload.html")
 def upload_html():
-    return redirect(url_for("upload"))
+    return redirect(url_for(".upload"))
 
 
-@app.route("/media.html")
+@bp.route("/media.html")
 def media_html():
-    return redirect(url_for("media"))
+    return redirect(url_for(".media"))
 
 
-@app.route("/notification.html")
+@bp.route("/notification.html")
 def notification_html():
-    return redirect(url_for("notification_page"))
+    return redirect(url_for(".notification_page"))
 
 
-@app.route("/profile.html")
+@bp.route("/profile.html")
 def profile_html():
-    return redirect(url_for("profile"))
+    return redirect(url_for(".profile"))
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout_page():
+    if require_login():
+        end_sessions(session["user_email"])
     session.clear()
-    session["fresh_start"] = True
-    return redirect(url_for("login_page"))
+    return redirect(url_for(".login_page"))
 
 
 # ===================== RUN =====================
+def __getattr__(name):
+    # "gunicorn app:app": the app configured from the SNAPSTREAM_* environment, built on
+    # first access so importing this module (app_aws.py, benchmarks) doesn't start one
+    global app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    app = create_app()
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,316 @@
+"""
+Built CSS / JS for the pages: bundled, minified, fingerprinted and
+precompressed once, then served with a one-year immutable cache.
+
+``Assets.build()`` turns the sources under ``static/`` into
+``static/dist/``:
+
+    css/style.<hash>.css      (+ .gz, + .br when the brotli module is installed)
+    js/core.<hash>.js         api.js + app.js, loaded by every page
+    js/<page>.<hash>.js       one per page script
+    manifest.json             logical name -> built file
+
+The hash is of the built content, so a changed file gets a new URL and
+an unchanged one keeps its cached copy across deploys. Templates call
+``asset_url("js/core.js")``; ``variant()`` picks the ``.br`` / ``.gz`` file
+the client accepts, so nothing is compressed per request (nginx can do
+the same with ``gzip_static`` / ``brotli_static`` on ``static/dist``).
+
+Minification is deliberately conservative - comments and redundant
+whitespace only, line breaks kept where JavaScript's automatic semicolon
+insertion could depend on them - so it needs no JS toolchain.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli not installed - gzip variants only
+    brotli = None
+
+# logical name -> sources, in order (paths relative to the static folder)
+BUNDLES = {
+    "css/style.css": ["css/style.css"],
+    "js/core.js": ["js/api.js", "js/app.js"],
+    "js/auth.js": ["js/auth.js"],
+    "js/dashboard.js": ["js/dashboard.js"],
+    "js/media.js": ["js/media.js"],
+    "js/notifications.js": ["js/notifications.js"],
+    "js/upload.js": ["js/upload.js"],
+}
+
+MIMETYPES = {".css": "text/css", ".js": "text/javascript"}
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]  # preferred first
+
+
+class Assets:
+    def __init__(self, static_dir, out_dir, bundles=BUNDLES):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.bundles = bundles
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._built = set()
+        self._sources_seen = None  # source mtimes at the last build
+
+    def build(self):
+        """(Re)build every bundle; returns the manifest. Safe to run from several workers at once."""
+        with self._lock:
+            return self._build()
+
+    def url_path(self, name, watch=False):
+        """Built file for logical ``name`` (relative to ``out_dir``); ``watch`` rebuilds changed sources."""
+        with self._lock:
+            if self._manifest is None or (watch and self._sources_changed()):
+                self._build()
+            return self._manifest[name]
+
+    def variant(self, filename, accept_encoding):
+        """
+        ``(path, content_encoding)`` of ``filename`` (a built file) for a client
+        whose Accept-Encoding quality is ``accept_encoding(coding)``; None if
+        there is no such file.
+        """
+        with self._lock:
+            if self._manifest is None:
+                self._build()
+            if filename not in self._built:
+                return None
+        path = os.path.join(self.out_dir, filename)
+        for coding, suffix in ENCODINGS:
+            if accept_encoding(coding) > 0 and os.path.exists(path + suffix):
+                return path + suffix, coding
+        return path, None
+
+    def prune(self):
+        """Delete built files the current manifest no longer refers to; returns how many."""
+        with self._lock:
+            if self._manifest is None:
+                self._build()
+            keep = {"manifest.json"}
+            for filename in self._built:
+                keep.update([filename] + [filename + suffix for _, suffix in ENCODINGS])
+        removed = 0
+        for root, _, files in os.walk(self.out_dir):
+            for f in files:
+                rel = os.path.relpath(os.path.join(root, f), self.out_dir).replace(os.sep, "/")
+                if rel not in keep:
+                    os.remove(os.path.join(root, f))
+                    removed += 1
+        return removed
+
+    # ---------- internal (caller holds self._lock) ----------
+    def _build(self):
+        manifest = {}
+        for name, sources in self.bundles.items():
+            parts = []
+            for src in sources:
+                with open(os.path.join(self.static_dir, src), encoding="utf-8") as f:
+                    parts.append(f.read())
+            stem, ext = os.path.splitext(name)
+            minify = minify_css if ext == ".css" else minify_js
+            # ";" keeps one script's last statement from running into the next one's first
+            body = ("\n" if ext == ".css" else ";\n").join(minify(p) for p in parts).encode("utf-8")
+            filename = f"{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+            self._write(filename, body)
+            manifest[name] = filename
+
+        self._write("manifest.json", json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"), hashed=False)
+        self._manifest = manifest
+        self._built = set(manifest.values())
+        self._sources_seen = self._source_mtimes()
+        return manifest
+
+    def _write(self, filename, body, hashed=True):
+        path = os.path.join(self.out_dir, filename)
+        if hashed and os.path.exists(path):
+            return  # same name = same content, variants included
+        variants = []
+        if hashed:
+            variants.append((path + ".gz", gzip.compress(body, 9, mtime=0)))
+            if brotli is not None:
+                variants.append((path + ".br", brotli.compress(body, quality=11)))
+            variants = [(target, data) for target, data in variants if len(data) < len(body)]
+        variants.append((path, body))  # last: its presence marks the set complete
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for target, data in variants:
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+
+    def _source_mtimes(self):
+        mtimes = {}
+        for sources in self.bundles.values():
+            for src in sources:
+                try:
+                    mtimes[src] = os.stat(os.path.join(self.static_dir, src)).st_mtime_ns
+                except FileNotFoundError:
+                    mtimes[src] = None
+        return mtimes
+
+    def _sources_changed(self):
+        return self._source_mtimes() != self._sources_seen
+
+
+# ===================== MINIFIERS =====================
+_SPACE = " \t\r\n\f\v"
+_JS_WORD = re.compile(r"[A-Za-z0-9_$\u0080-\uffff]+")
+# a "/" after one of these starts a regex literal, not a division
+_JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await"}
+# a space next to one of these is never needed ("+" / "-" / "/" / "." excluded: "a - -b", "1 .x", "a / /re/")
+_JS_TIGHT = set("{}()[];,:=<>?!&|*%^~")
+# a line break after / before these can't change how automatic semicolon insertion reads the code
+_JS_NO_BREAK_AFTER = set("{;,([")
+_JS_NO_BREAK_BEFORE = set("})]")
+
+
+def minify_js(source):
+    """Drop comments and collapse whitespace outside strings, templates and regex literals."""
+    out = []
+    last = ""  # last emitted token
+    gap = ""  # whitespace skipped since then: "", " " or "\n"
+    templates = []  # open brace depth inside each enclosing template literal's ${ ... }
+    i, n = 0, len(source)
+
+    def emit(token):
+        nonlocal last, gap
+        if gap and out:
+            before, after = last[-1], token[0]
+            if gap == "\n":
+                if before not in _JS_NO_BREAK_AFTER and after not in _JS_NO_BREAK_BEFORE:
+                    out.append("\n")
+            elif before not in _JS_TIGHT and after not in _JS_TIGHT:
+                out.append(" ")
+        out.append(token)
+        last, gap = token, ""
+
+    while i < n:
+        c = source[i]
+        if c in _SPACE:
+            j = i
+            while j < n and source[j] in _SPACE:
+                j += 1
+            gap = "\n" if gap == "\n" or "\n" in source[i:j] else " "
+            i = j
+        elif source.startswith("//", i):
+            j = source.find("\n", i)
+            i = n if j == -1 else j
+        elif source.startswith("/*", i):
+            j = source.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            gap = "\n" if gap == "\n" or "\n" in source[i:j] else " "
+            i = j
+        elif c in "'\"":
+            j = _skip_quoted(source, i)
+            emit(source[i:j])
+            i = j
+        elif c == "`" or (c == "}" and templates and templates[-1] == 0):
+            # template text up to its end or the next ${
+            if c == "}":
+                templates.pop()
+            j, opens_expression = _skip_template(source, i + 1)
+            emit(source[i:j])
+            if opens_expression:
+                templates.append(0)
+            i = j
+        elif c == "/" and (not out or last[-1] in _JS_REGEX_AFTER or last in _JS_REGEX_KEYWORDS):
+            j = _skip_regex(source, i)
+            emit(source[i:j])
+            i = j
+        else:
+            m = _JS_WORD.match(source, i)
+            if m:
+                emit(m.group())
+                i = m.end()
+                continue
+            if templates and c == "{":
+                templates[-1] += 1
+            elif templates and c == "}":
+                templates[-1] -= 1
+            emit(c)
+            i += 1
+    return "".join(out)
+
+
+def _skip_quoted(source, i):
+    quote, j, n = source[i], i + 1, len(source)
+    while j < n and source[j] != quote:
+        j += 2 if source[j] == "\\" else 1
+    return j + 1
+
+
+def _skip_template(source, j):
+    """From inside a template literal: (end index, True if it stopped at a ${)."""
+    n = len(source)
+    while j < n:
+        if source[j] == "\\":
+            j += 2
+        elif source[j] == "`":
+            return j + 1, False
+        elif source.startswith("${", j):
+            return j + 2, True
+        else:
+            j += 1
+    return n, False
+
+
+def _skip_regex(source, i):
+    j, n, in_class = i + 1, len(source), False
+    while j < n:
+        c = source[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == "\n":
+            return i + 1  # not a regex after all: a lone "/"
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            j += 1
+            while j < n and (source[j].isalpha()):
+                j += 1  # flags
+            return j
+        j += 1
+    return i + 1
+
+
+_CSS_TIGHT = set("{};,")
+
+
+def minify_css(source):
+    """Drop comments, collapse whitespace (none around ``{ } ; ,``) and the last ``;`` of each block."""
+    out = []
+    gap = False
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in _SPACE:
+            gap = True
+            i += 1
+        elif source.startswith("/*", i):
+            j = source.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            gap = True
+        else:
+            if c in "'\"":
+                j = _skip_quoted(source, i)
+            else:
+                j = i + 1
+            token = source[i:j]
+            if gap and out and out[-1][-1] not in _CSS_TIGHT and token[0] not in _CSS_TIGHT:
+                out.append(" ")
+            if token == "}" and out and out[-1] == ";":
+                out.pop()
+            out.append(token)
+            gap = False
+            i = j
+    return "".join(out)
@@ -0,0 +1,155 @@
+"""
+Shared boto3 clients for AWS mode.
+
+Clients and resources are created on first use - not at import - once per
+process (a forked Gunicorn worker builds its own), with one tuned botocore
+``Config``: a connection pool sized for threaded workers, explicit
+timeouts, adaptive retries and TCP keepalive.
+
+Every call is timed through botocore's event hooks. ``stats()`` reports,
+per ``service.Operation``: calls, errors, retry attempts and latency, plus
+per-service in-flight calls. botocore's urllib3 pool doesn't queue - past
+``max_pool_connections`` it opens throwaway connections - so pool pressure
+shows up as ``calls_over_pool`` (calls started while the pool was already
+fully busy) rather than as a wait time.
+"""
+
+import os
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+
+class AWSClients:
+    def __init__(
+        self,
+        region=None,
+        max_pool_connections=50,
+        connect_timeout=3,
+        read_timeout=10,
+        max_attempts=5,
+        retry_mode="adaptive",
+        tcp_keepalive=True,
+    ):
+        self.region = region
+        self.config = Config(
+            region_name=region,
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={"max_attempts": max_attempts, "mode": retry_mode},
+            tcp_keepalive=tcp_keepalive,
+        )
+        self.max_pool_connections = max_pool_connections
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._made = {}  # (kind, service, endpoint_url) -> client / resource
+        self._ops = {}  # "service.Operation" -> counters
+        self._in_flight = {}  # service -> [current, peak, calls_over_pool]
+
+    @classmethod
+    def from_env(cls, region=None):
+        """Pool / timeout / retry settings from SNAPSTREAM_AWS_* environment variables."""
+        env = os.environ.get
+        return cls(
+            region=env("SNAPSTREAM_AWS_REGION", region),
+            max_pool_connections=int(env("SNAPSTREAM_AWS_MAX_POOL", 50)),
+            connect_timeout=float(env("SNAPSTREAM_AWS_CONNECT_TIMEOUT", 3)),
+            read_timeout=float(env("SNAPSTREAM_AWS_READ_TIMEOUT", 10)),
+            max_attempts=int(env("SNAPSTREAM_AWS_MAX_ATTEMPTS", 5)),
+            retry_mode=env("SNAPSTREAM_AWS_RETRY_MODE", "adaptive"),
+            tcp_keepalive=env("SNAPSTREAM_AWS_TCP_KEEPALIVE", "1") == "1",
+        )
+
+    def client(self, service, endpoint_url=None):
+        return self._get("client", service, endpoint_url)
+
+    def resource(self, service, endpoint_url=None):
+        return self._get("resource", service, endpoint_url)
+
+    def stats(self):
+        with self._lock:
+            ops = {}
+            for name, c in self._ops.items():
+                ops[name] = dict(c, avg_ms=round(c["total_ms"] / c["calls"], 2) if c["calls"] else 0.0)
+            pools = {
+                service: {
+                    "in_flight": current,
+                    "peak_in_flight": peak,
+                    "calls_over_pool": over,
+                    "max_pool_connections": self.max_pool_connections,
+                }
+                for service, (current, peak, over) in self._in_flight.items()
+            }
+            return {"operations": ops, "pools": pools}
+
+    # ---------- internal ----------
+    def _get(self, kind, service, endpoint_url):
+        key = (kind, service, endpoint_url)
+        made = self._made.get(key)
+        if made is not None and self._pid == os.getpid():
+            return made
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # first use in this process (or after a fork): never share sockets with the parent
+                self._pid = os.getpid()
+                self._session = boto3.session.Session(region_name=self.region)
+                self._made = {}
+            made = self._made.get(key)
+            if made is None:
+                factory = self._session.client if kind == "client" else self._session.resource
+                made = factory(service, config=self.config, endpoint_url=endpoint_url)
+                client = made if kind == "client" else made.meta.client
+                self._instrument(client)
+                self._made[key] = made
+            return made
+
+    def _instrument(self, client):
+        event_id = client.meta.service_model.service_id.hyphenize()
+        events = client.meta.events
+        events.register(f"before-call.{event_id}", self._before_call)
+        events.register(f"after-call.{event_id}", self._after_call)
+        events.register(f"after-call-error.{event_id}", self._after_call_error)
+
+    def _before_call(self, model, context, **kwargs):
+        service = model.service_model.service_name
+        context["snapstream_start"] = time.perf_counter()
+        context["snapstream_model"] = model
+        with self._lock:
+            pool = self._in_flight.setdefault(service, [0, 0, 0])
+            if pool[0] >= self.max_pool_connections:
+                pool[2] += 1
+            pool[0] += 1
+            pool[1] = max(pool[1], pool[0])
+
+    def _after_call(self, context, parsed=None, **kwargs):
+        parsed = parsed or {}
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self._finish(context, error="Error" in parsed, retries=retries)
+
+    def _after_call_error(self, context, **kwargs):
+        # connection-level failure after all retries (botocore passes no model here)
+        self._finish(context, error=True, retries=0)
+
+    def _finish(self, context, error, retries):
+        start = context.pop("snapstream_start", None)
+        model = context.pop("snapstream_model", None)
+        if start is None or model is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        service = model.service_model.service_name
+        name = f"{service}.{model.name}"
+        with self._lock:
+            self._in_flight[service][0] -= 1
+            c = self._ops.get(name)
+            if c is None:
+                c = self._ops[name] = {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+            c["calls"] += 1
+            c["errors"] += error
+            c["retries"] += retries
+            c["total_ms"] += elapsed_ms
+            c["max_ms"] = max(c["max_ms"], elapsed_ms)
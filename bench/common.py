@@ -0,0 +1,184 @@
+"""
+Shared pieces of the benchmark scripts: deterministic seeding, latency
+summaries and the JSON result files.
+"""
+
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+PASSWORD = "benchpass"
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORDS = "beach sunset city night family trip summer winter party concert birthday dog cat lake road".split()
+EXTS = ["jpg", "png", "gif", "mp4", "mp3", "wav"]
+
+
+def user_email(i):
+    return f"bench{i}@example.com"
+
+
+def add_storage_args(parser):
+    parser.add_argument("--storage", default="memory://", help="STORAGE_URL (default memory://)")
+    parser.add_argument("--objects", default="", help="OBJECT_STORAGE_URL, e.g. s3://bench?endpoint_url=http://localhost:9000")
+    parser.add_argument("--moto", action="store_true", help="run DynamoDB / S3 / SNS against an in-process moto stand-in")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--media", type=int, default=100, help="media per user")
+    parser.add_argument("--notes", type=int, default=50, help="notifications per user")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the synthetic data")
+    parser.add_argument("--no-seed", action="store_true", help="reuse data seeded by an earlier run (sqlite / dynamodb)")
+    parser.add_argument("--out", help="result file (default bench/results/<time>-<commit>-<name>.json)")
+
+
+@contextmanager
+def stand_ins(args):
+    """moto's in-process AWS for --moto (with a bucket for s3:// object URLs); a no-op otherwise."""
+    if not args.moto:
+        yield
+        return
+
+    from moto import mock_aws
+
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ.setdefault(var, "bench")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        if args.objects.startswith("s3://"):
+            import boto3
+
+            boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=args.objects[5:].split("/")[0].split("?")[0])
+        yield
+
+
+def make_app(args, **config):
+    import app as snapstream
+
+    config = dict(
+        {
+            "STORAGE_URL": args.storage,
+            "OBJECT_STORAGE_URL": args.objects,
+            "SECRET_KEY": "bench",
+            "RECLAIM_POLL_SECONDS": 3600,
+        },
+        **config,
+    )
+    return snapstream, snapstream.create_app(config)
+
+
+def seed(snapstream, args, log=print):
+    """
+    Synthetic users, media records (no files behind them) and notifications,
+    written through the storage interfaces. Same ``--seed`` = same data.
+    """
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    base_time = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+
+    for i in range(args.users):
+        email = user_email(i)
+        snapstream.users.add({"username": f"bench{i}", "email": email, "password": PASSWORD})
+
+        for j in range(args.media):
+            ext = rng.choice(EXTS)
+            words = rng.sample(WORDS, 2)
+            media = {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "email": email,
+                "filename": f"{words[0]}_{words[1]}_{j}.{ext}",
+                "stored_name": f"blobs/00/bench{i}_{j}.{ext}",
+                "type": ext,
+                "size_kb": round(rng.uniform(10, 50000), 2),
+                "uploaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(base_time + j * 3600)),
+                "status": rng.choice(("Completed", "Completed", "Completed", "Processing", "Failed")),
+                "tags": rng.sample(WORDS, rng.randint(0, 3)),
+            }
+            snapstream.media_store.add(media)
+
+        for j in range(args.notes):
+            snapstream.add_notification(email, "Upload Completed", f"file {j} uploaded successfully!")
+
+        if (i + 1) % max(1, args.users // 10) == 0:
+            log(f"  seeded {i + 1}/{args.users} users ({time.perf_counter() - started:.1f}s)")
+
+    snapstream.notification_store.flush()
+    return time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed):
+    """Latencies in seconds -> the per-endpoint numbers stored in result files."""
+    ordered = sorted(latencies)
+
+    def pct(p):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 4)
+
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4) if ordered else None,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(args, name, results, extra=None):
+    commit = git_commit()
+    doc = {
+        "meta": dict(
+            {
+                "suite": name,
+                "commit": commit,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "storage": args.storage,
+                "objects": args.objects,
+                "moto": args.moto,
+                "users": args.users,
+                "media_per_user": args.media,
+                "notes_per_user": args.notes,
+                "seed": args.seed,
+            },
+            **(extra or {}),
+        ),
+        "results": results,
+    }
+    path = args.out
+    if not path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}-{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    return path
+
+
+def print_table(results):
+    print(f"{'endpoint':<28}{'req':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:<28}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps'] or 0:>10}"
+            f"{r['p50_ms'] or 0:>10}{r['p95_ms'] or 0:>10}{r['p99_ms'] or 0:>10}"
+        )
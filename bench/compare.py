@@ -0,0 +1,71 @@
+"""
+Compare two benchmark result files endpoint by endpoint.
+
+    python -m bench.compare bench/results/<old>.json bench/results/<new>.json [--threshold 10]
+
+Exits 1 when a p50 / p95 latency grew, or throughput dropped, by more than
+``--threshold`` percent (or new errors appeared), so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = [("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1), ("throughput_rps", -1)]  # 1: lower is better
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"old: {old['meta'].get('commit')} {old['meta'].get('time')}  new: {new['meta'].get('commit')} {new['meta'].get('time')}")
+    for key in ("suite", "storage", "users", "media_per_user", "clients"):
+        if old["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: {key} differs ({old['meta'].get(key)} vs {new['meta'].get(key)})")
+
+    regressions = []
+    print(f"{'endpoint':<28}" + "".join(f"{m:>26}" for m, _ in METRICS))
+    for name, n in new["results"].items():
+        o = old["results"].get(name)
+        if o is None:
+            print(f"{name:<28}  (new)")
+            continue
+        cells = []
+        for metric, direction in METRICS:
+            pct = change(o.get(metric), n.get(metric))
+            if pct is None:
+                cells.append(f"{'-':>26}")
+                continue
+            flag = ""
+            if pct * direction > args.threshold and metric != "p99_ms":  # p99 is too noisy to gate on
+                flag = " !"
+                regressions.append(f"{name} {metric} {pct:+.1f}%")
+            cells.append(f"{f'{o[metric]} -> {n[metric]} ({pct:+.0f}%){flag}':>26}")
+        if n.get("errors", 0) > o.get("errors", 0):
+            regressions.append(f"{name} errors {o.get('errors', 0)} -> {n['errors']}")
+        print(f"{name:<28}" + "".join(cells))
+
+    if regressions:
+        print("\nRegressions:")
+        for r in regressions:
+            print("  " + r)
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
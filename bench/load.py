@@ -0,0 +1,214 @@
+"""
+Load benchmark for the API hot paths.
+
+Seeds synthetic users / media / notifications, then drives each endpoint
+with ``--clients`` concurrent logged-in clients and reports p50/p95/p99
+latency and throughput per endpoint, saved as JSON (see compare.py).
+
+    python -m bench.load                                  # in-process, memory://
+    python -m bench.load --storage sqlite:////tmp/bench.db --users 10000 --media 1000
+    python -m bench.load --storage sqlite:////tmp/bench.db --no-seed --http
+    python -m bench.load --moto --storage "dynamodb://us-east-1?create_tables=1" --objects s3://bench
+    python -m bench.load --url http://127.0.0.1:8000 --storage sqlite:////srv/snapstream.db --no-seed
+
+``--http`` serves the app on a local port (threaded Werkzeug) and talks to
+it over real sockets; ``--url`` targets an already running server (e.g.
+Gunicorn) sharing ``--storage`` with this process for seeding. Everything
+runs offline: DynamoDB / S3 can point at DynamoDB Local / MinIO through
+``endpoint_url`` or at moto (``--moto``).
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from bench.common import PASSWORD, WORDS, add_storage_args, make_app, print_table, seed, stand_ins, summarize
+from bench.common import user_email, write_results
+
+ENDPOINTS = ["login", "media_list", "dashboard_stats", "notifications", "search", "upload"]
+
+
+class InProcessClient:
+    """Flask test client: the full request path without sockets. One per thread."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, files=None):
+        if files:
+            data = {name: (io.BytesIO(body), filename) for name, (filename, body) in files.items()}
+            return self.client.open(path, method=method, data=data).status_code
+        return self.client.open(path, method=method, json=json_body).status_code
+
+
+class HttpClient:
+    """One keep-alive HTTP/1.1 connection carrying the session cookie."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.cookie = None
+        self.request("GET", "/")
+
+    def request(self, method, path, json_body=None, files=None):
+        headers = {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        elif files:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for name, (filename, content) in files.items():
+                parts.append(
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                    f"Content-Type: application/octet-stream\r\n\r\n".encode()
+                    + content
+                    + b"\r\n"
+                )
+            body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+            headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+
+        self.conn.request(method, path, body=body, headers=headers)
+        res = self.conn.getresponse()
+        res.read()
+        set_cookie = res.getheader("Set-Cookie")
+        if set_cookie and set_cookie.startswith("session="):
+            self.cookie = set_cookie.split(";", 1)[0]
+        return res.status
+
+
+def login(client, rng, args):
+    email = user_email(rng.randrange(args.users))
+    return client.request("POST", "/api/login", json_body={"email": email, "password": PASSWORD})
+
+
+SCENARIOS = {
+    "login": login,
+    "media_list": lambda client, rng, args: client.request("GET", "/api/media?limit=24"),
+    "dashboard_stats": lambda client, rng, args: client.request("GET", "/api/dashboard/stats"),
+    "notifications": lambda client, rng, args: client.request("GET", "/api/notifications?limit=20"),
+    "search": lambda client, rng, args: client.request(
+        "GET", "/api/media/search?" + urlencode({"q": rng.choice(WORDS)[:3] + "*", "limit": 24})
+    ),
+    "upload": lambda client, rng, args: client.request(
+        "POST", "/api/upload", files={"file": (f"bench_{rng.getrandbits(32)}.png", rng.randbytes(args.upload_bytes))}
+    ),
+}
+
+
+def run_endpoint(name, clients, args):
+    """``args.requests`` calls of one scenario spread over all clients; returns the summary."""
+    scenario = SCENARIOS[name]
+    remaining = [args.requests + args.warmup]
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def worker(client, rng):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                warmup = remaining[0] >= args.requests
+            start = time.perf_counter()
+            try:
+                ok = scenario(client, rng, args) < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if warmup:
+                continue
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [
+        threading.Thread(target=worker, args=(client, random.Random(f"{args.seed}:{name}:{i}")))
+        for i, client in enumerate(clients)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_storage_args(parser)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint first")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of " + ", ".join(ENDPOINTS))
+    parser.add_argument("--upload-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--http", action="store_true", help="serve on a local port and use real HTTP")
+    parser.add_argument("--url", help="benchmark a running server instead (implies HTTP)")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if args.url and args.storage.startswith("memory://"):
+        parser.error("--url needs a shared --storage (sqlite / dynamodb) to seed through")
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # app paths are relative to the repo
+
+    with stand_ins(args):
+        snapstream, app = make_app(args)
+        if not args.no_seed:
+            print(f"Seeding {args.users} users x {args.media} media, {args.notes} notifications each ...")
+            print(f"Seeded in {seed(snapstream, args):.1f}s")
+
+        server = None
+        base_url = args.url
+        if args.http and not base_url:
+            from werkzeug.serving import make_server
+
+            server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_port}"
+
+        mode = "http" if base_url else "inprocess"
+        clients = []
+        rng = random.Random(args.seed)
+        for _ in range(args.clients):
+            client = HttpClient(base_url) if base_url else InProcessClient(app)
+            if login(client, rng, args) >= 400:
+                raise SystemExit("Login failed - was the data seeded (drop --no-seed)?")
+            clients.append(client)
+
+        results = {}
+        for name in endpoints:
+            print(f"{name} ...")
+            results[name] = run_endpoint(name, clients, args)
+
+        if server is not None:
+            server.shutdown()
+
+    print_table(results)
+    path = write_results(
+        args,
+        f"load-{mode}",
+        results,
+        {"mode": mode, "clients": args.clients, "requests_per_endpoint": args.requests, "url": args.url},
+    )
+    print(f"Results: {path}")
+
+
+if __name__ == "__main__":
+    main()
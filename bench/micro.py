@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks of the storage and index calls behind the hot endpoints,
+timed directly (no Flask, no HTTP) over the same synthetic data as load.py.
+
+    python -m bench.micro --users 1000 --media 1000
+    python -m bench.micro --storage sqlite:////tmp/bench.db --no-seed --iterations 2000
+"""
+
+import argparse
+import random
+import time
+
+from bench.common import WORDS, add_storage_args, make_app, print_table, seed, stand_ins, summarize
+from bench.common import user_email, write_results
+
+
+def cases(snapstream):
+    """name -> fn(email, rng); each call is one timed sample."""
+    return {
+        "users.get": lambda email, rng: snapstream.users.get(email),
+        "media.page": lambda email, rng: snapstream.media_store.page(email, limit=24),
+        "media.stats": lambda email, rng: snapstream.media_store.stats(email),
+        "notifications.page": lambda email, rng: snapstream.notification_store.page(email, limit=20),
+        "notifications.unread_count": lambda email, rng: snapstream.notification_store.unread_count(email),
+        "search.prefix": lambda email, rng: snapstream.search_index.search(
+            email, q=rng.choice(WORDS)[:3] + "*", limit=24
+        ),
+        "search.tags_any": lambda email, rng: snapstream.search_index.search(
+            email, tags=rng.sample(WORDS, 2), match_all=False, limit=24
+        ),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_storage_args(parser)
+    parser.add_argument("--iterations", type=int, default=1000, help="timed calls per case")
+    parser.add_argument("--cases", help="comma-separated subset of the case names")
+    args = parser.parse_args(argv)
+
+    with stand_ins(args):
+        snapstream, _ = make_app(args)
+        if not args.no_seed:
+            print(f"Seeding {args.users} users x {args.media} media, {args.notes} notifications each ...")
+            print(f"Seeded in {seed(snapstream, args):.1f}s")
+
+        selected = cases(snapstream)
+        if args.cases:
+            wanted = [c.strip() for c in args.cases.split(",") if c.strip()]
+            unknown = set(wanted) - set(selected)
+            if unknown:
+                parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+            selected = {name: selected[name] for name in wanted}
+
+        results = {}
+        for name, fn in selected.items():
+            rng = random.Random(f"{args.seed}:{name}")
+            latencies = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                email = user_email(rng.randrange(args.users))
+                t = time.perf_counter()
+                try:
+                    fn(email, rng)
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t)
+            results[name] = summarize(latencies, errors, time.perf_counter() - started)
+
+    print_table(results)
+    print(f"Results: {write_results(args, 'micro', results, {'iterations': args.iterations})}")
+
+
+if __name__ == "__main__":
+    main()
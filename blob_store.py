@@ -0,0 +1,140 @@
+"""
+Content-addressed, reference-counted storage for uploaded media.
+
+Each distinct file body is kept once under the key
+``blobs/<sha256[:2]>/<sha256>.<ext>`` in an object backend
+(``object_store.LocalObjects`` or ``S3Objects``). Media records point at
+that key (their ``stored_name``), and the object is only removed when the
+last record referencing it is released. Reference counts live in the
+storage backend (``storage.BlobRefs`` / the SQLite ``blob_refs`` table) so
+they survive restarts and are shared by every worker using that backend.
+
+Releasing the last reference leaves a tombstone in the backend while the
+object is being deleted. An upload of the same content that arrives
+meanwhile - on any worker - waits for the delete to finish and then stores
+its own copy, instead of deduplicating onto an object that is about to go.
+"""
+
+import hashlib
+import mimetypes
+import os
+import time
+
+from storage.base import BLOB_DELETE_LEASE
+
+HASH_BLOCK = 1024 * 1024
+
+
+class HashingFile:
+    """
+    File wrapper that hashes everything written through it, so a multipart
+    upload is digested while Werkzeug streams it to disk instead of being
+    read back afterwards.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __iter__(self):
+        return iter(self._f)
+
+
+def file_digest(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, objects, refs):
+        self.objects = objects
+        self.refs = refs  # key -> number of media records using it
+
+    def key_for(self, digest, ext):
+        return f"blobs/{digest[:2]}/{digest}.{ext}"
+
+    def local_path(self, key):
+        """A readable local file with the blob's content (downloaded and cached for S3)."""
+        return self.objects.local_path(key)
+
+    def download_url(self, key, filename, download=False):
+        """Presigned URL to send the client to, or None when Flask serves the file itself."""
+        return self.objects.download_url(key, filename, download)
+
+    def put_file(self, src_path, ext, digest=None):
+        """
+        Adopt ``src_path`` as a blob and take one reference to it.
+        If the same content is already stored, the new copy is discarded.
+        Returns ``(key, deduplicated)``.
+        """
+        if digest is None:
+            digest = file_digest(src_path)
+
+        key = self.key_for(digest, ext)
+
+        count = self.refs.incr(key)
+        was_deleting = self._wait_for_delete(key)
+        if count > 1 and not was_deleting and self.objects.exists(key):
+            os.remove(src_path)
+            return key, True
+
+        try:
+            self.objects.put(src_path, key, mimetypes.guess_type(key)[0])
+        except Exception:
+            self.release(key)
+            raise
+        return key, False
+
+    def release(self, key):
+        """Drop one reference; delete the object when nobody uses it anymore."""
+        return bool(self.release_many([key]))
+
+    def release_many(self, keys):
+        """
+        Drop one reference per entry of ``keys`` and delete every object left
+        unused in one batched call. Returns the deleted keys.
+        """
+        unused = sorted({key for key in keys if self.refs.decr(key) <= 0})
+        if not unused:
+            return []
+
+        # each of these now carries a tombstone: new references wait until it is lifted
+        try:
+            self.objects.delete_many(unused)
+        finally:
+            for key in unused:
+                self.refs.finish_delete(key)
+        return unused
+
+    def expire_unreferenced(self, prefix, before):
+        """
+        Delete the objects under ``prefix`` last modified before ``before``
+        (epoch seconds) that no media record references - e.g. browser-direct
+        uploads that were never completed. Returns the deleted keys.
+        """
+        stale = [key for key in self.objects.list_older(prefix, before) if not self.refs.get(key)]
+        if stale:
+            self.objects.delete_many(stale)
+        return stale
+
+    def refcount(self, key):
+        return self.refs.get(key)
+
+    def _wait_for_delete(self, key):
+        """Block while a release (on any worker) is deleting ``key``; True if one was."""
+        deadline = time.monotonic() + BLOB_DELETE_LEASE
+        waited = False
+        while self.refs.deleting(key) and time.monotonic() < deadline:
+            waited = True
+            time.sleep(0.05)
+        return waited
@@ -0,0 +1,210 @@
+"""
+Chunked, resumable uploads.
+
+Protocol:
+    POST /api/upload/init                     -> upload_id, chunk_size, total_chunks
+    PUT  /api/upload/<upload_id>/chunks/<n>   -> raw chunk bytes, written at n * chunk_size
+    GET  /api/upload/<upload_id>              -> which chunks the server already has
+    POST /api/upload/<upload_id>/complete     -> turns the assembled file into a media record
+
+Every upload has a pre-sized ``.part`` file, a small JSON manifest and a
+``.chunks`` directory in ``<UPLOAD_FOLDER>/.incoming``. Chunks are streamed
+from the request body straight to their final offset with ``os.pwrite``, so
+they can arrive in parallel and in any order, and a client that lost its
+connection (or a server that restarted) simply resends the missing chunks.
+
+Nothing about an upload is kept in memory: the manifest is written once
+and every received chunk leaves an empty marker file named after its
+index, so workers sharing the directory all see the same progress.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from flask import Request
+
+from blob_store import HashingFile
+
+READ_BLOCK = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class StreamingRequest(Request):
+    """
+    Spool multipart file fields into ``incoming_dir`` instead of the system
+    temp dir, so ``api_upload`` can ``os.replace`` them into place rather than
+    copying the bytes a second time with ``file.save()``. The spool file is
+    SHA-256 hashed as it is written (``file.stream.hasher``).
+    """
+
+    incoming_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.incoming_dir is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return HashingFile(tempfile.NamedTemporaryFile("wb+", dir=self.incoming_dir, suffix=".spool", delete=False))
+
+    def close(self):
+        # Remove spool files the view did not move into place
+        files = self.__dict__.get("files")
+        spooled = [getattr(f.stream, "name", None) for f in files.values()] if files else []
+        super().close()
+        for path in spooled:
+            if isinstance(path, str) and path.endswith(".spool"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class ChunkedUploads:
+    def __init__(self, incoming_dir, chunk_size, max_size, ttl_seconds=24 * 3600):
+        self.incoming_dir = incoming_dir
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(incoming_dir, exist_ok=True)
+
+    # ---------- paths ----------
+    def part_path(self, upload_id):
+        return os.path.join(self.incoming_dir, f"{upload_id}.part")
+
+    def _manifest_path(self, upload_id):
+        return os.path.join(self.incoming_dir, f"{upload_id}.json")
+
+    def _chunks_dir(self, upload_id):
+        return os.path.join(self.incoming_dir, f"{upload_id}.chunks")
+
+    # ---------- protocol ----------
+    def init(self, email, filename, size, tags):
+        if size <= 0:
+            raise UploadError("File is empty")
+        if size > self.max_size:
+            raise UploadError(f"File too large. Maximum size is {self.max_size // (1024 * 1024)}MB", 413)
+
+        self.expire()
+
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            "upload_id": upload_id,
+            "email": email,
+            "filename": filename,
+            "size": size,
+            "tags": tags,
+            "chunk_size": self.chunk_size,
+            "total_chunks": -(-size // self.chunk_size),
+            "created": time.time(),
+        }
+
+        # Sparse pre-allocation: chunks land at their final offset
+        with open(self.part_path(upload_id), "wb") as f:
+            f.truncate(size)
+        os.makedirs(self._chunks_dir(upload_id), exist_ok=True)
+        self._save(manifest)  # last: its presence marks the upload as ready
+
+        return dict(manifest, received=[])
+
+    def get(self, upload_id, email):
+        """The manifest plus ``received``: chunk indexes any worker has stored so far."""
+        manifest = self._load(upload_id)
+        if manifest is None or manifest["email"] != email:
+            raise UploadError("Upload not found", 404)
+        manifest["received"] = self._received(upload_id)
+        return manifest
+
+    def write_chunk(self, upload_id, email, index, stream):
+        manifest = self.get(upload_id, email)
+
+        if index < 0 or index >= manifest["total_chunks"]:
+            raise UploadError("Chunk index out of range")
+
+        offset = index * manifest["chunk_size"]
+        expected = min(manifest["chunk_size"], manifest["size"] - offset)
+
+        written = 0
+        fd = os.open(self.part_path(upload_id), os.O_WRONLY)
+        try:
+            while written < expected:
+                block = stream.read(min(READ_BLOCK, expected - written))
+                if not block:
+                    break
+                os.pwrite(fd, block, offset + written)
+                written += len(block)
+        finally:
+            os.close(fd)
+
+        if written != expected or stream.read(1):
+            raise UploadError(f"Chunk {index} must be exactly {expected} bytes")
+
+        # only after the bytes are in place, so a marker always means a complete chunk
+        try:
+            os.close(os.open(os.path.join(self._chunks_dir(upload_id), str(index)), os.O_WRONLY | os.O_CREAT, 0o644))
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)  # discarded meanwhile
+        return len(self._received(upload_id))
+
+    def finish(self, upload_id, email):
+        """Check every chunk arrived and hand back the manifest; the .part file stays until ``discard``."""
+        manifest = self.get(upload_id, email)
+        missing = self.missing(manifest)
+        if missing:
+            raise UploadError(f"{len(missing)} chunk(s) still missing", 409)
+        return manifest
+
+    def discard(self, upload_id):
+        for path in (self._manifest_path(upload_id), self.part_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(self._chunks_dir(upload_id), ignore_errors=True)
+
+    def missing(self, manifest):
+        received = set(manifest["received"])
+        return [i for i in range(manifest["total_chunks"]) if i not in received]
+
+    def expire(self):
+        """Drop abandoned uploads older than ``ttl_seconds``."""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.incoming_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.incoming_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    self.discard(name[: -len(".json")])
+            except OSError:
+                pass
+
+    # ---------- manifest persistence ----------
+    def _save(self, manifest):
+        path = self._manifest_path(manifest["upload_id"])
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+
+    def _load(self, upload_id):
+        if not upload_id.isalnum():
+            return None
+        try:
+            with open(self._manifest_path(upload_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _received(self, upload_id):
+        try:
+            return sorted(int(name) for name in os.listdir(self._chunks_dir(upload_id)) if name.isdigit())
+        except FileNotFoundError:
+            return []
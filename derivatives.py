@@ -0,0 +1,206 @@
+"""
+Thumbnails and video poster frames.
+
+Derivatives are rendered in the background after an upload and kept in a
+size-bounded on-disk cache keyed by ``(media_id, size)``; the least recently
+served files are evicted first. Rendering uses Pillow for images and the
+``ffmpeg`` binary for video posters - both are optional, and a type that
+can't be rendered simply has no derivative (the UI falls back to the
+original / a type badge).
+
+The cache directory is shared by every worker. Each worker's index is only
+a hint: a file is checked to exist before it is served, "recently used" is
+the file's mtime (touched on every hit), and the size budget is enforced
+against the directory's contents, rescanned every ``RESCAN_EVERY`` renders
+or whenever this worker's own count goes over it.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow not installed - no image thumbnails
+    Image = None
+
+SIZES = {"sm": 320, "md": 640}  # name -> longest edge in px
+
+RESCAN_EVERY = 50  # renders between rescans of the shared directory
+
+IMAGE_EXT = {"jpg", "jpeg", "png", "gif"}
+VIDEO_EXT = {"mp4"}
+
+
+def can_render(ext):
+    if ext in IMAGE_EXT:
+        return Image is not None
+    if ext in VIDEO_EXT:
+        return shutil.which("ffmpeg") is not None
+    return False
+
+
+def render(src_path, ext, dest_path, max_px):
+    """Write a JPEG derivative of ``src_path`` to ``dest_path``; returns its size in bytes."""
+    # unique name: another worker may be rendering the same derivative
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        if ext in IMAGE_EXT:
+            with Image.open(src_path) as img:
+                img.thumbnail((max_px, max_px))
+                img.convert("RGB").save(tmp_path, "JPEG", quality=80, optimize=True)
+        else:
+            subprocess.run(
+                [
+                    "ffmpeg", "-v", "error", "-y", "-ss", "1", "-i", src_path,
+                    "-frames:v", "1", "-vf", f"scale='min({max_px},iw)':-2", "-f", "image2", tmp_path,
+                ],
+                check=True,
+                timeout=60,
+            )
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass  # failed before anything was written
+        raise
+
+    return os.path.getsize(dest_path)
+
+
+class DerivativeCache:
+    def __init__(self, root, max_bytes, workers=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> bytes, least recently used first
+        self._total = 0
+        self._pending = set()
+        self._cancelled = set()  # pending renders whose media was dropped meanwhile
+        self._renders = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="derivatives")
+
+        os.makedirs(root, exist_ok=True)
+        with self._lock:
+            for old in self._rescan():
+                self._remove(old)
+
+    def name(self, media_id, size):
+        return f"{media_id}_{size}.jpg"
+
+    def path(self, media_id, size):
+        return os.path.join(self.root, self.name(media_id, size))
+
+    def get(self, media_id, size):
+        """Return the cached file path (and mark it recently used), or None."""
+        name = self.name(media_id, size)
+        path = os.path.join(self.root, name)
+        try:
+            os.utime(path)  # mtime = last use, for every worker's LRU
+            nbytes = os.path.getsize(path)
+        except FileNotFoundError:
+            nbytes = None  # not rendered yet, or evicted by another worker
+        with self._lock:
+            if nbytes is None:
+                self._forget(name)
+                return None
+            if name not in self._entries:
+                self._total += nbytes  # rendered by another worker
+            self._entries[name] = nbytes
+            self._entries.move_to_end(name)
+        return path
+
+    def generate(self, media_id, src_path, ext, sizes=None):
+        """Queue rendering of the given sizes (default: all) in the background."""
+        if not can_render(ext):
+            return
+        for size in sizes or SIZES:
+            name = self.name(media_id, size)
+            with self._lock:
+                if name in self._entries or name in self._pending:
+                    continue
+                self._pending.add(name)
+            self._pool.submit(self._render, name, src_path, ext, SIZES[size])
+
+    def drop(self, media_id):
+        for size in SIZES:
+            name = self.name(media_id, size)
+            with self._lock:
+                self._forget(name)
+                if name in self._pending:
+                    self._cancelled.add(name)
+            self._remove(name)
+
+    def _render(self, name, src_path, ext, max_px):
+        try:
+            nbytes = render(src_path, ext, os.path.join(self.root, name), max_px)
+        except Exception:
+            with self._lock:
+                self._pending.discard(name)
+                self._cancelled.discard(name)
+            return
+
+        with self._lock:
+            self._pending.discard(name)
+            if name in self._cancelled:
+                # the media was deleted while this was rendering: don't leave the file behind
+                self._cancelled.discard(name)
+                evicted = [name]
+            else:
+                self._forget(name)
+                self._entries[name] = nbytes
+                self._total += nbytes
+                self._renders += 1
+                if self._total > self.max_bytes or self._renders % RESCAN_EVERY == 0:
+                    evicted = self._rescan()
+                else:
+                    evicted = []
+        for old in evicted:
+            self._remove(old)
+
+    def _forget(self, name):
+        # caller holds self._lock
+        nbytes = self._entries.pop(name, None)
+        if nbytes is not None:
+            self._total -= nbytes
+
+    def _evict(self):
+        # caller holds self._lock
+        evicted = []
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            old, nbytes = self._entries.popitem(last=False)
+            self._total -= nbytes
+            evicted.append(old)
+        return evicted
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+    def _rescan(self):
+        """
+        Rebuild the LRU from the directory - every worker's files, oldest
+        use first - and return the names to evict. Caller holds self._lock.
+        """
+        found = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another worker meanwhile
+                found.append((st.st_mtime, entry.name, st.st_size))
+        self._entries.clear()
+        self._total = 0
+        for _, name, nbytes in sorted(found):
+            self._entries[name] = nbytes
+            self._total += nbytes
+        return self._evict()
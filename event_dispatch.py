@@ -0,0 +1,230 @@
+"""
+Outbound operator events (SNS in AWS mode), sent off the request path.
+
+``EventDispatcher.publish`` only appends to a bounded in-process queue; a
+background thread drains it in batches of up to ``batch_size`` and hands
+each batch to ``send_batch`` (``sns_sender`` wraps SNS ``PublishBatch``).
+Failed entries are retried with exponential backoff. When the queue is
+full, or an event runs out of retries, it is appended to ``spill_path``
+(JSON lines) and replayed once the queue has room again - or dropped and
+counted if no spill file is configured. The spill file is flock()ed, so
+every Gunicorn worker can share one. A slow or unavailable SNS therefore
+never delays a login.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - spill file only guarded within one process
+    fcntl = None
+
+try:
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # local mode without boto3
+    BotoCoreError = ClientError = Exception
+
+
+def sns_sender(get_client, topic_arn):
+    """
+    ``send_batch`` for SNS: one PublishBatch call per batch (max 10).
+    ``get_client()`` returns the SNS client - looked up per batch so it is
+    only created once there is something to send.
+    Returns the events that should be retried; sender faults (bad input)
+    are logged and not retried.
+    """
+
+    def send_batch(events):
+        entries = [
+            {"Id": str(i), "Subject": e["subject"][:100], "Message": e["message"]}
+            for i, e in enumerate(events)
+        ]
+        try:
+            res = get_client().publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+        except (BotoCoreError, ClientError) as e:
+            print("SNS Error:", e)
+            return events
+
+        retry = []
+        for failed in res.get("Failed", []):
+            if failed.get("SenderFault"):
+                print("SNS Error:", failed.get("Code"), failed.get("Message"))
+            else:
+                retry.append(events[int(failed["Id"])])
+        return retry
+
+    return send_batch
+
+
+class EventDispatcher:
+    def __init__(
+        self,
+        send_batch,
+        queue_size=1000,
+        batch_size=10,
+        max_retries=5,
+        retry_base=0.2,
+        spill_path=None,
+    ):
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.spill_path = spill_path
+        self._queue = queue.Queue(queue_size)
+        self._spill_lock = threading.Lock()  # also guards _counts
+        self._counts = {"sent": 0, "retried": 0, "spilled": 0, "replayed": 0, "dropped": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-dispatch", daemon=True)
+        self._thread.start()
+
+    def publish(self, subject, message):
+        """Queue one event; never blocks. False if it had to be spilled or dropped."""
+        event = {"subject": subject, "message": message, "attempts": 0}
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self._overflow([event])
+            return False
+
+    def stats(self):
+        with self._spill_lock:
+            stats = dict(self._counts)
+        stats["queued"] = self._queue.qsize()
+        stats["capacity"] = self._queue.maxsize
+        stats["spill_file_bytes"] = self._spill_size()
+        return stats
+
+    def close(self, timeout=5):
+        """Stop the sender after at most ``timeout`` seconds; whatever is left is spilled."""
+        self._closed = True
+        try:
+            self._queue.put_nowait(None)  # wake the sender
+        except queue.Full:
+            pass  # it isn't idle anyway
+        self._thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not None:
+                leftover.append(event)
+        if leftover:
+            self._overflow(leftover)
+
+    # ---------- sender thread ----------
+    def _run(self):
+        while not self._closed:
+            batch = self._take_batch()
+            if batch:
+                self._send(batch)
+            elif self._spill_size():
+                self._replay()
+
+    def _take_batch(self):
+        try:
+            first = self._queue.get(timeout=1.0)
+        except queue.Empty:
+            return []
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not None:
+                batch.append(event)
+        return batch
+
+    def _send(self, batch):
+        while batch and not self._closed:
+            try:
+                failed = self.send_batch(batch)
+            except Exception as e:
+                print("Event dispatch error:", e)
+                failed = batch
+
+            self._count("sent", len(batch) - len(failed))
+            batch = []
+            for event in failed:
+                event["attempts"] += 1
+                if event["attempts"] > self.max_retries:
+                    self._overflow([event])
+                else:
+                    batch.append(event)
+
+            if batch:
+                self._count("retried", len(batch))
+                attempts = max(e["attempts"] for e in batch)
+                time.sleep(min(self.retry_base * 2 ** (attempts - 1), 30))
+        if batch:
+            self._overflow(batch)
+
+    def _count(self, name, n):
+        # publish() and close() overflow from request threads, the rest from the sender
+        with self._spill_lock:
+            self._counts[name] += n
+
+    # ---------- spill file ----------
+    @contextmanager
+    def _spill_locked(self):
+        with self._spill_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.spill_path + ".lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+    def _overflow(self, events):
+        if not self.spill_path:
+            with self._spill_lock:
+                self._counts["dropped"] += len(events)
+            return
+        with self._spill_locked():
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps({"subject": event["subject"], "message": event["message"]}) + "\n")
+            self._counts["spilled"] += len(events)  # _spill_locked() holds _spill_lock
+
+    def _spill_size(self):
+        try:
+            return os.path.getsize(self.spill_path) if self.spill_path else 0
+        except FileNotFoundError:
+            return 0
+
+    def _replay(self):
+        """Move spilled events back into the queue while it has room; the rest stay on disk."""
+        with self._spill_locked():
+            try:
+                with open(self.spill_path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                return
+
+            room = self._queue.maxsize - self._queue.qsize()
+            replay, keep = lines[:room], lines[room:]
+            tmp_path = self.spill_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(keep)
+            os.replace(tmp_path, self.spill_path)
+
+        for line in replay:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            event["attempts"] = 0
+            try:
+                self._queue.put_nowait(event)
+                self._count("replayed", 1)
+            except queue.Full:
+                self._overflow([event])
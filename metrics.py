@@ -0,0 +1,274 @@
+"""
+Request / backend metrics in Prometheus text format, and an opt-in
+sampling profiler for slow requests.
+
+``Metrics`` keeps, per process:
+
+    snapstream_http_requests_total{method,route,status}
+    snapstream_http_request_duration_seconds{method,route}    histogram
+    snapstream_http_request_bytes_total{method,route}         request bodies received
+    snapstream_upload_bytes_total                             bytes of stored uploads
+    snapstream_backend_call_seconds{backend,store,op}         histogram, see ``timed_calls``
+    snapstream_background_errors_total{source}
+
+plus whatever ``add_collector(name, stats_fn)`` sources report (AWS client
+stats, the SNS event queue, caches, ...), flattened into gauges. Routes
+are the URL rule (``/api/media/<media_id>``), never the raw path, so the
+number of series stays bounded. With several Gunicorn workers each
+worker has its own numbers; Prometheus sums them per instance.
+
+``SlowRequestProfiler`` samples the stacks of threads that are serving a
+request every ``interval_ms``. When a request takes longer than
+``threshold_ms`` its samples are appended to ``path`` as folded stacks
+(``route;module:function;... count``), the input format of flamegraph.pl
+and speedscope. Sampling costs a few percent of a core while requests are
+in flight, nothing when idle.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# seconds; upper bounds of the latency histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NAME_UNSAFE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+        self._collectors = {}  # name -> stats() callable
+
+    # ---------- recording ----------
+    def observe_request(self, method, route, status, seconds, request_bytes=0):
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            self._incr("snapstream_http_requests_total", labels + (("status", str(status)),), 1)
+            self._observe("snapstream_http_request_duration_seconds", labels, seconds)
+            if request_bytes:
+                self._incr("snapstream_http_request_bytes_total", labels, request_bytes)
+
+    def observe_call(self, backend, store, op, seconds):
+        with self._lock:
+            self._observe("snapstream_backend_call_seconds", (("backend", backend), ("store", store), ("op", op)), seconds)
+
+    def incr(self, name, value=1, **labels):
+        with self._lock:
+            self._incr(name, tuple(sorted(labels.items())), value)
+
+    def add_collector(self, name, stats_fn):
+        """``stats_fn()`` -> dict of numbers (or dicts of them), read at every scrape."""
+        self._collectors[name] = stats_fn
+
+    # ---------- exposition ----------
+    def render(self):
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.buckets), h.count, h.sum)) for key, h in self._histograms.items()
+            )
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for (name, labels), (buckets, count, total) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for source, stats_fn in sorted(self._collectors.items()):
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                lines.append(f"# collector {source} failed: {type(e).__name__}")
+                continue
+            samples = sorted(_flatten(f"snapstream_{source}", stats, ()))
+            for name, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    # ---------- internal (caller holds self._lock) ----------
+    def _incr(self, name, labels, value):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, seconds):
+        key = (name, labels)
+        h = self._histograms.get(key)
+        if h is None:
+            h = self._histograms[key] = _Histogram()
+        h.observe(seconds)
+
+
+def timed_calls(target, metrics, backend, store):
+    """
+    ``target`` with every public method call timed into
+    ``snapstream_backend_call_seconds{backend,store,op}``. Attribute reads
+    and writes pass straight through.
+    """
+    return _TimedProxy(target, metrics, backend, store)
+
+
+class _TimedProxy:
+    def __init__(self, target, metrics, backend, store):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_record", lambda op, seconds: metrics.observe_call(backend, store, op, seconds))
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name.startswith("_") or not callable(value):
+            return value
+        record = self._record
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+def _flatten(name, stats, labels):
+    """Nested stats dicts -> (metric name, labels, number); inner dict keys become a ``key`` label."""
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield _NAME_UNSAFE.sub("_", f"{name}_{key}"), labels, value
+        elif isinstance(value, dict):
+            nested_values = all(isinstance(v, dict) for v in value.values())
+            if nested_values and value:
+                # e.g. {"operations": {"dynamodb.Query": {"calls": 3}}}
+                for item, fields in value.items():
+                    yield from _flatten(f"{name}_{key}", fields, labels + (("key", str(item)),))
+            else:
+                yield from _flatten(f"{name}_{key}", value, labels)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms, path, interval_ms=5, max_depth=64):
+        self.threshold = threshold_ms / 1000
+        self.path = path
+        self.interval = interval_ms / 1000
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._active = {}  # thread id -> Counter(stack -> samples)
+        self._busy = threading.Event()
+        self._counts = {"sampled_requests": 0, "profiled_requests": 0, "samples": 0}
+        self._thread = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def begin(self):
+        """Start sampling the calling (request) thread; returns the token for ``end``."""
+        tid = threading.get_ident()
+        with self._lock:
+            self._active[tid] = Counter()
+            self._busy.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._thread.start()
+        return tid
+
+    def end(self, token, label, seconds):
+        """Stop sampling; keep the stacks if the request took ``threshold_ms`` or more."""
+        with self._lock:
+            samples = self._active.pop(token, None)
+            if not self._active:
+                self._busy.clear()
+            self._counts["sampled_requests"] += 1
+            if not samples or seconds < self.threshold:
+                return
+            self._counts["profiled_requests"] += 1
+
+        root = label.replace(" ", "_").replace(";", ":")
+        lines = [f"{root};{stack} {n}\n" for stack, n in samples.items()]
+        with self._write_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._active), threshold_ms=self.threshold * 1000)
+
+    # ---------- internal ----------
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for tid, samples in self._active.items():
+                    frame = frames.get(tid)
+                    if frame is None or tid == me:
+                        continue
+                    samples[self._fold(frame)] += 1
+                    self._counts["samples"] += 1
+
+    def _fold(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            stack.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
@@ -0,0 +1,149 @@
+"""
+Per-user publish/subscribe for notifications, streamed to browsers as
+Server-Sent Events.
+
+``add_notification`` publishes every new notification here with its store
+sequence number as the event id. The hub is per process; ``stream`` also
+polls the store, so notifications raised on other workers still arrive. Each open stream is a ``Subscriber`` with
+a bounded buffer; a subscriber that falls more than ``buffer_size`` events
+behind is told to resync instead of silently losing events. Idle streams
+just sleep on a condition variable until something is published or the
+heartbeat interval passes.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+
+class Subscriber:
+    def __init__(self, email, buffer_size):
+        self.email = email
+        self.events = deque()
+        self.buffer_size = buffer_size
+        self.overflowed = False
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def push(self, event):
+        with self.cond:
+            if len(self.events) >= self.buffer_size:
+                self.overflowed = True
+            else:
+                self.events.append(event)
+            self.cond.notify()
+
+    def pop_all(self, timeout):
+        """Wait up to ``timeout`` seconds for events; returns (events, overflowed)."""
+        with self.cond:
+            if not self.events and not self.overflowed and not self.closed:
+                self.cond.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            return events, self.overflowed
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+
+class NotificationHub:
+    def __init__(self, buffer_size=100):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._subscribers = {}  # email -> set(Subscriber)
+
+    def subscribe(self, email):
+        sub = Subscriber(email, self.buffer_size)
+        with self._lock:
+            self._subscribers.setdefault(email, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            subs = self._subscribers.get(sub.email)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.email]
+
+    def publish(self, email, event_id, payload):
+        with self._lock:
+            subs = list(self._subscribers.get(email, ()))
+        for sub in subs:
+            sub.push((event_id, payload))
+
+    def disconnect(self, email):
+        """Close every open stream of one user (logout / account deletion)."""
+        with self._lock:
+            subs = self._subscribers.pop(email, set())
+        for sub in subs:
+            sub.close()
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def format_event(event_id, payload, event="notification"):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream(hub, sub, since, last_id=None, heartbeat=15, limit=100):
+    """
+    SSE generator. ``since(after_seq, limit)`` reads ``[(seq, payload)]``
+    from the notification store, which is the source of truth: it replays
+    what a reconnecting client (``last_id`` = its Last-Event-ID) missed, and
+    is polled every ``heartbeat`` seconds to pick up notifications raised on
+    other workers. The hub only makes this worker's own ones arrive at once.
+    Event ids never go down, so nothing is sent twice; a client that missed
+    more than ``limit`` is told to resync instead.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        if last_id is None:
+            # a new stream starts from the newest stored notification
+            newest = since(0, 1)
+            last_id = newest[-1][0] if newest else 0
+            fetched = []
+        else:
+            fetched = since(last_id, limit)
+        polled_at = time.monotonic()
+
+        while True:
+            if len(fetched) >= limit:
+                last_id = max(last_id, fetched[-1][0])
+                yield format_event(last_id, {}, event="resync")
+                fetched = []
+            sent = False
+            for event_id, payload in fetched:
+                if event_id > last_id:
+                    last_id = event_id
+                    sent = True
+                    yield format_event(event_id, payload)
+            if sub.closed:
+                return
+
+            events, overflowed = sub.pop_all(heartbeat)
+            if overflowed:
+                # Client reconnects from the newest id and reloads its list
+                newest = since(last_id, 1)
+                yield format_event(newest[-1][0] if newest else last_id, {}, event="resync")
+                return
+            for event_id, payload in events:
+                if event_id > last_id:
+                    last_id = event_id
+                    sent = True
+                    yield format_event(event_id, payload)
+
+            fetched = []
+            if time.monotonic() - polled_at >= heartbeat:
+                fetched = since(last_id, limit)
+                polled_at = time.monotonic()
+                if not fetched and not sent:
+                    yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,309 @@
+"""
+Where blob bodies live: the local filesystem or an S3 bucket.
+
+``BlobStore`` owns naming and reference counting; these classes only move
+bytes. Both expose the same small interface:
+
+    put(src_path, key, content_type)   adopt a local file under ``key`` (src is consumed)
+    exists(key)
+    delete_many(keys)                  batched where the backend allows it
+    local_path(key)                    a readable local file (analysis, thumbnails)
+    download_url(key, filename, download)   presigned GET URL, or None = serve it ourselves
+    presign_put(key, content_type, size)    browser-direct upload URL, or None if unsupported
+    head(key)                          {"size": bytes} or None
+    list_older(prefix, before)         keys under ``prefix`` last modified before ``before`` (epoch seconds)
+    remote                             False when local_path() needs no download
+
+``open_objects(url, ...)`` picks one: ``""`` / ``file://<dir>`` or
+``s3://bucket/prefix?endpoint_url=http://localhost:9000``.
+"""
+
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+S3_DELETE_MAX = 1000  # keys per DeleteObjects call
+CACHE_RESCAN_EVERY = 50  # downloads between rescans of the shared local cache directory
+
+
+def open_objects(url, local_root, cache_dir, cache_bytes, aws=None):
+    if not url or url.startswith("file://"):
+        return LocalObjects(url[len("file://"):] if url else local_root)
+
+    if url.startswith("s3://"):
+        from aws_clients import AWSClients
+
+        parts = urlsplit(url)
+        options = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        aws = aws or AWSClients.from_env(options.get("region"))
+        return S3Objects(
+            aws,
+            parts.netloc,
+            prefix=parts.path.lstrip("/"),
+            cache_dir=cache_dir,
+            cache_bytes=cache_bytes,
+            endpoint_url=options.get("endpoint_url"),
+        )
+
+    raise ValueError(f"Unsupported object storage URL: {url}")
+
+
+class LocalObjects:
+    remote = False  # local_path() is instant
+
+    def __init__(self, root, remove_workers=8):
+        self.root = root
+        self._remover = ThreadPoolExecutor(max_workers=remove_workers, thread_name_prefix="blob-remove")
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def put(self, src_path, key, content_type=None):
+        dest = self.path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src_path, dest)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if len(keys) == 1:
+            self._remove(keys[0])
+        else:
+            # unlinks block on the disk, not the GIL: overlap them
+            list(self._remover.map(self._remove, keys))
+
+    def _remove(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self.path(key)
+
+    def download_url(self, key, filename, download=False):
+        return None
+
+    def presign_put(self, key, content_type, size):
+        return None
+
+    def head(self, key):
+        try:
+            return {"size": os.path.getsize(self.path(key))}
+        except FileNotFoundError:
+            return None
+
+    def list_older(self, prefix, before):
+        keys = []
+        for dirpath, _, filenames in os.walk(self.path(prefix)):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < before:
+                        keys.append(os.path.relpath(path, self.root).replace(os.sep, "/"))
+                except FileNotFoundError:
+                    pass
+        return keys
+
+
+class S3Objects:
+    """
+    Objects in ``bucket`` under ``prefix``. Large files go up as parallel
+    multipart uploads (boto3 TransferConfig). Local copies needed for
+    analysis and thumbnails are kept in ``cache_dir``, least recently used
+    evicted past ``cache_bytes``. Every worker shares that directory, so
+    this worker's index is only a hint: ``local_path`` checks the file is
+    still there (and touches its mtime, the shared "last used" clock), and
+    the budget is enforced against a rescan of the directory.
+    """
+
+    remote = True  # local_path() may download
+
+    def __init__(
+        self,
+        aws,
+        bucket,
+        prefix="",
+        cache_dir="cache/objects",
+        cache_bytes=1024 * 1024 * 1024,
+        endpoint_url=None,
+        multipart_threshold=16 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=8,
+        url_ttl=900,
+    ):
+        from boto3.s3.transfer import TransferConfig
+
+        self.aws = aws
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+        self.endpoint_url = endpoint_url
+        self.url_ttl = url_ttl
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes
+        self._lock = threading.Lock()
+        self._cached = OrderedDict()  # key -> bytes, least recently used first
+        self._cached_total = 0
+        self._adopted = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def s3(self):
+        return self.aws.client("s3", self.endpoint_url)
+
+    def put(self, src_path, key, content_type=None):
+        extra = {"ContentType": content_type} if content_type else None
+        self.s3.upload_file(src_path, self.bucket, self.prefix + key, ExtraArgs=extra, Config=self.transfer_config)
+        self._adopt(src_path, key)
+
+    def exists(self, key):
+        return self.head(key) is not None
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), S3_DELETE_MAX):
+            chunk = keys[i:i + S3_DELETE_MAX]
+            res = self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self.prefix + k} for k in chunk], "Quiet": True},
+            )
+            for error in res.get("Errors", []):
+                print("S3 delete error:", error.get("Key"), error.get("Code"))
+        for key in keys:
+            self._forget(key)
+
+    def local_path(self, key):
+        path = self._cache_path(key)
+        try:
+            os.utime(path)
+            nbytes = os.path.getsize(path)
+        except FileNotFoundError:
+            nbytes = None  # never downloaded, or evicted by another worker
+        with self._lock:
+            if nbytes is not None:
+                self._cached_total += nbytes - self._cached.pop(key, 0)
+                self._cached[key] = nbytes
+                return path
+            nbytes = self._cached.pop(key, None)
+            if nbytes is not None:
+                self._cached_total -= nbytes
+        # unique name: another worker may be downloading the same key
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            self.s3.download_file(self.bucket, self.prefix + key, tmp_path, Config=self.transfer_config)
+        except BaseException:
+            self._remove_file(tmp_path)
+            raise
+        self._adopt(tmp_path, key)
+        return path
+
+    def download_url(self, key, filename, download=False):
+        params = {"Bucket": self.bucket, "Key": self.prefix + key}
+        if download:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.s3.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_ttl)
+
+    def presign_put(self, key, content_type, size):
+        """
+        PUT URL for ``key``, expiring after ``url_ttl``. S3 does not hold the
+        client to ``size``: the caller checks ``head(key)`` once the upload is
+        reported done and deletes a mismatch.
+        """
+        return self.s3.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": self.prefix + key, "ContentType": content_type},
+            ExpiresIn=self.url_ttl,
+        )
+
+    def head(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            res = self.s3.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": res["ContentLength"]}
+
+    def list_older(self, prefix, before):
+        pages = self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix + prefix)
+        return [
+            obj["Key"][len(self.prefix):]
+            for page in pages
+            for obj in page.get("Contents", [])
+            if obj["LastModified"].timestamp() < before
+        ]
+
+    # ---------- local copy cache ----------
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _adopt(self, src_path, key):
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(src_path, path)
+        nbytes = os.path.getsize(path)
+        with self._lock:
+            self._cached_total += nbytes - self._cached.pop(key, 0)
+            self._cached[key] = nbytes
+            self._adopted += 1
+            if self._cached_total > self.cache_bytes or self._adopted % CACHE_RESCAN_EVERY == 0:
+                self._rescan()
+            evicted = []
+            while self._cached_total > self.cache_bytes and len(self._cached) > 1:
+                old, old_bytes = self._cached.popitem(last=False)
+                self._cached_total -= old_bytes
+                evicted.append(old)
+        for old in evicted:
+            self._remove_local(old)
+
+    def _rescan(self):
+        # caller holds self._lock: rebuild the LRU from every worker's files, oldest use first
+        found = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith(".part"):
+                    continue  # a download in progress
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(path, self.cache_dir).replace(os.sep, "/")
+                found.append((st.st_mtime, key, st.st_size))
+        self._cached.clear()
+        self._cached_total = 0
+        for _, key, nbytes in sorted(found):
+            self._cached[key] = nbytes
+            self._cached_total += nbytes
+
+    def _forget(self, key):
+        with self._lock:
+            nbytes = self._cached.pop(key, None)
+            if nbytes is not None:
+                self._cached_total -= nbytes
+        self._remove_local(key)
+
+    def _remove_local(self, key):
+        self._remove_file(self._cache_path(key))
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,126 @@
+"""
+Background removal of deleted accounts' data.
+
+Deleting an account only removes the user row, records a job in
+``storage.ReclaimJobs`` and logs the user out. ``Reclaimer`` - one thread
+per worker - then works through each job in batches of ``batch_size``
+media (records, search entries, thumbnails, blob references), saving
+progress after every batch and pausing ``pause`` seconds in between so a
+large library doesn't crowd out live requests. When no media is left,
+``finish_owner`` clears the rest (notifications, counters).
+
+Jobs are durable: a worker that restarts picks unfinished jobs up again
+on its next poll. A lease of ``lease_seconds`` keeps two workers from
+working on the same job; if the holder dies, another takes over once it
+expires. Every step is idempotent, so redoing a batch is harmless.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class Reclaimer:
+    def __init__(
+        self,
+        jobs,
+        reclaim_batch,
+        finish_owner,
+        batch_size=100,
+        pause=0.05,
+        lease_seconds=60,
+        poll_seconds=30,
+    ):
+        self.jobs = jobs
+        self.reclaim_batch = reclaim_batch  # reclaim_batch(email, limit) -> media removed (0 = none left)
+        self.finish_owner = finish_owner  # finish_owner(email): everything besides media
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._closed = False
+        self._counts = {"jobs_finished": 0, "media_reclaimed": 0, "batches": 0, "errors": 0}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="reclaimer", daemon=True)
+        self._thread.start()
+
+    def submit(self, email):
+        """Queue reclamation of ``email``'s data; False if it is already queued."""
+        job = {"email": email, "state": "media", "media_reclaimed": 0, "batches": 0, "started_at": time.time()}
+        started = self.jobs.start(job)
+        self._wake.set()
+        return started
+
+    def status(self, email):
+        """The job's progress, or None once it is finished (or never existed)."""
+        return self.jobs.get(email)
+
+    def stats(self):
+        return dict(self._counts, pending=len(self.jobs.pending()))
+
+    def run_pending(self):
+        """Work through every job this worker can claim; returns how many finished."""
+        finished = 0
+        for email in self.jobs.pending():
+            if self._closed:
+                break
+            try:
+                job = self.jobs.claim(email, self.worker, self._lease())
+                if job is None:
+                    continue  # another worker has it
+                finished += self._process(job)
+            except Exception as e:
+                self._error(email, e)
+        return finished
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+
+    # ---------- internal ----------
+    def _run(self):
+        while not self._closed:
+            self._wake.clear()
+            try:
+                self.run_pending()
+            except Exception as e:
+                # listing the jobs failed (backend unreachable?): keep the thread, retry next poll
+                self._error(None, e)
+            self._wake.wait(self.poll_seconds)
+
+    def _error(self, email, e):
+        self._counts["errors"] += 1  # exported as snapstream_reclaim_errors via stats()
+        print("Reclaim error:", email or "listing jobs", e)
+
+    def _lease(self):
+        return time.time() + self.lease_seconds
+
+    def _process(self, job):
+        email = job["email"]
+        while job["state"] == "media" and not self._closed:
+            removed = self.reclaim_batch(email, self.batch_size)
+            if removed:
+                job["media_reclaimed"] += removed
+                job["batches"] += 1
+                self._counts["media_reclaimed"] += removed
+                self._counts["batches"] += 1
+            else:
+                job["state"] = "finishing"
+            job["updated_at"] = time.time()
+            if not self.jobs.save(job, self.worker, self._lease()):
+                return 0  # lease lost - the new holder carries on from the saved progress
+            if removed and self.pause:
+                time.sleep(self.pause)
+
+        if job["state"] != "finishing":
+            return 0  # closing
+        self.finish_owner(email)
+        self.jobs.finish(email)
+        self._counts["jobs_finished"] += 1
+        return 1
@@ -0,0 +1,365 @@
+"""
+Per-owner search index over media tags and filename tokens.
+
+Each owner gets an inverted index, loaded from the media store the first
+time they search:
+
+    tags   exact lowercased tag -> media ids
+    terms  filename / tag token -> media ids
+
+The keys of both are also kept in sorted lists, so a prefix (``sun*``) is
+a bisect to the first matching key plus a walk over the keys that share
+the prefix. Type group and upload month facets are kept the same way.
+A query intersects the smallest posting sets first, so its cost follows
+the number of matches, not the size of the library.
+
+Uploads and deletes made by this worker update the index directly. With
+a shared backend (SQLite, DynamoDB) other workers' writes are picked up
+through the owner's media version (``storage.Versions``), which every
+media write bumps along with the ids it touched: each index remembers the
+version it reflects, this worker reports its own bumps with ``seen()``,
+and a search that finds the stored version moved on without it re-reads
+just the media those versions changed (``changes``). Only when that is
+unknown - more than ``Versions.CHANGE_LOG`` versions behind, or a bump
+without ids - is the owner reloaded. ``version=None`` never reloads
+(memory backend: this worker sees every write).
+"""
+
+import base64
+import bisect
+import json
+import re
+import threading
+from collections import Counter, OrderedDict
+
+TYPE_GROUPS = {
+    "jpg": "image",
+    "jpeg": "image",
+    "png": "image",
+    "gif": "image",
+    "mp4": "video",
+    "mp3": "audio",
+    "wav": "audio",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_QUERY_SEPARATORS = re.compile(r"[^a-z0-9|*]+")
+
+
+def tokens(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def type_group(ext):
+    return TYPE_GROUPS.get((ext or "").lower(), "other")
+
+
+class _Postings:
+    """key -> set of media ids, with the keys in sorted order for prefix lookups."""
+
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+
+    def add(self, key, media_id):
+        ids = self.ids.get(key)
+        if ids is None:
+            ids = self.ids[key] = set()
+            bisect.insort(self.keys, key)
+        ids.add(media_id)
+
+    def discard(self, key, media_id):
+        ids = self.ids.get(key)
+        if ids is None:
+            return
+        ids.discard(media_id)
+        if not ids:
+            del self.ids[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def match(self, pattern):
+        """Ids for an exact key, or for every key starting with it when it ends in ``*``."""
+        if not pattern.endswith("*"):
+            return self.ids.get(pattern, set())
+        prefix = pattern[:-1]
+        matched = set()
+        for i in range(bisect.bisect_left(self.keys, prefix), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            matched |= self.ids[key]
+        return matched
+
+
+class _OwnerIndex:
+    def __init__(self, version=None):
+        self.media = {}  # id -> (sort key, type group, month, (tags, terms))
+        self.tags = _Postings()
+        self.terms = _Postings()
+        self.types = _Postings()
+        self.months = _Postings()
+        self.version = version  # the owner's media version this index reflects
+
+    def add(self, media):
+        media_id = media["id"]
+        if media_id in self.media:
+            return
+        group = type_group(media.get("type"))
+        month = (media.get("uploaded_at") or "")[:7]
+        tags, terms = self._keys(media)
+        self.media[media_id] = ((media.get("uploaded_at") or "", media_id), group, month, (tags, terms))
+        for tag in tags:
+            self.tags.add(tag, media_id)
+        for term in terms:
+            self.terms.add(term, media_id)
+        self.types.add(group, media_id)
+        self.months.add(month, media_id)
+
+    def remove(self, media_id):
+        entry = self.media.pop(media_id, None)
+        if entry is None:
+            return
+        _, group, month, (tags, terms) = entry
+        for tag in tags:
+            self.tags.discard(tag, media_id)
+        for term in terms:
+            self.terms.discard(term, media_id)
+        self.types.discard(group, media_id)
+        self.months.discard(month, media_id)
+
+    @staticmethod
+    def _keys(media):
+        tags = {t.strip().lower() for t in media.get("tags") or [] if t.strip()}
+        terms = set(tokens(media.get("filename")))
+        for tag in tags:
+            terms.update(tokens(tag))
+        return tags, terms
+
+
+class SearchIndex:
+    def __init__(self, media_store, version=None, changes=None, max_owners=1000, max_catch_up=64):
+        self.media_store = media_store
+        self.version = version  # version(email) -> the owner's current media version, see the module docstring
+        self.changes = changes  # changes(email, versions) -> {version: media ids}, see storage.Versions
+        self.max_owners = max_owners
+        self.max_catch_up = max_catch_up  # versions behind past which a reload is cheaper
+        self._lock = threading.Lock()
+        self._owners = OrderedDict()  # email -> _OwnerIndex, least recently used first
+        self._loading = {}  # email -> writes seen while its index was being loaded
+        self._counts = {"loads": 0, "catch_ups": 0, "caught_up_media": 0}
+
+    # ---------- maintenance (called after the media store write) ----------
+    def add(self, media):
+        self._apply([(media["email"], "add", media)])
+
+    def remove(self, media):
+        self.remove_many([media])
+
+    def remove_many(self, media_list):
+        self._apply([(m["email"], "remove", m["id"]) for m in media_list])
+
+    def update_many(self, media_list):
+        """Re-index records whose tags or filename changed."""
+        ops = []
+        for m in media_list:
+            ops += [(m["email"], "remove", m["id"]), (m["email"], "add", m)]
+        self._apply(ops)
+
+    def seen(self, email, version):
+        """
+        This worker bumped ``email``'s media version to ``version`` (after
+        applying its own change here). If that bump directly follows the
+        version the index reflects, nobody else wrote in between: keep it.
+        """
+        with self._lock:
+            index = self._owners.get(email)
+            if index is not None and index.version == version - 1:
+                index.version = version
+
+    def drop_owner(self, email):
+        with self._lock:
+            self._owners.pop(email, None)
+            self._loading.pop(email, None)
+
+    # ---------- queries ----------
+    def search(
+        self,
+        email,
+        q="",
+        tags=(),
+        match_all=True,
+        type=None,
+        month=None,
+        oldest_first=False,
+        limit=None,
+        cursor=None,
+        facets=False,
+    ):
+        """
+        Media matching every ``q`` term (``a|b`` = either, ``sun*`` = prefix;
+        terms come from filenames and tags) and the ``tags`` (all of them,
+        or any with ``match_all=False``), narrowed to a type group / month.
+        Returns ``(items, next_cursor, total, facets)``; with ``facets=True``
+        those count the matches per type group and month before the two
+        filters, otherwise they are None.
+        """
+        after = self._parse_cursor(cursor)
+
+        groups = []  # each: list of (field, pattern) alternatives, any of which may match
+        # punctuation splits words the same way it split the indexed filenames
+        for term in _QUERY_SEPARATORS.sub(" ", q.lower()).split():
+            alternatives = [("terms", alt) for alt in term.split("|") if alt]
+            if alternatives:
+                groups.append(alternatives)
+        tags = [t.strip().lower() for t in tags if t.strip()]
+        if tags and match_all:
+            groups.extend([("tags", tag)] for tag in tags)
+        elif tags:
+            groups.append([("tags", tag) for tag in tags])
+
+        current = self.version(email) if self.version is not None else None
+        with self._lock:
+            index = self._owners.get(email)
+        if index is None or (index.version != current and not self._catch_up(email, index, current)):
+            index = self._load(email, current)
+
+        with self._lock:
+            matched = self._match(index, groups)
+            if facets:
+                # counted over the matches, not the library
+                facets = {
+                    "type": dict(Counter(index.media[m][1] for m in matched)),
+                    "month": dict(Counter(index.media[m][2] for m in matched)),
+                }
+            else:
+                facets = None
+            if type:
+                matched = matched & index.types.ids.get(type, set())
+            if month:
+                matched = matched & index.months.ids.get(month, set())
+            keys = sorted((index.media[m][0] for m in matched), reverse=not oldest_first)
+
+        total = len(keys)
+        if after is not None:
+            start = bisect.bisect_right(keys, after) if oldest_first else _bisect_desc(keys, after)
+            keys = keys[start:]
+        next_cursor = None
+        if limit is not None and len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = self._make_cursor(keys[-1])
+
+        items = self.media_store.get_many([media_id for _, media_id in keys], email)
+        return items, next_cursor, total, facets
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counts,
+                owners=len(self._owners),
+                media=sum(len(i.media) for i in self._owners.values()),
+            )
+
+    # ---------- internal ----------
+    def _match(self, index, groups):
+        if not groups:
+            return set(index.media)
+        sets = []
+        for alternatives in groups:
+            union = set()
+            for field, pattern in alternatives:
+                union |= getattr(index, field).match(pattern)
+            if not union:
+                return set()
+            sets.append(union)
+        sets.sort(key=len)
+        matched = set(sets[0])
+        for other in sets[1:]:
+            matched &= other
+            if not matched:
+                break
+        return matched
+
+    def _catch_up(self, email, index, current):
+        """
+        Bring ``index`` from its version to ``current`` by re-reading only the
+        media those versions changed; False if the change log can't say which.
+        """
+        behind = index.version is not None and current is not None and 0 < current - index.version
+        if not behind or current - index.version > self.max_catch_up or self.changes is None:
+            return False
+        wanted = range(index.version + 1, current + 1)
+        changes = self.changes(email, wanted)
+        if len(changes) != len(wanted):
+            return False  # overwritten, or bumped without ids
+        media_ids = list(dict.fromkeys(media_id for v in wanted for media_id in changes[v]))
+        # read after the version: at least as new as ``current``
+        records = self.media_store.get_many(media_ids, email)
+        with self._lock:
+            if index.version >= current:
+                return True  # another search (or a reload) got there first
+            for media_id in media_ids:
+                index.remove(media_id)
+            for media in records:
+                index.add(media)
+            index.version = current
+            self._counts["catch_ups"] += 1
+            self._counts["caught_up_media"] += len(media_ids)
+        return True
+
+    def _load(self, email, version):
+        # ``version`` was read before the listing: a write racing the load leaves
+        # the index behind the stored version, so the next search reloads again
+        with self._lock:
+            self._loading[email] = []
+            self._counts["loads"] += 1
+        index = _OwnerIndex(version)
+        try:
+            for media in self.media_store.list_owner(email):
+                index.add(media)
+        except Exception:
+            with self._lock:
+                self._loading.pop(email, None)
+            raise
+        with self._lock:
+            # replay this worker's writes that raced the load (both operations are idempotent)
+            for op, arg in self._loading.pop(email, []):
+                index.add(arg) if op == "add" else index.remove(arg)
+            self._owners[email] = index
+            self._owners.move_to_end(email)
+            while len(self._owners) > self.max_owners:
+                self._owners.popitem(last=False)
+        return index
+
+    def _apply(self, ops):
+        with self._lock:
+            for email, op, arg in ops:
+                pending = self._loading.get(email)
+                if pending is not None:
+                    pending.append((op, arg))
+                index = self._owners.get(email)
+                if index is not None:
+                    index.add(arg) if op == "add" else index.remove(arg)
+
+    def _make_cursor(self, key):
+        return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+    def _parse_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            uploaded_at, media_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (str(uploaded_at), str(media_id))
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+
+
+def _bisect_desc(keys, after):
+    """First position past ``after`` in a descending list."""
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid] >= after:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,201 @@
+"""
+Server-side sessions: the cookie holds only an opaque random id, the data
+lives in a ``storage.Sessions`` backend (an LRU in memory://, a table in
+SQLite or DynamoDB), so every worker sees the same logins.
+
+A request that leaves its session unchanged writes nothing and sends no
+Set-Cookie; a visitor who never logs in gets no id and no record at all.
+Records expire ``ttl`` seconds after their last use - the expiry is moved
+forward at most once per ``ttl / 2``, not on every request. Only a SHA-256
+of the id is stored, so a copy of the table can't be replayed as cookies.
+
+Logging in stamps the record with the user's session generation
+(``generation(email)``) and issues a new id. Bumping the generation logs
+the user out everywhere with one write: older records are dropped the
+next time they are used, on any worker. Each worker keeps the generations
+it has read for ``generation_ttl`` seconds, so a request costs one store
+read, not two; ``forget(email)`` drops this worker's copy right after a
+bump, and other workers pick it up when their copy expires. A record
+stamped with a different generation than the cached one is always checked
+against the store before it is dropped.
+"""
+
+import hashlib
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+_SID = re.compile(r"[A-Za-z0-9_-]{22}")  # secrets.token_urlsafe(16)
+
+
+def _key(sid):
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, record=None, stale_cookie=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.record = record  # as loaded from the store; None for a new session
+        self.stale_cookie = stale_cookie  # the request sent an id that is no longer valid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store, generation, ttl=7 * 24 * 3600, skip_paths=(), generation_ttl=5, max_generations=10000):
+        self.store = store
+        self.generation = generation  # generation(email) -> int, see the module docstring
+        self.ttl = ttl
+        self.skip_paths = tuple(skip_paths)  # path prefixes served without a session (static files)
+        self.generation_ttl = generation_ttl
+        self.max_generations = max_generations
+        self._lock = threading.Lock()
+        self._generations = OrderedDict()  # email -> (generation, read at), least recently read first
+        self._forgets = 0  # bumped by forget(): a read that overlapped one isn't cached
+        self._counts = {
+            "loaded": 0, "unknown": 0, "expired": 0, "revoked": 0,
+            "created": 0, "saved": 0, "touched": 0, "deleted": 0,
+            "generation_reads": 0,
+        }
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or request.path.startswith(self.skip_paths):
+            return ServerSession()
+        if not _SID.fullmatch(sid):
+            self._count("unknown")  # e.g. a signed cookie from before server-side sessions
+            return ServerSession(stale_cookie=True)
+
+        key = _key(sid)
+        record = self.store.get(key)
+        if record is None:
+            self._count("unknown")
+            return ServerSession(stale_cookie=True)
+        if record["expires_at"] <= time.time():
+            self.store.delete(key)
+            self._count("expired")
+            return ServerSession(stale_cookie=True)
+
+        email = record["data"].get("user_email")
+        # a mismatch with this worker's copy may only mean the copy is out of date
+        if email and record["generation"] != self._generation(email):
+            if record["generation"] != self._generation(email, fresh=True):
+                self.store.delete(key)
+                self._count("revoked")
+                return ServerSession(stale_cookie=True)
+
+        self._count("loaded")
+        return ServerSession(record["data"], sid, record)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(_key(session.sid))
+                self._count("deleted")
+            if session.sid is not None or session.stale_cookie:
+                response.delete_cookie(
+                    self.get_cookie_name(app),
+                    domain=self.get_cookie_domain(app),
+                    path=self.get_cookie_path(app),
+                    secure=self.get_cookie_secure(app),
+                    httponly=self.get_cookie_httponly(app),
+                    samesite=self.get_cookie_samesite(app),
+                )
+            return
+
+        now = time.time()
+        if not session.modified:
+            if session.record["expires_at"] - now < self.ttl / 2:
+                self.store.touch(_key(session.sid), now + self.ttl)
+                self._count("touched")
+                if session.permanent:
+                    self._set_cookie(app, session, response, session.sid)
+            return
+
+        sid = session.sid
+        email = session.get("user_email")
+        if sid is None or email != session.record["data"].get("user_email"):
+            # a login (or a new session): fresh id, so one handed out before the login is worthless
+            if sid is not None:
+                self.store.delete(_key(sid))
+            sid = secrets.token_urlsafe(16)
+            generation = self._generation(email, fresh=True) if email else 0
+            self._count("created")
+        else:
+            generation = session.record["generation"]
+            self._count("saved")
+
+        self.store.put(_key(sid), {"data": dict(session), "generation": generation, "expires_at": now + self.ttl})
+        if sid != session.sid or session.permanent:
+            self._set_cookie(app, session, response, sid)
+
+    def forget(self, email):
+        """Drop this worker's copy of ``email``'s generation; call right after bumping it."""
+        with self._lock:
+            self._generations.pop(email, None)
+            self._forgets += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, cached_generations=len(self._generations))
+
+    # ---------- internal ----------
+    def _generation(self, email, fresh=False):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._generations.get(email)
+            if not fresh and cached is not None and now - cached[1] < self.generation_ttl:
+                return cached[0]
+            forgets = self._forgets
+            self._counts["generation_reads"] += 1
+
+        generation = self.generation(email)
+        with self._lock:
+            if self._forgets == forgets:
+                self._generations[email] = (generation, now)
+                self._generations.move_to_end(email)
+                while len(self._generations) > self.max_generations:
+                    self._generations.popitem(last=False)
+        return generation
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _set_cookie(self, app, session, response, sid):
+        response.set_cookie(
+            self.get_cookie_name(app),
+            sid,
+            expires=self.get_expiration_time(app, session),
+            domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app),
+            secure=self.get_cookie_secure(app),
+            httponly=self.get_cookie_httponly(app),
+            samesite=self.get_cookie_samesite(app),
+        )
@@ -4,6 +4,7 @@
  */
 
 const API_BASE_URL = '/api';
+const RESPONSE_CACHE_PREFIX = 'snapstream:get:';
 
 // API Helper Functions
 const api = {
@@ -45,6 +46,59 @@ const api = {
     }
   },
   
+  /**
+   * GET a read API through a per-tab cache: the stored ETag goes out as
+   * If-None-Match and a 304 is answered from sessionStorage, so an
+   * unchanged page costs one small round trip. Resolves to { ok, status, data }.
+   */
+  async cachedGet(url) {
+    const key = RESPONSE_CACHE_PREFIX + url;
+    let cached = null;
+    try {
+      cached = JSON.parse(sessionStorage.getItem(key));
+    } catch (e) {}
+
+    const headers = {};
+    if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+
+    // no-store: validators are ours, the browser's HTTP cache stays out of it
+    const res = await fetch(url, { method: 'GET', credentials: 'include', cache: 'no-store', headers });
+    if (res.status === 304 && cached) {
+      return { ok: true, status: 200, data: cached.data };
+    }
+
+    const data = await res.json();
+    const etag = res.headers.get('ETag');
+    if (res.ok && etag) {
+      this.cachePut(key, { etag, data });
+    } else if (cached) {
+      sessionStorage.removeItem(key);
+    }
+    return { ok: res.ok, status: res.status, data };
+  },
+
+  cachePut(key, entry) {
+    const value = JSON.stringify(entry);
+    try {
+      sessionStorage.setItem(key, value);
+    } catch (e) {
+      // quota: start over rather than keep old pages around
+      this.clearCache();
+      try {
+        sessionStorage.setItem(key, value);
+      } catch (e2) {}
+    }
+  },
+
+  /**
+   * Forget every cached response (logout / account switch)
+   */
+  clearCache() {
+    Object.keys(sessionStorage)
+      .filter((k) => k.startsWith(RESPONSE_CACHE_PREFIX))
+      .forEach((k) => sessionStorage.removeItem(k));
+  },
+
   /**
    * GET request
    */
@@ -155,6 +155,9 @@ async function updateAuthUI() {
     const uname = user.username || "User";
     if (usernameDisplay) usernameDisplay.textContent = uname;
     if (userAvatar) userAvatar.textContent = uname.charAt(0).toUpperCase();
+
+    startNotificationStream();
+    loadUnreadBadge();
   } else {
     // not logged in
     if (authButtons) authButtons.classList.remove("hidden");
@@ -165,6 +168,86 @@ async function updateAuthUI() {
   }
 }
 
+/**
+ * Live notifications over Server-Sent Events (GET /api/notifications/stream).
+ * EventSource reconnects by itself and sends Last-Event-ID, so the server
+ * replays anything missed while disconnected; the last id seen is also kept
+ * in sessionStorage and sent as ?last_id= when the next page opens a stream.
+ * Pages listen for the "snapstream:notification" window event instead of
+ * polling, and for "snapstream:resync" when too much was missed to replay.
+ */
+const LAST_EVENT_KEY = "snapstream:sse:last-id";
+let notificationStream = null;
+
+function startNotificationStream() {
+  if (notificationStream || !window.EventSource) return;
+
+  const lastId = sessionStorage.getItem(LAST_EVENT_KEY);
+  const url = "/api/notifications/stream" + (lastId ? `?last_id=${encodeURIComponent(lastId)}` : "");
+  notificationStream = new EventSource(url, { withCredentials: true });
+
+  notificationStream.addEventListener("notification", (e) => {
+    let note;
+    try {
+      note = JSON.parse(e.data);
+    } catch (err) {
+      return;
+    }
+    rememberLastEvent(e);
+
+    window.dispatchEvent(new CustomEvent("snapstream:notification", { detail: note }));
+    showToast(note.message, "info", note.title);
+    setUnreadBadge(unreadCount + 1);
+  });
+
+  // The server skipped ahead: reload the badge and let pages reload their lists
+  notificationStream.addEventListener("resync", (e) => {
+    rememberLastEvent(e);
+    loadUnreadBadge();
+    window.dispatchEvent(new CustomEvent("snapstream:resync"));
+  });
+}
+
+function rememberLastEvent(e) {
+  if (e.lastEventId) sessionStorage.setItem(LAST_EVENT_KEY, e.lastEventId);
+}
+
+/**
+ * Unread badge on the Notifications sidebar link (GET /api/notifications/unread-count)
+ */
+let unreadCount = 0;
+
+async function loadUnreadBadge() {
+  try {
+    const { ok, data } = await api.cachedGet("/api/notifications/unread-count");
+    if (ok && data.success) setUnreadBadge(data.unread);
+  } catch (err) {}
+}
+
+function setUnreadBadge(count) {
+  unreadCount = count;
+
+  document.querySelectorAll('.sidebar-link[href="/notifications"]').forEach((link) => {
+    let badge = link.querySelector(".nav-unread-badge");
+    if (!badge) {
+      badge = document.createElement("span");
+      badge.className = "badge badge-danger nav-unread-badge";
+      badge.style.marginLeft = "auto";
+      link.appendChild(badge);
+    }
+    badge.textContent = count > 99 ? "99+" : String(count);
+    badge.classList.toggle("hidden", count === 0);
+  });
+}
+
+function stopNotificationStream() {
+  if (notificationStream) {
+    notificationStream.close();
+    notificationStream = null;
+  }
+  sessionStorage.removeItem(LAST_EVENT_KEY);
+}
+
 /**
  * Check if user is authenticated (SESSION BASED)
  */
@@ -190,6 +273,8 @@ async function requireAuth() {
  * Logout user (SESSION + localStorage clear)
  */
 async function logout() {
+  stopNotificationStream();
+
   try {
     await fetch("/api/logout", {
       method: "POST",
@@ -197,6 +282,8 @@ async function logout() {
     });
   } catch (e) {}
 
+  api.clearCache();
+
   // clear old localStorage (optional but recommended)
   localStorage.removeItem("authToken");
   localStorage.removeItem("user");
@@ -264,4 +351,5 @@ window.showToast = showToast;
 window.logout = logout;
 window.updateAuthUI = updateAuthUI;
 window.requireAuth = requireAuth;
+window.setUnreadBadge = setUnreadBadge;
 window.isAuthenticated = isAuthenticated;
@@ -27,14 +27,9 @@ async function initDashboard() {
  */
 async function loadDashboardStats() {
   try {
-    const res = await fetch("/api/dashboard/stats", {
-      method: "GET",
-      credentials: "include",
-    });
+    const { ok, data } = await api.cachedGet("/api/dashboard/stats");
 
-    const data = await res.json();
-
-    if (!res.ok || !data.success) {
+    if (!ok || !data.success) {
       console.log("Stats API error:", data);
       return;
     }
@@ -72,14 +67,9 @@ async function loadRecentActivity() {
   activityList.innerHTML = createActivitySkeleton(5);
 
   try {
-    const res = await fetch("/api/dashboard/activity", {
-      method: "GET",
-      credentials: "include",
-    });
-
-    const data = await res.json();
+    const { ok, data } = await api.cachedGet("/api/dashboard/activity");
 
-    if (!res.ok || !data.success) {
+    if (!ok || !data.success) {
       console.log("Activity API error:", data);
       activityList.innerHTML =
         '<p class="text-center" style="padding: 2rem; color: var(--gray);">Failed to load recent activity</p>';
@@ -1,13 +1,21 @@
 /**
  * SnapStream - Media JavaScript (REAL Flask)
- * GET /api/media
+ * GET /api/media?limit=&cursor=
+ * GET /api/media/search?q=&tags=&type=&sort=&limit=&cursor=   (search box / filters)
  * DELETE /api/media/<id>
+ * POST /api/media/bulk/delete, /api/media/bulk/tags   (selected cards)
  */
 
+const PAGE_SIZE = 24;
+const SEARCH_DELAY_MS = 250;
+
 let allMedia = [];
+let nextCursor = null;
 let currentFilter = "all";
 let currentSort = "latest";
 let searchQuery = "";
+let searchTimer = null;
+const selectedIds = new Set();
 
 document.addEventListener("DOMContentLoaded", async () => {
   if (window.requireAuth) {
@@ -27,14 +35,14 @@ function initFilters() {
   if (filterSelect) {
     filterSelect.addEventListener("change", (e) => {
       currentFilter = e.target.value;
-      renderMediaGrid();
+      loadMedia();
     });
   }
 
   if (sortSelect) {
     sortSelect.addEventListener("change", (e) => {
       currentSort = e.target.value;
-      renderMediaGrid();
+      loadMedia();
     });
   }
 }
@@ -45,11 +53,47 @@ function initSearch() {
   if (searchInput) {
     searchInput.addEventListener("input", (e) => {
       searchQuery = e.target.value.trim().toLowerCase();
-      renderMediaGrid();
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(loadMedia, SEARCH_DELAY_MS);
     });
   }
 }
 
+/**
+ * Searching, filtering or sorting oldest first goes through the server-side
+ * search index; words starting with # are exact tags, the last word is
+ * matched as a prefix while typing.
+ */
+function isSearching() {
+  return searchQuery !== "" || currentFilter !== "all" || currentSort === "oldest";
+}
+
+function searchParams() {
+  const words = searchQuery.split(/\s+/).filter(Boolean);
+  const tags = words.filter((w) => w.startsWith("#")).map((w) => w.slice(1));
+  const terms = words.filter((w) => !w.startsWith("#"));
+  if (terms.length > 0 && !terms[terms.length - 1].endsWith("*")) {
+    terms[terms.length - 1] += "*";
+  }
+
+  const params = new URLSearchParams();
+  if (terms.length > 0) params.set("q", terms.join(" "));
+  if (tags.length > 0) params.set("tags", tags.join(","));
+  if (currentFilter !== "all") params.set("type", currentFilter);
+  if (currentSort === "oldest") params.set("sort", "oldest");
+  return params;
+}
+
+async function fetchMediaPage(cursor) {
+  const searching = isSearching();
+  const params = searching ? searchParams() : new URLSearchParams();
+  params.set("limit", PAGE_SIZE);
+  if (cursor) params.set("cursor", cursor);
+
+  const { data } = await api.cachedGet(`${searching ? "/api/media/search" : "/api/media"}?${params}`);
+  return data;
+}
+
 async function loadMedia() {
   const mediaGrid = document.getElementById("media-grid");
   if (!mediaGrid) return;
@@ -57,13 +101,7 @@ async function loadMedia() {
   mediaGrid.innerHTML = `<p style="padding:20px;color:gray;">Loading media...</p>`;
 
   try {
-    const res = await fetch("/api/media", {
-      method: "GET",
-      credentials: "include",
-    });
-
-    const data = await res.json();
-    console.log("MEDIA API =>", data);
+    const data = await fetchMediaPage(null);
 
     if (!data.success) {
       window.showToast?.(data.message || "Failed to load media", "error");
@@ -72,6 +110,7 @@ async function loadMedia() {
     }
 
     allMedia = data.media || [];
+    nextCursor = data.next_cursor || null;
     renderMediaGrid();
   } catch (err) {
     console.error(err);
@@ -80,32 +119,59 @@ async function loadMedia() {
   }
 }
 
+async function loadMoreMedia() {
+  if (!nextCursor) return;
+
+  const btn = document.getElementById("load-more-btn");
+  if (btn) {
+    btn.disabled = true;
+    btn.textContent = "Loading...";
+  }
+
+  try {
+    const data = await fetchMediaPage(nextCursor);
+
+    if (!data.success) {
+      window.showToast?.(data.message || "Failed to load media", "error");
+      return;
+    }
+
+    allMedia = allMedia.concat(data.media || []);
+    nextCursor = data.next_cursor || null;
+  } catch (err) {
+    console.error(err);
+    window.showToast?.("Server error while loading media", "error");
+  }
+
+  renderMediaGrid();
+}
+
+function renderPagination() {
+  const pagination = document.getElementById("pagination");
+  if (!pagination) return;
+
+  pagination.innerHTML = nextCursor
+    ? `<button id="load-more-btn" class="btn btn-secondary" onclick="loadMoreMedia()">Load more</button>`
+    : "";
+}
+
 function renderMediaGrid() {
   const mediaGrid = document.getElementById("media-grid");
   if (!mediaGrid) return;
 
-  let filtered = [...allMedia];
+  renderPagination();
 
-  // Filter by type
-  if (currentFilter !== "all") {
-    filtered = filtered.filter((m) => {
-      const t = getTypeGroup(m.type);
-      return t === currentFilter;
-    });
-  }
+  // filtered, searched and sorted by the server
+  const filtered = allMedia;
 
-  // Search
-  if (searchQuery) {
-    filtered = filtered.filter((m) =>
-      (m.filename || "").toLowerCase().includes(searchQuery)
-    );
-  }
-
-  // Sort
-  if (currentSort === "latest") {
-    filtered.sort((a, b) => new Date(b.uploaded_at) - new Date(a.uploaded_at));
-  } else if (currentSort === "oldest") {
-    filtered.sort((a, b) => new Date(a.uploaded_at) - new Date(b.uploaded_at));
+  if (filtered.length === 0 && isSearching()) {
+    mediaGrid.innerHTML = `
+      <div style="grid-column:1/-1; text-align:center; padding:40px; color:gray;">
+        <h3 style="margin-bottom:8px;">No matching media</h3>
+        <p>Try a shorter search, or #tag for an exact tag.</p>
+      </div>
+    `;
+    return;
   }
 
   if (filtered.length === 0) {
@@ -119,18 +185,24 @@ function renderMediaGrid() {
     return;
   }
 
+  renderBulkBar();
+
   mediaGrid.innerHTML = filtered
     .map((item) => {
-      const fileUrl = `/static/uploads/${item.stored_name}`;
+      const fileUrl = `/api/media/${item.id}/content`;
+      const thumbUrl = `/api/media/${item.id}/thumbnail?size=sm`;
       const typeGroup = getTypeGroup(item.type);
 
       return `
-        <div class="media-card" style="padding:14px;">
-          
+        <div class="media-card" style="padding:14px; position:relative;">
+          <input type="checkbox" title="Select" style="position:absolute; top:22px; left:22px; z-index:1; width:18px; height:18px;"
+            ${selectedIds.has(item.id) ? "checked" : ""} onchange="toggleSelected('${item.id}', this.checked)" />
+
           <div class="media-preview" style="height:160px; display:flex; align-items:center; justify-content:center; background:#f3f4f6; border-radius:12px; overflow:hidden;">
             ${
-              typeGroup === "image"
-                ? `<img src="${fileUrl}" style="width:100%; height:100%; object-fit:cover;" />`
+              typeGroup === "image" || typeGroup === "video"
+                ? `<img src="${thumbUrl}" loading="lazy" style="width:100%; height:100%; object-fit:cover;"
+                     onerror="this.replaceWith(Object.assign(document.createElement('div'), {textContent: '${item.type.toUpperCase()}', style: 'font-weight:700; color:#6b7280;'}))" />`
                 : `<div style="font-weight:700; color:#6b7280;">${item.type.toUpperCase()}</div>`
             }
           </div>
@@ -148,6 +220,11 @@ function renderMediaGrid() {
             <div style="margin-top:8px; color:gray; font-size:13px;">
               Size: ${item.size_kb} KB
             </div>
+            ${
+              (item.tags || []).length
+                ? `<div style="margin-top:6px; color:gray; font-size:13px;">${item.tags.map((t) => `#${t}`).join(" ")}</div>`
+                : ""
+            }
 
             <div class="media-actions" style="margin-top:12px; display:flex; gap:8px; flex-wrap:wrap;">
               <a href="${fileUrl}" target="_blank" class="btn btn-secondary btn-sm">View</a>
@@ -193,4 +270,91 @@ async function deleteMedia(mediaId) {
   }
 }
 
+/**
+ * Multi-select: checked cards are kept across "Load more" and re-renders,
+ * and acted on with one bulk request.
+ */
+function toggleSelected(mediaId, checked) {
+  if (checked) selectedIds.add(mediaId);
+  else selectedIds.delete(mediaId);
+  renderBulkBar();
+}
+
+function clearSelection() {
+  selectedIds.clear();
+  renderMediaGrid();
+}
+
+function renderBulkBar() {
+  const bar = document.getElementById("bulk-bar");
+  if (!bar) return;
+
+  bar.classList.toggle("hidden", selectedIds.size === 0);
+  const count = document.getElementById("bulk-count");
+  if (count) count.textContent = `${selectedIds.size} selected`;
+}
+
+async function bulkRequest(action, body) {
+  const res = await fetch(`/api/media/bulk/${action}`, {
+    method: "POST",
+    credentials: "include",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ids: [...selectedIds], ...body }),
+  });
+  return res.json();
+}
+
+async function bulkDelete() {
+  if (selectedIds.size === 0) return;
+  const ok = confirm(`Delete ${selectedIds.size} selected file(s)?`);
+  if (!ok) return;
+
+  try {
+    const data = await bulkRequest("delete", {});
+    if (!data.success) {
+      window.showToast?.(data.message || "Delete failed", "error");
+      return;
+    }
+    window.showToast?.(`${data.deleted.length} file(s) deleted`, "success");
+    selectedIds.clear();
+    await loadMedia();
+  } catch (err) {
+    console.error(err);
+    window.showToast?.("Server error while deleting", "error");
+  }
+}
+
+async function bulkTags(mode) {
+  const input = document.getElementById("bulk-tags");
+  const tags = (input?.value || "").trim();
+  if (selectedIds.size === 0 || !tags) {
+    window.showToast?.("Enter one or more tags", "error");
+    return;
+  }
+
+  try {
+    const data = await bulkRequest("tags", { [mode]: tags });
+    if (!data.success) {
+      window.showToast?.(data.message || "Tag update failed", "error");
+      return;
+    }
+
+    const tagsById = Object.fromEntries(data.media.map((m) => [m.id, m.tags]));
+    allMedia.forEach((m) => {
+      if (tagsById[m.id]) m.tags = tagsById[m.id];
+    });
+    window.showToast?.(`Tags updated on ${data.media.length} file(s)`, "success");
+    if (input) input.value = "";
+    renderMediaGrid();
+  } catch (err) {
+    console.error(err);
+    window.showToast?.("Server error while updating tags", "error");
+  }
+}
+
 window.deleteMedia = deleteMedia;
+window.toggleSelected = toggleSelected;
+window.clearSelection = clearSelection;
+window.bulkDelete = bulkDelete;
+window.bulkTags = bulkTags;
+window.loadMoreMedia = loadMoreMedia;
@@ -3,14 +3,15 @@
  * Handles notifications page functionality
  */
 
-// Declare required variables and functions
-let requireAuth = () => true; // Placeholder for requireAuth function
-let showToast = (message, type) => console.log(`${type}: ${message}`); // Placeholder for showToast function
-let formatDate = (timestamp) => timestamp; // Placeholder for formatDate function
-let showConfirm = (title, message, callback) => callback(); // Placeholder for showConfirm function
+const PAGE_SIZE = 20;
 
-document.addEventListener('DOMContentLoaded', () => {
-  if (!requireAuth()) return;
+let nextCursor = null;
+
+document.addEventListener('DOMContentLoaded', async () => {
+  if (window.requireAuth) {
+    const ok = await window.requireAuth();
+    if (!ok) return;
+  }
   initNotifications();
 });
 
@@ -19,10 +20,25 @@ document.addEventListener('DOMContentLoaded', () => {
  */
 async function initNotifications() {
   await loadNotifications();
+
+  // New notifications are pushed by app.js (SSE), no polling needed
+  window.addEventListener('snapstream:notification', (e) => prependNotification(e.detail));
+  window.addEventListener('snapstream:resync', () => loadNotifications());
 }
 
 /**
- * Load notifications
+ * Fetch one page of notifications: GET /api/notifications?limit=&cursor=
+ */
+async function fetchNotificationsPage(cursor) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (cursor) params.set('cursor', cursor);
+
+  const { data } = await api.cachedGet(`/api/notifications?${params}`);
+  return data;
+}
+
+/**
+ * Load first page of notifications
  */
 async function loadNotifications() {
   const container = document.getElementById('notifications-container');
@@ -32,42 +48,85 @@ async function loadNotifications() {
   container.innerHTML = createNotificationsSkeleton(5);
   
   try {
-    // Simulated API call - replace with actual API
-    const response = await simulateGetNotifications();
+    const response = await fetchNotificationsPage(null);
     
     if (response.success && response.notifications.length > 0) {
+      nextCursor = response.next_cursor || null;
+      container.innerHTML = '';
       renderNotifications(response.notifications);
     } else {
+      nextCursor = null;
       renderEmptyNotifications();
     }
   } catch (error) {
     console.error('Failed to load notifications:', error);
-    showToast('Failed to load notifications', 'error');
+    window.showToast?.('Failed to load notifications', 'error');
     container.innerHTML = '<p class="text-center" style="padding: 2rem;">Failed to load notifications</p>';
   }
 }
 
 /**
- * Render notifications list
+ * Load next page and append it
  */
-function renderNotifications(notifications) {
-  const container = document.getElementById('notifications-container');
-  
-  container.innerHTML = notifications.map(notification => `
-    <div class="notification-card ${notification.read ? '' : 'unread'}" data-id="${notification.id}">
+async function loadMoreNotifications() {
+  if (!nextCursor) return;
+
+  try {
+    const response = await fetchNotificationsPage(nextCursor);
+
+    if (response.success) {
+      nextCursor = response.next_cursor || null;
+      renderNotifications(response.notifications || []);
+    }
+  } catch (error) {
+    console.error('Failed to load notifications:', error);
+    window.showToast?.('Failed to load notifications', 'error');
+  }
+}
+
+function notificationCard(notification) {
+  return `
+    <div class="notification-card ${notification.status === 'Unread' ? 'unread' : ''}" data-id="${notification.id}">
       <div class="notification-icon">
         ${getNotificationIcon(notification.type)}
       </div>
       <div class="notification-content">
         <div class="notification-title">${notification.title}</div>
         <div class="notification-message">${notification.message}</div>
-        <div class="notification-time">${formatDate(notification.timestamp)}</div>
-      </div>
-      <div class="notification-actions">
-        ${!notification.read ? `<button class="btn btn-sm btn-secondary" onclick="markAsRead('${notification.id}')">Mark as read</button>` : ''}
+        <div class="notification-time">${notification.time}</div>
       </div>
     </div>
-  `).join('');
+  `;
+}
+
+/**
+ * Append notifications to the list (+ "Load more" button if there is a next page)
+ */
+function renderNotifications(notifications) {
+  const container = document.getElementById('notifications-container');
+
+  document.getElementById('load-more-notifications')?.remove();
+  
+  container.insertAdjacentHTML('beforeend', notifications.map(notificationCard).join(''));
+
+  if (nextCursor) {
+    container.insertAdjacentHTML('beforeend', `
+      <div id="load-more-notifications" style="text-align:center; padding: 1rem;">
+        <button class="btn btn-secondary" onclick="loadMoreNotifications()">Load more</button>
+      </div>
+    `);
+  }
+}
+
+/**
+ * Insert a live notification at the top of the list
+ */
+function prependNotification(notification) {
+  const container = document.getElementById('notifications-container');
+  if (!container || container.querySelector(`[data-id="${notification.id}"]`)) return;
+
+  container.querySelector('.empty-state')?.remove();
+  container.insertAdjacentHTML('afterbegin', notificationCard(notification));
 }
 
 /**
@@ -121,156 +180,54 @@ function createNotificationsSkeleton(count) {
   return html;
 }
 
-/**
- * Mark notification as read
- */
-async function markAsRead(notificationId) {
-  try {
-    // Simulated API call - replace with actual API
-    await simulateMarkAsRead(notificationId);
-    
-    const card = document.querySelector(`.notification-card[data-id="${notificationId}"]`);
-    if (card) {
-      card.classList.remove('unread');
-      const actionsDiv = card.querySelector('.notification-actions');
-      if (actionsDiv) actionsDiv.innerHTML = '';
-    }
-    
-    showToast('Notification marked as read', 'success');
-  } catch (error) {
-    showToast('Failed to mark notification as read', 'error');
-  }
-}
-
 /**
  * Mark all notifications as read
  */
 async function markAllAsRead() {
   try {
-    // Simulated API call - replace with actual API
-    await simulateMarkAllAsRead();
+    const res = await fetch('/api/notifications/read-all', {
+      method: 'POST',
+      credentials: 'include',
+    });
+    const data = await res.json();
+    if (!data.success) throw new Error(data.message);
     
     document.querySelectorAll('.notification-card.unread').forEach(card => {
       card.classList.remove('unread');
-      const actionsDiv = card.querySelector('.notification-actions');
-      if (actionsDiv) actionsDiv.innerHTML = '';
     });
+    window.setUnreadBadge?.(0);
     
-    showToast('All notifications marked as read', 'success');
+    window.showToast?.('All notifications marked as read', 'success');
   } catch (error) {
-    showToast('Failed to mark all notifications as read', 'error');
+    window.showToast?.('Failed to mark all notifications as read', 'error');
   }
 }
 
 /**
  * Clear all notifications
  */
-function clearAllNotifications() {
-  showConfirm('Clear All Notifications', 'Are you sure you want to clear all notifications? This action cannot be undone.', async () => {
-    try {
-      // Simulated API call - replace with actual API
-      await simulateClearAllNotifications();
-      renderEmptyNotifications();
-      showToast('All notifications cleared', 'success');
-    } catch (error) {
-      showToast('Failed to clear notifications', 'error');
-    }
-  });
-}
-
-// =====================
-// Simulated API Calls
-// =====================
-
-/**
- * Simulate get notifications API call (replace with actual API)
- */
-async function simulateGetNotifications() {
-  return new Promise((resolve) => {
-    setTimeout(() => {
-      resolve({
-        success: true,
-        notifications: [
-          {
-            id: '1',
-            type: 'success',
-            title: 'Analysis Complete',
-            message: 'Your video "product_demo.mp4" has been analyzed successfully.',
-            timestamp: '2026-01-24 10:45',
-            read: false,
-          },
-          {
-            id: '2',
-            type: 'info',
-            title: 'Upload Successful',
-            message: 'Your file "team_photo.jpg" has been uploaded and is being processed.',
-            timestamp: '2026-01-24 10:15',
-            read: false,
-          },
-          {
-            id: '3',
-            type: 'error',
-            title: 'Processing Failed',
-            message: 'Failed to process "interview_recording.wav". Please try uploading again.',
-            timestamp: '2026-01-23 16:45',
-            read: true,
-          },
-          {
-            id: '4',
-            type: 'warning',
-            title: 'Storage Limit Warning',
-            message: 'You have used 80% of your storage quota. Consider upgrading your plan.',
-            timestamp: '2026-01-22 09:00',
-            read: true,
-          },
-          {
-            id: '5',
-            type: 'success',
-            title: 'Transcription Complete',
-            message: 'Transcription for "podcast_episode.mp3" is now available.',
-            timestamp: '2026-01-21 14:30',
-            read: true,
-          },
-        ],
-      });
-    }, 600);
-  });
-}
-
-/**
- * Simulate mark as read API call (replace with actual API)
- */
-async function simulateMarkAsRead(notificationId) {
-  return new Promise((resolve) => {
-    setTimeout(() => {
-      resolve({ success: true });
-    }, 300);
-  });
-}
+async function clearAllNotifications() {
+  const ok = confirm('Are you sure you want to clear all notifications? This action cannot be undone.');
+  if (!ok) return;
 
-/**
- * Simulate mark all as read API call (replace with actual API)
- */
-async function simulateMarkAllAsRead() {
-  return new Promise((resolve) => {
-    setTimeout(() => {
-      resolve({ success: true });
-    }, 300);
-  });
-}
+  try {
+    const res = await fetch('/api/notifications/clear-all', {
+      method: 'POST',
+      credentials: 'include',
+    });
+    const data = await res.json();
+    if (!data.success) throw new Error(data.message);
 
-/**
- * Simulate clear all notifications API call (replace with actual API)
- */
-async function simulateClearAllNotifications() {
-  return new Promise((resolve) => {
-    setTimeout(() => {
-      resolve({ success: true });
-    }, 300);
-  });
+    nextCursor = null;
+    renderEmptyNotifications();
+    window.setUnreadBadge?.(0);
+    window.showToast?.('All notifications cleared', 'success');
+  } catch (error) {
+    window.showToast?.('Failed to clear notifications', 'error');
+  }
 }
 
 // Export functions
-window.markAsRead = markAsRead;
 window.markAllAsRead = markAllAsRead;
 window.clearAllNotifications = clearAllNotifications;
+window.loadMoreNotifications = loadMoreNotifications;
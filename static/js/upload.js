@@ -1,8 +1,21 @@
 /**
  * SnapStream - Upload JavaScript (REAL Flask Upload)
- * Uploads media file to Flask backend: POST /api/upload
+ * With S3 storage the file goes straight to the bucket:
+ *   POST /api/upload/presign                  (presigned PUT URL + token)
+ *   PUT  <upload_url>
+ *   POST /api/upload/direct/complete
+ * Otherwise (local storage), a chunked, resumable upload to Flask:
+ *   POST /api/upload/init
+ *   PUT  /api/upload/<upload_id>/chunks/<n>   (PARALLEL_CHUNKS at a time)
+ *   GET  /api/upload/<upload_id>              (resume: which chunks are missing)
+ *   POST /api/upload/<upload_id>/complete
  */
 
+const PARALLEL_CHUNKS = 3;
+const CHUNK_RETRIES = 3;
+
+let directUploads = true; // off once the server says it stores files locally
+
 let selectedFile = null;
 
 document.addEventListener("DOMContentLoaded", async () => {
@@ -156,61 +169,198 @@ async function handleUpload(e) {
   uploadBtn.innerHTML = "Uploading...";
   progressSection.classList.remove("hidden");
 
-  const formData = new FormData();
-  formData.append("file", selectedFile);
-  formData.append("custom_tags", tags); // Flask expects custom_tags
+  const onProgress = (percent) => {
+    progressBar.style.width = `${percent}%`;
+    progressText.textContent = `${Math.round(percent)}%`;
+  };
+
+  try {
+    const done = await directUpload(selectedFile, tags, onProgress);
+    if (!done) await chunkedUpload(selectedFile, tags, onProgress);
+
+    progressBar.style.width = `100%`;
+    progressText.textContent = `100%`;
+
+    window.showToast?.("Upload Successful! Redirecting to My Media...", "success");
+
+    showUploadSuccess();
+
+    // ✅ BEST: redirect so My Media will fetch fresh data
+    setTimeout(() => {
+      window.location.href = "/media";
+    }, 1000);
+  } catch (err) {
+    window.showToast?.(err.message || "Upload failed", "error");
+    uploadBtn.disabled = false;
+    uploadBtn.innerHTML = "Upload";
+    progressSection.classList.add("hidden");
+  }
+}
+
+/**
+ * Upload straight to S3 with a presigned URL. Resolves to null when the
+ * server has no S3 storage, so the caller falls back to chunkedUpload.
+ */
+async function directUpload(file, tags, onProgress) {
+  if (!directUploads) return null;
+
+  const res = await fetch("/api/upload/presign", {
+    method: "POST",
+    credentials: "include",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ filename: file.name, size: file.size, custom_tags: tags }),
+  });
+  const presigned = await res.json();
+
+  if (res.status === 400 && presigned.message === "Direct uploads need S3 storage") {
+    directUploads = false;
+    return null;
+  }
+  if (!res.ok || !presigned.success) {
+    throw new Error(presigned.message || "Upload failed");
+  }
+
+  await putBlob(presigned.upload_url, file, presigned.headers, false, (loaded) =>
+    onProgress((loaded / file.size) * 100)
+  );
+
+  return jsonRequest("POST", "/api/upload/direct/complete", { token: presigned.token });
+}
+
+/**
+ * Upload a file in chunks. The upload_id is remembered per file in
+ * localStorage, so picking the same file again after a dropped connection
+ * only sends the chunks the server has not acknowledged yet.
+ */
+async function chunkedUpload(file, tags, onProgress) {
+  const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+  let session = await resumeSession(localStorage.getItem(resumeKey));
+  if (!session) {
+    session = await jsonRequest("POST", "/api/upload/init", {
+      filename: file.name,
+      size: file.size,
+      custom_tags: tags, // Flask expects custom_tags
+    });
+    session.missing = [...Array(session.total_chunks).keys()];
+    localStorage.setItem(resumeKey, session.upload_id);
+  }
+
+  const { upload_id: uploadId, chunk_size: chunkSize } = session;
 
-  const xhr = new XMLHttpRequest();
-  xhr.open("POST", "/api/upload", true);
-  xhr.withCredentials = true;
+  // bytes already on the server + bytes in flight per chunk
+  const chunkBytes = (i) => Math.min(chunkSize, file.size - i * chunkSize);
+  let doneBytes = file.size - session.missing.reduce((sum, i) => sum + chunkBytes(i), 0);
+  const inFlight = {};
+
+  const report = () => {
+    const sending = Object.values(inFlight).reduce((a, b) => a + b, 0);
+    onProgress(((doneBytes + sending) / file.size) * 100);
+  };
 
-  xhr.upload.onprogress = (event) => {
-    if (event.lengthComputable) {
-      const percent = (event.loaded / event.total) * 100;
-      progressBar.style.width = `${percent}%`;
-      progressText.textContent = `${Math.round(percent)}%`;
+  const queue = [...session.missing];
+
+  const worker = async () => {
+    while (queue.length > 0) {
+      const index = queue.shift();
+      const blob = file.slice(index * chunkSize, index * chunkSize + chunkBytes(index));
+
+      for (let attempt = 1; ; attempt++) {
+        try {
+          await putChunk(uploadId, index, blob, (loaded) => {
+            inFlight[index] = loaded;
+            report();
+          });
+          break;
+        } catch (err) {
+          if (attempt >= CHUNK_RETRIES) throw err;
+        }
+      }
+
+      delete inFlight[index];
+      doneBytes += blob.size;
+      report();
     }
   };
 
-  xhr.onload = () => {
-    try {
-      const data = JSON.parse(xhr.responseText || "{}");
+  await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
 
-      if (xhr.status >= 200 && xhr.status < 300 && data.success) {
-        progressBar.style.width = `100%`;
-        progressText.textContent = `100%`;
+  const data = await jsonRequest("POST", `/api/upload/${uploadId}/complete`);
+  localStorage.removeItem(resumeKey);
+  return data;
+}
 
-        window.showToast?.("Upload Successful! Redirecting to My Media...", "success");
+async function resumeSession(uploadId) {
+  if (!uploadId) return null;
+  try {
+    return await jsonRequest("GET", `/api/upload/${uploadId}`);
+  } catch (err) {
+    return null; // expired or unknown - start over
+  }
+}
 
-        showUploadSuccess();
+async function jsonRequest(method, url, body) {
+  const res = await fetch(url, {
+    method,
+    credentials: "include",
+    headers: body ? { "Content-Type": "application/json" } : {},
+    body: body ? JSON.stringify(body) : undefined,
+  });
 
-        // ✅ BEST: redirect so My Media will fetch fresh data
-        setTimeout(() => {
-          window.location.href = "/media";
-        }, 1000);
+  const data = await res.json();
+  if (!res.ok || !data.success) {
+    throw new Error(data.message || "Upload failed");
+  }
+  return data;
+}
 
+/**
+ * PUT one chunk with XHR so per-chunk progress is reported
+ */
+function putChunk(uploadId, index, blob, onLoaded) {
+  return putBlob(
+    `/api/upload/${uploadId}/chunks/${index}`,
+    blob,
+    { "Content-Type": "application/octet-stream" },
+    true,
+    onLoaded
+  );
+}
+
+/**
+ * PUT a blob with XHR (fetch has no upload progress). Flask answers JSON
+ * with success; S3 answers an empty 200.
+ */
+function putBlob(url, blob, headers, expectJson, onLoaded) {
+  return new Promise((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    xhr.open("PUT", url, true);
+    xhr.withCredentials = expectJson; // S3 is cross-origin: no cookies
+    Object.entries(headers || {}).forEach(([name, value]) => xhr.setRequestHeader(name, value));
+
+    xhr.upload.onprogress = (event) => {
+      if (event.lengthComputable) onLoaded(event.loaded);
+    };
+
+    xhr.onload = () => {
+      let data = {};
+      if (expectJson) {
+        try {
+          data = JSON.parse(xhr.responseText || "{}");
+        } catch (err) {}
+      }
+
+      if (xhr.status >= 200 && xhr.status < 300 && (data.success || !expectJson)) {
+        resolve(data);
       } else {
-        window.showToast?.(data.message || "Upload failed", "error");
-        uploadBtn.disabled = false;
-        uploadBtn.innerHTML = "Upload";
-        progressSection.classList.add("hidden");
+        reject(new Error(data.message || "Upload failed"));
       }
-    } catch (err) {
-      window.showToast?.("Upload failed (invalid server response)", "error");
-      uploadBtn.disabled = false;
-      uploadBtn.innerHTML = "Upload";
-      progressSection.classList.add("hidden");
-    }
-  };
+    };
 
-  xhr.onerror = () => {
-    window.showToast?.("Server error. Please try again.", "error");
-    uploadBtn.disabled = false;
-    uploadBtn.innerHTML = "Upload";
-    progressSection.classList.add("hidden");
-  };
+    xhr.onerror = () => reject(new Error("Server error. Please try again."));
 
-  xhr.send(formData);
+    xhr.send(blob);
+  });
 }
 
 function showUploadSuccess() {
@@ -0,0 +1,87 @@
+"""
+SnapStream storage layer.
+
+Route handlers talk to these stores instead of scanning global lists, so
+every request costs O(caller's own data) rather than O(whole server).
+
+Every backend implements the interface in ``storage.base``;
+``create_storage(url)`` picks one:
+
+    memory://                 in-process dicts (default, single worker)
+    sqlite:///path/to/db      one WAL-mode file shared by every worker
+    dynamodb://us-east-1      DynamoDB tables (AWS mode); query options:
+                              endpoint_url=http://localhost:8000 (local stand-in),
+                              prefix=SnapStream, create_tables=1
+"""
+
+from collections import namedtuple
+
+from storage.cache import CachedUserStore
+from storage.memory import BlobRefs, MediaStore, NotificationStore, ReclaimJobs, Sessions, UserStore, Versions
+
+Storage = namedtuple("Storage", "users media notifications blob_refs reclaim_jobs versions sessions")
+
+
+def create_storage(url, notification_retention=500, aws=None, session_max_entries=100000):
+    """
+    ``aws``: shared AWSClients for the dynamodb backend (default: one from the environment);
+    ``session_max_entries``: size of the memory backend's session LRU.
+    """
+    if url.startswith("memory://"):
+        return Storage(
+            users=UserStore(),
+            media=MediaStore(),
+            notifications=NotificationStore(notification_retention),
+            blob_refs=BlobRefs(),
+            reclaim_jobs=ReclaimJobs(),
+            versions=Versions(),
+            sessions=Sessions(session_max_entries),
+        )
+
+    if url.startswith("sqlite:///"):
+        from storage import sqlite
+
+        db = sqlite.Database(url[len("sqlite:///"):])
+        return Storage(
+            users=sqlite.UserStore(db),
+            media=sqlite.MediaStore(db),
+            notifications=sqlite.NotificationStore(db, notification_retention),
+            blob_refs=sqlite.BlobRefs(db),
+            reclaim_jobs=sqlite.ReclaimJobs(db),
+            versions=sqlite.Versions(db),
+            sessions=sqlite.Sessions(db),
+        )
+
+    if url.startswith("dynamodb://"):
+        from storage import dynamodb
+
+        resource, prefix, options = dynamodb.from_url(url, aws)
+        if options.get("create_tables") == "1":
+            dynamodb.ensure_tables(resource, prefix)
+
+        tables = {kind: resource.Table(name) for kind, name in dynamodb.table_names(prefix).items()}
+        return Storage(
+            users=dynamodb.UserStore(tables["users"]),
+            media=dynamodb.MediaStore(tables["media"], tables["counters"]),
+            notifications=dynamodb.NotificationStore(tables["notifications"], tables["counters"], notification_retention),
+            blob_refs=dynamodb.BlobRefs(tables["counters"]),
+            reclaim_jobs=dynamodb.ReclaimJobs(tables["counters"]),
+            versions=dynamodb.Versions(tables["counters"]),
+            sessions=dynamodb.Sessions(tables["sessions"]),
+        )
+
+    raise ValueError(f"Unsupported storage URL: {url}")
+
+
+__all__ = [
+    "BlobRefs",
+    "CachedUserStore",
+    "MediaStore",
+    "NotificationStore",
+    "ReclaimJobs",
+    "Sessions",
+    "Storage",
+    "UserStore",
+    "Versions",
+    "create_storage",
+]
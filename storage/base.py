@@ -0,0 +1,290 @@
+"""
+The repository interface every backend implements.
+
+Route handlers only use these methods, so ``memory``, ``sqlite`` and
+``dynamodb`` are interchangeable. List pages take and return an opaque
+string ``cursor`` (None = first / no further page); a malformed cursor
+raises ValueError.
+"""
+
+STATUSES = ("Processing", "Completed", "Failed")
+
+BLOB_DELETE_LEASE = 60  # seconds a blob tombstone holds off new references (see BlobRefs)
+
+
+class UserStore:
+    def get(self, email, consistent=False):
+        """
+        Return ``{username, email, password}`` or None. Auth decisions pass
+        ``consistent=True``: the latest write, never a cached / replica copy.
+        """
+        raise NotImplementedError
+
+    def add(self, user):
+        """Insert a new user; False if the email is taken."""
+        raise NotImplementedError
+
+    def update(self, email, **fields):
+        """Update ``username`` / ``password``; returns the user or None."""
+        raise NotImplementedError
+
+    def delete(self, email):
+        raise NotImplementedError
+
+
+class BlobRefs:
+    """
+    Reference counts for BlobStore keys, shared by every worker. The
+    ``decr`` that takes a count to 0 also leaves a tombstone: the caller
+    now owns deleting the object, and anyone taking a new reference sees
+    ``deleting()`` until ``finish_delete`` (or ``BLOB_DELETE_LEASE``
+    seconds, should that worker die) and must store the object again.
+    """
+
+    def incr(self, key):
+        """Take a reference; returns the new count."""
+        raise NotImplementedError
+
+    def decr(self, key):
+        """
+        Drop a reference; returns the remaining count. 0 = unused: the caller
+        deletes the object and then calls ``finish_delete``.
+        """
+        raise NotImplementedError
+
+    def deleting(self, key):
+        """True while a release is deleting the object (its tombstone is live)."""
+        raise NotImplementedError
+
+    def finish_delete(self, key):
+        """Drop the tombstone; forget the key unless it was referenced again meanwhile."""
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+
+class MediaStore:
+    """
+    Media records plus per-owner status counters kept in step with every
+    write, so ``stats()`` never scans. With ``check_counters`` set, every
+    ``stats()`` call recomputes from scratch and raises on drift.
+    """
+
+    STATUSES = STATUSES
+
+    def __init__(self, check_counters=False):
+        self.check_counters = check_counters
+
+    def add(self, media):
+        raise NotImplementedError
+
+    def set_status(self, media_id, status):
+        """Returns the updated record, or None if it no longer exists."""
+        raise NotImplementedError
+
+    def save_analysis(self, media_id, analysis):
+        raise NotImplementedError
+
+    def delete(self, media_id):
+        """Returns the deleted record or None."""
+        raise NotImplementedError
+
+    def delete_many(self, media_ids):
+        """Delete several records in as few backend calls as possible; returns the deleted ones."""
+        deleted = (self.delete(media_id) for media_id in dict.fromkeys(media_ids))
+        return [m for m in deleted if m is not None]
+
+    def set_tags_many(self, tags_by_id):
+        """Replace the tags of several records (``{media_id: [tag, ...]}``); returns the updated ones."""
+        raise NotImplementedError
+
+    def delete_owner(self, email):
+        """Drop every record of one owner and return them (newest first)."""
+        raise NotImplementedError
+
+    def get(self, media_id, email=None):
+        """Return the record, or None if missing or not owned by ``email``."""
+        raise NotImplementedError
+
+    def get_many(self, media_ids, email=None):
+        """Records for ``media_ids`` in the given order, skipping missing / not owned ones."""
+        records = (self.get(media_id, email) for media_id in dict.fromkeys(media_ids))
+        return [m for m in records if m is not None]
+
+    def get_analysis(self, media_id):
+        raise NotImplementedError
+
+    def page(self, email, limit=None, cursor=None):
+        """Return ``(items, next_cursor)`` for one owner, newest first."""
+        raise NotImplementedError
+
+    def list_owner(self, email, limit=None):
+        """Return an owner's media newest first."""
+        return self.page(email, limit)[0]
+
+    def count(self, email):
+        return self.stats(email)["total"]
+
+    def stats(self, email):
+        """Return ``{"total", "Processing", "Completed", "Failed"}`` for one owner."""
+        stats = self._stats_from(self._counts(email))
+        if self.check_counters:
+            expected = self.recompute_stats(email)
+            if stats != expected:
+                raise RuntimeError(f"Media counters out of sync for {email}: {stats} != {expected}")
+        return stats
+
+    def recompute_stats(self, email):
+        """Count statuses from scratch (O(owner's media)); used by the consistency check."""
+        counts = {}
+        for media in self.list_owner(email):
+            counts[media["status"]] = counts.get(media["status"], 0) + 1
+        return self._stats_from(counts)
+
+    def _counts(self, email):
+        """Maintained ``{status: count}`` for one owner."""
+        raise NotImplementedError
+
+    def _stats_from(self, counts):
+        stats = {status: counts.get(status, 0) for status in self.STATUSES}
+        stats["total"] = sum(counts.values())
+        return stats
+
+
+class NotificationStore:
+    """
+    Per-user inboxes capped at ``retention`` entries. Every note gets a
+    per-backend increasing integer ``seq`` (the SSE event id); ``status``
+    is derived from a per-user read watermark, never stored per note.
+    """
+
+    def __init__(self, retention=500):
+        self.retention = retention
+
+    def add(self, note, on_stored=None):
+        """Store ``note``; ``on_stored(seq)`` is called once it is visible to readers."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Wait until every earlier ``add`` is visible (no-op for synchronous backends)."""
+
+    def page(self, email, limit=None, cursor=None):
+        """Return ``(items, next_cursor)``, newest first."""
+        raise NotImplementedError
+
+    def since(self, email, after_seq, limit):
+        """Return up to ``limit`` most recent ``(seq, note)`` newer than ``after_seq``, oldest first."""
+        raise NotImplementedError
+
+    def unread_count(self, email):
+        raise NotImplementedError
+
+    def mark_all_read(self, email):
+        raise NotImplementedError
+
+    def clear(self, email):
+        raise NotImplementedError
+
+
+class ReclaimJobs:
+    """
+    Durable progress of deleted accounts whose data is still being removed
+    (see reclaim.py). A job is a JSON-able dict keyed by ``job["email"]``.
+    Workers take turns through a lease: ``claim`` hands the job to one
+    worker until ``lease_until`` (epoch seconds), and ``save`` only
+    succeeds while that worker still holds it.
+    """
+
+    def start(self, job):
+        """Record a new job; False if one already exists for that email."""
+        raise NotImplementedError
+
+    def get(self, email):
+        raise NotImplementedError
+
+    def pending(self):
+        """Emails with an unfinished job."""
+        raise NotImplementedError
+
+    def claim(self, email, worker, lease_until):
+        """Take (or renew) the lease; returns the job, or None if another worker holds it."""
+        raise NotImplementedError
+
+    def save(self, job, worker, lease_until):
+        """Store progress and extend the lease; False if the lease was lost."""
+        raise NotImplementedError
+
+    def finish(self, email):
+        raise NotImplementedError
+
+
+class Versions:
+    """
+    Per-user change counters, one per kind of data (``"media"``,
+    ``"notifications"``). Every write to a user's data of that kind bumps
+    it, so readers can tell "unchanged" from one small lookup (ETags).
+    Counters survive account deletion: a re-registered email continues
+    from where it was instead of repeating old versions.
+    """
+
+    # changes whenever the counters may have restarted (process-local backends)
+    epoch = ""
+
+    # bumps per (user, kind) whose ``changed`` ids are kept: slot = version % CHANGE_LOG
+    CHANGE_LOG = 64
+
+    def get(self, email):
+        """``{kind: version}``; kinds never bumped are missing (= 0)."""
+        raise NotImplementedError
+
+    def bump(self, email, kind, changed=None):
+        """
+        Increment and return the new version. ``changed`` - the ids of the
+        records this write touched - is kept with it for ``changes``.
+        """
+        raise NotImplementedError
+
+    def changes(self, email, kind, versions):
+        """
+        ``{version: [ids]}`` for those of ``versions`` whose ids are still
+        kept: bumped with ``changed`` and not yet overwritten by a version
+        ``CHANGE_LOG`` later. Missing versions mean "unknown", never "none".
+        """
+        raise NotImplementedError
+
+
+class Sessions:
+    """
+    Server-side session records (see sessions.py), keyed by a hash of the
+    session id: ``{"data": {...}, "generation": int, "expires_at": epoch
+    seconds}``. Expired records may linger until the backend purges them,
+    so callers check ``expires_at`` themselves.
+    """
+
+    def get(self, key):
+        """The record, or None."""
+        raise NotImplementedError
+
+    def put(self, key, record):
+        raise NotImplementedError
+
+    def touch(self, key, expires_at):
+        """Move an existing record's expiry; does nothing if it is gone."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+def parse_seq_cursor(cursor):
+    """Cursor format of the memory / SQLite backends: the boundary ``seq``."""
+    if cursor is None:
+        return None
+    if not cursor.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(cursor)
+
+
+def seq_cursor(seq):
+    return str(seq) if seq is not None else None
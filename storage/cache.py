@@ -0,0 +1,191 @@
+"""
+Read-through cache in front of a UserStore (SQLite / DynamoDB backends).
+
+LRU with a TTL per entry. Unknown emails are cached too (``negative_ttl``),
+so repeated logins for a nonexistent account don't reach the backend.
+Concurrent misses for one email are coalesced: the first caller loads it,
+the rest wait for that result. Writes made through this wrapper
+invalidate the entry locally; other workers pick the change up when their
+entry expires, so ``ttl`` bounds how long an old username can be seen
+elsewhere.
+
+Auth decisions never rely on that: ``get(email, consistent=True)`` (login,
+password change) always reads the backend - a password changed or an
+account deleted / registered on another worker counts at once - and
+refreshes this worker's entry with the result. Concurrent consistent reads
+for one email are coalesced too, but only onto a read that started after
+the caller arrived.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from storage import base
+
+_MISSING = object()
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "cacheable")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.cacheable = True  # cleared by a write made while the read was running
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class CachedUserStore(base.UserStore):
+    def __init__(self, inner, max_entries=10000, ttl=30, negative_ttl=5):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # email -> (expires_at, user | None), least recently used first
+        self._flights = {}  # email -> _Flight for loads in progress
+        self._reading = {}  # email -> _Flight: the consistent read in progress
+        self._next_read = {}  # email -> _Flight: callers who arrived during it, read once it ends
+        self._counts = {
+            "hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0,
+            "consistent": 0, "consistent_coalesced": 0,
+        }
+
+    def get(self, email, consistent=False):
+        if consistent:
+            return self._get_consistent(email)
+
+        with self._lock:
+            value = self._lookup(email)
+            if value is not _MISSING:
+                self._counts["negative_hits" if value is None else "hits"] += 1
+                return value
+
+            flight = self._flights.get(email)
+            if flight is not None:
+                self._counts["coalesced"] += 1
+                leader = False
+            else:
+                self._counts["misses"] += 1
+                flight = self._flights[email] = _Flight()
+                leader = True
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.value = self.inner.get(email)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(email) is flight:
+                    del self._flights[email]
+                    if flight.error is None:
+                        self._store(email, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def add(self, user):
+        added = self.inner.add(user)
+        self.invalidate(user["email"])
+        return added
+
+    def update(self, email, **fields):
+        user = self.inner.update(email, **fields)
+        self.invalidate(email)
+        return user
+
+    def delete(self, email):
+        deleted = self.inner.delete(email)
+        self.invalidate(email)
+        return deleted
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+            # a load started before this write may return the old value - don't cache it
+            self._flights.pop(email, None)
+            reading = self._reading.get(email)
+            if reading is not None:
+                reading.cacheable = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, size=len(self._entries))
+
+    # ---------- internal ----------
+    def _get_consistent(self, email):
+        """
+        Backend read for an auth decision. Callers share a read only if it
+        started after they arrived: one arriving while a read runs waits for
+        the next one, which everyone else arriving meanwhile shares - a burst
+        of N logins costs at most two backend reads, not N.
+        """
+        with self._lock:
+            self._counts["consistent"] += 1
+            queued = self._next_read.get(email)
+            if queued is not None:
+                self._counts["consistent_coalesced"] += 1
+                flight = queued
+                leader = False
+            else:
+                flight = _Flight()
+                running = self._reading.get(email)
+                if running is None:
+                    self._reading[email] = flight
+                else:
+                    self._next_read[email] = flight
+                leader = True
+
+        if not leader:
+            return flight.wait()
+
+        if running is not None:
+            running.done.wait()
+            with self._lock:
+                del self._next_read[email]
+                self._reading[email] = flight
+
+        try:
+            flight.value = self.inner.get(email, consistent=True)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._reading[email]
+                if flight.error is None and flight.cacheable:
+                    self._store(email, flight.value)  # fresher than anything cached
+            flight.done.set()
+        return flight.value
+
+    # ---------- internal (caller holds self._lock) ----------
+    def _lookup(self, email):
+        entry = self._entries.get(email)
+        if entry is None:
+            return _MISSING
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[email]
+            return _MISSING
+        self._entries.move_to_end(email)
+        return user
+
+    def _store(self, email, user):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[email] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
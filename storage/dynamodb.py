@@ -0,0 +1,854 @@
+"""
+DynamoDB backend (AWS mode).
+
+Tables (names prefixed, default ``SnapStream``):
+
+    <prefix>Users          email                     users
+    <prefix>Media          id   + GSI email/created  media, newest first per owner
+    <prefix>Notifications  id   + GSI email/seq      notifications per owner
+    <prefix>Counters       pk                        "media#<email>"  status counters
+                                                     "inbox#<email>"  next_seq / read_upto / unread
+                                                     "blob#<key>"     blob reference count
+    <prefix>Sessions       sid                       server-side sessions, TTL on expires_at
+
+Listing is a ``Query`` on the owner's GSI, never a Scan. A media write and
+its counter update go in one ``TransactWriteItems`` call, so dashboard
+stats are a single ``GetItem`` and can't drift. Notification ``seq`` comes
+from an atomic counter on the inbox item and doubles as the SSE event id.
+Bulk deletes (account deletion, "clear all", inbox trimming) go out 25 keys
+per ``BatchWriteItem`` and multi-media reads 100 keys per ``BatchGetItem``;
+unprocessed keys are retried with exponential backoff.
+
+Run against DynamoDB Local / moto with
+``dynamodb://us-east-1?endpoint_url=http://localhost:8000&create_tables=1``
+or ``flask --app app_aws create-tables``.
+"""
+
+import base64
+import binascii
+import json
+import random
+import time
+from decimal import Decimal
+from urllib.parse import parse_qs, urlsplit
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from storage import base
+
+MEDIA_INDEX = "email-created-index"
+NOTIFICATION_INDEX = "email-seq-index"
+
+TRIM_EVERY = 25  # notifications: trim the inbox back to retention every N adds
+
+BATCH_WRITE_MAX = 25  # DynamoDB limits per request
+BATCH_GET_MAX = 100
+TRANSACT_MAX = 100  # items per TransactWriteItems
+BATCH_RETRIES = 8
+STATUS_RETRIES = 5  # set_status re-reads after a lost race at most this often
+
+
+class LazyResource:
+    """The DynamoDB resource, created through ``aws`` (an AWSClients) on first use."""
+
+    def __init__(self, aws, endpoint_url=None):
+        self.aws = aws
+        self.endpoint_url = endpoint_url
+
+    def Table(self, name):
+        return LazyTable(self, name)
+
+    def __getattr__(self, attr):
+        return getattr(self.aws.resource("dynamodb", self.endpoint_url), attr)
+
+
+class LazyTable:
+    """``Table`` handle that doesn't touch boto3 until the first call, so worker boot stays cheap."""
+
+    def __init__(self, resource, name):
+        self._resource = resource
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._resource.aws.resource("dynamodb", self._resource.endpoint_url).Table(self.name), attr)
+
+
+def from_url(url, aws=None):
+    """``dynamodb://<region>?endpoint_url=&prefix=&create_tables=`` -> (resource, prefix, options)."""
+    from aws_clients import AWSClients
+
+    parts = urlsplit(url)
+    options = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    aws = aws or AWSClients.from_env(parts.netloc or None)
+    return LazyResource(aws, options.get("endpoint_url")), options.get("prefix", "SnapStream"), options
+
+
+def table_names(prefix):
+    return {
+        "users": f"{prefix}Users",
+        "media": f"{prefix}Media",
+        "notifications": f"{prefix}Notifications",
+        "counters": f"{prefix}Counters",
+        "sessions": f"{prefix}Sessions",
+    }
+
+
+def ensure_tables(dynamodb, prefix="SnapStream"):
+    """Create any missing table (on-demand billing) and wait until they're active."""
+    names = table_names(prefix)
+    specs = {
+        "users": {"KeySchema": [("email", "S", "HASH")]},
+        "media": {
+            "KeySchema": [("id", "S", "HASH")],
+            "Index": (MEDIA_INDEX, [("email", "S", "HASH"), ("created", "N", "RANGE")]),
+        },
+        "notifications": {
+            "KeySchema": [("id", "S", "HASH")],
+            "Index": (NOTIFICATION_INDEX, [("email", "S", "HASH"), ("seq", "N", "RANGE")]),
+        },
+        "counters": {"KeySchema": [("pk", "S", "HASH")]},
+        "sessions": {"KeySchema": [("sid", "S", "HASH")], "TTL": "expires_at"},
+    }
+
+    existing = {t.name for t in dynamodb.tables.all()}
+    created = []
+    for kind, spec in specs.items():
+        if names[kind] in existing:
+            continue
+
+        attrs = {name: type_ for name, type_, _ in spec["KeySchema"]}
+        params = {
+            "TableName": names[kind],
+            "KeySchema": [{"AttributeName": n, "KeyType": k} for n, _, k in spec["KeySchema"]],
+            "BillingMode": "PAY_PER_REQUEST",
+        }
+        if "Index" in spec:
+            index_name, index_keys = spec["Index"]
+            attrs.update({name: type_ for name, type_, _ in index_keys})
+            params["GlobalSecondaryIndexes"] = [
+                {
+                    "IndexName": index_name,
+                    "KeySchema": [{"AttributeName": n, "KeyType": k} for n, _, k in index_keys],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ]
+        params["AttributeDefinitions"] = [{"AttributeName": n, "AttributeType": t} for n, t in attrs.items()]
+
+        dynamodb.create_table(**params)
+        created.append(names[kind])
+
+    for name in created:
+        dynamodb.Table(name).wait_until_exists()
+    for kind, spec in specs.items():
+        if names[kind] in created and "TTL" in spec:
+            # DynamoDB deletes expired items itself (within a day or two, readers still check)
+            dynamodb.meta.client.update_time_to_live(
+                TableName=names[kind],
+                TimeToLiveSpecification={"Enabled": True, "AttributeName": spec["TTL"]},
+            )
+    return created
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode()
+
+
+def _decode_cursor(cursor, email, sort_key):
+    """Turn a page cursor back into an ExclusiveStartKey for ``email``'s GSI query."""
+    if cursor is None:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict) or key.get("email") != email or set(key) != {"id", "email", sort_key}:
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _page_query(table, index, email, sort_key, limit, cursor, **query):
+    """
+    One GSI page, newest first. Asks for ``limit + 1`` items so the last
+    page is known without an extra empty round-trip.
+    """
+    params = {
+        "IndexName": index,
+        "KeyConditionExpression": Key("email").eq(email),
+        "ScanIndexForward": False,
+        **query,
+    }
+    start_key = _decode_cursor(cursor, email, sort_key)
+    if start_key:
+        params["ExclusiveStartKey"] = start_key
+
+    items = []
+    while True:
+        if limit is not None:
+            params["Limit"] = limit + 1 - len(items)
+        res = table.query(**params)
+        items.extend(res["Items"])
+        if "LastEvaluatedKey" not in res or (limit is not None and len(items) > limit):
+            break
+        params["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = _encode_cursor({"id": last["id"], "email": email, sort_key: int(last[sort_key])})
+    return items, next_cursor
+
+
+def batch_delete(table, keys):
+    """Delete ``keys`` (key dicts) from ``table`` with BatchWriteItem."""
+    client = table.meta.client
+    for i in range(0, len(keys), BATCH_WRITE_MAX):
+        pending = {table.name: [{"DeleteRequest": {"Key": k}} for k in keys[i:i + BATCH_WRITE_MAX]]}
+        for attempt in range(BATCH_RETRIES):
+            pending = client.batch_write_item(RequestItems=pending).get("UnprocessedItems")
+            if not pending:
+                break
+            time.sleep(0.05 * 2 ** attempt)  # throttled - back off before resending the rest
+        else:
+            raise RuntimeError(f"BatchWriteItem on {table.name} still throttled after {BATCH_RETRIES} tries")
+
+
+def batch_get(table, keys, projection=None, consistent=False):
+    """Fetch ``keys`` from ``table`` with BatchGetItem; returns items in no particular order."""
+    client = table.meta.client
+    items = []
+    for i in range(0, len(keys), BATCH_GET_MAX):
+        request = {"Keys": keys[i:i + BATCH_GET_MAX]}
+        if projection:
+            request["ProjectionExpression"] = projection
+        if consistent:
+            request["ConsistentRead"] = True
+        pending = {table.name: request}
+        for attempt in range(BATCH_RETRIES):
+            res = client.batch_get_item(RequestItems=pending)
+            items.extend(res["Responses"].get(table.name, []))
+            pending = res.get("UnprocessedKeys")
+            if not pending:
+                break
+            time.sleep(0.05 * 2 ** attempt)
+        else:
+            raise RuntimeError(f"BatchGetItem on {table.name} still throttled after {BATCH_RETRIES} tries")
+    return items
+
+
+def _is_conditional_failure(e):
+    return e.response["Error"]["Code"] in ("ConditionalCheckFailedException", "TransactionCanceledException")
+
+
+def _cancelled_by_condition(e):
+    """True if a TransactWriteItems was cancelled because a condition failed (not a conflict / throttle)."""
+    if e.response["Error"]["Code"] != "TransactionCanceledException":
+        return False
+    reasons = e.response.get("CancellationReasons", [])
+    return any(r.get("Code") == "ConditionalCheckFailed" for r in reasons)
+
+
+class UserStore(base.UserStore):
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, email, consistent=False):
+        return self.table.get_item(Key={"email": email}, ConsistentRead=consistent).get("Item")
+
+    def add(self, user):
+        try:
+            self.table.put_item(Item=user, ConditionExpression="attribute_not_exists(email)")
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return False
+            raise
+        return True
+
+    def update(self, email, **fields):
+        fields = {k: v for k, v in fields.items() if k in ("username", "password")}
+        if not fields:
+            return self.get(email)
+        try:
+            res = self.table.update_item(
+                Key={"email": email},
+                UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in fields),
+                ExpressionAttributeNames={f"#{k}": k for k in fields},
+                ExpressionAttributeValues={f":{k}": v for k, v in fields.items()},
+                ConditionExpression="attribute_exists(email)",
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return None
+            raise
+        return res["Attributes"]
+
+    def delete(self, email):
+        res = self.table.delete_item(Key={"email": email}, ReturnValues="ALL_OLD")
+        return "Attributes" in res
+
+
+class ReclaimJobs(base.ReclaimJobs):
+    """
+    Jobs live in the Counters table as ``reclaim#<email>`` items; the
+    ``reclaim#pending`` item holds the set of their emails so ``pending()``
+    is one GetItem rather than a scan.
+    """
+
+    PENDING_KEY = {"pk": "reclaim#pending"}
+
+    def __init__(self, table):
+        self.table = table
+
+    def start(self, job):
+        try:
+            self.table.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": self.table.name,
+                            "Item": {"pk": f"reclaim#{job['email']}", "job": json.dumps(job), "lease_until": 0},
+                            "ConditionExpression": "attribute_not_exists(pk)",
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": self.PENDING_KEY,
+                            "UpdateExpression": "ADD emails :e",
+                            "ExpressionAttributeValues": {":e": {job["email"]}},
+                        }
+                    },
+                ]
+            )
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return False
+            raise
+        return True
+
+    def get(self, email):
+        item = self.table.get_item(Key={"pk": f"reclaim#{email}"}).get("Item")
+        return json.loads(item["job"]) if item else None
+
+    def pending(self):
+        item = self.table.get_item(Key=self.PENDING_KEY).get("Item") or {}
+        return sorted(item.get("emails", ()))
+
+    def claim(self, email, worker, lease_until):
+        try:
+            res = self.table.update_item(
+                Key={"pk": f"reclaim#{email}"},
+                UpdateExpression="SET worker = :w, lease_until = :l",
+                ConditionExpression="attribute_exists(pk) AND (worker = :w OR lease_until < :now)",
+                ExpressionAttributeValues={
+                    ":w": worker,
+                    ":l": Decimal(str(round(lease_until, 3))),
+                    ":now": Decimal(str(round(time.time(), 3))),
+                },
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return None
+            raise
+        return json.loads(res["Attributes"]["job"])
+
+    def save(self, job, worker, lease_until):
+        try:
+            self.table.update_item(
+                Key={"pk": f"reclaim#{job['email']}"},
+                UpdateExpression="SET job = :j, lease_until = :l",
+                ConditionExpression="worker = :w",
+                ExpressionAttributeValues={
+                    ":j": json.dumps(job),
+                    ":l": Decimal(str(round(lease_until, 3))),
+                    ":w": worker,
+                },
+            )
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return False
+            raise
+        return True
+
+    def finish(self, email):
+        self.table.meta.client.transact_write_items(
+            TransactItems=[
+                {"Delete": {"TableName": self.table.name, "Key": {"pk": f"reclaim#{email}"}}},
+                {
+                    "Update": {
+                        "TableName": self.table.name,
+                        "Key": self.PENDING_KEY,
+                        "UpdateExpression": "DELETE emails :e",
+                        "ExpressionAttributeValues": {":e": {email}},
+                    }
+                },
+            ]
+        )
+
+
+class BlobRefs(base.BlobRefs):
+    def __init__(self, table):
+        self.table = table
+
+    def incr(self, key):
+        res = self.table.update_item(
+            Key={"pk": f"blob#{key}"},
+            UpdateExpression="ADD refs :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(res["Attributes"]["refs"])
+
+    def decr(self, key):
+        res = self.table.update_item(
+            Key={"pk": f"blob#{key}"},
+            UpdateExpression="ADD refs :minus",
+            ExpressionAttributeValues={":minus": -1},
+            ReturnValues="UPDATED_NEW",
+        )
+        refs = int(res["Attributes"]["refs"])
+        if refs > 0:
+            return refs
+        try:
+            # tombstone, only if nobody took a new reference in between (that one keeps the object)
+            self.table.update_item(
+                Key={"pk": f"blob#{key}"},
+                UpdateExpression="SET deleting_until = :until",
+                ConditionExpression="refs <= :zero",
+                ExpressionAttributeValues={":zero": 0, ":until": int(time.time()) + base.BLOB_DELETE_LEASE},
+            )
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+            return 1
+        return 0
+
+    def deleting(self, key):
+        item = self.table.get_item(Key={"pk": f"blob#{key}"}, ConsistentRead=True).get("Item") or {}
+        return int(item.get("deleting_until", 0)) > time.time()
+
+    def finish_delete(self, key):
+        try:
+            self.table.delete_item(
+                Key={"pk": f"blob#{key}"},
+                ConditionExpression="refs <= :zero",
+                ExpressionAttributeValues={":zero": 0},
+            )
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+            # referenced again: keep the count, lift the tombstone
+            self.table.update_item(Key={"pk": f"blob#{key}"}, UpdateExpression="REMOVE deleting_until")
+
+    def get(self, key):
+        item = self.table.get_item(Key={"pk": f"blob#{key}"}).get("Item")
+        return int(item["refs"]) if item else 0
+
+
+class Versions(base.Versions):
+    """
+    One Counters item per user, ``versions#<email>``, with a numeric attribute
+    per kind. The change log is a ring of Counters items,
+    ``changes#<kind>#<email>#<slot>``, each holding the version it was written for.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, email):
+        # strongly consistent: an ETag must never outlive a write this user just made
+        item = self.table.get_item(Key={"pk": f"versions#{email}"}, ConsistentRead=True).get("Item") or {}
+        return {kind: int(v) for kind, v in item.items() if kind != "pk"}
+
+    def bump(self, email, kind, changed=None):
+        res = self.table.update_item(
+            Key={"pk": f"versions#{email}"},
+            UpdateExpression="ADD #kind :one",
+            ExpressionAttributeNames={"#kind": kind},
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        version = int(res["Attributes"][kind])
+        if changed is not None:
+            self.table.put_item(
+                Item={"pk": self._slot(email, kind, version), "version": version, "ids": json.dumps(list(changed))}
+            )
+        return version
+
+    def changes(self, email, kind, versions):
+        versions = list(versions)
+        # strongly consistent, like get(): a reader that saw the version must see its entry
+        items = batch_get(self.table, [{"pk": self._slot(email, kind, v)} for v in versions], consistent=True)
+        wanted = set(versions)
+        return {int(i["version"]): json.loads(i["ids"]) for i in items if int(i["version"]) in wanted}
+
+    def _slot(self, email, kind, version):
+        return f"changes#{kind}#{email}#{version % self.CHANGE_LOG}"
+
+
+class Sessions(base.Sessions):
+    """
+    One item per session in the Sessions table, ``data`` as a JSON string.
+    ``expires_at`` is whole epoch seconds, the table's TTL attribute.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, key):
+        # strongly consistent: the request right after a login must see its session
+        item = self.table.get_item(Key={"sid": key}, ConsistentRead=True).get("Item")
+        if item is None:
+            return None
+        return {"data": json.loads(item["data"]), "generation": int(item["generation"]), "expires_at": int(item["expires_at"])}
+
+    def put(self, key, record):
+        self.table.put_item(
+            Item={
+                "sid": key,
+                "data": json.dumps(record["data"]),
+                "generation": record["generation"],
+                "expires_at": int(record["expires_at"]),
+            }
+        )
+
+    def touch(self, key, expires_at):
+        try:
+            self.table.update_item(
+                Key={"sid": key},
+                UpdateExpression="SET expires_at = :e",
+                ExpressionAttributeValues={":e": int(expires_at)},
+                ConditionExpression="attribute_exists(sid)",
+            )
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+
+    def delete(self, key):
+        self.table.delete_item(Key={"sid": key})
+
+
+def _media(item):
+    media = {k: v for k, v in item.items() if k not in ("created", "analysis")}
+    media["size_kb"] = float(media["size_kb"])
+    return media
+
+
+class MediaStore(base.MediaStore):
+    def __init__(self, table, counters, check_counters=False):
+        super().__init__(check_counters)
+        self.table = table
+        self.counters = counters
+
+    # ---------- writes ----------
+    def add(self, media):
+        item = dict(media, created=time.time_ns())
+        item["size_kb"] = Decimal(str(item["size_kb"]))
+        self.table.meta.client.transact_write_items(
+            TransactItems=[
+                {"Put": {"TableName": self.table.name, "Item": item}},
+                self._bump(media["email"], {media["status"]: 1}),
+            ]
+        )
+        return media
+
+    def set_status(self, media_id, status):
+        for attempt in range(STATUS_RETRIES):
+            media = self.get(media_id)
+            if media is None or media["status"] == status:
+                return media
+            try:
+                self.table.meta.client.transact_write_items(
+                    TransactItems=[
+                        {
+                            "Update": {
+                                "TableName": self.table.name,
+                                "Key": {"id": media_id},
+                                "UpdateExpression": "SET #s = :new",
+                                "ConditionExpression": "#s = :old",
+                                "ExpressionAttributeNames": {"#s": "status"},
+                                "ExpressionAttributeValues": {":new": status, ":old": media["status"]},
+                            }
+                        },
+                        self._bump(media["email"], {media["status"]: -1, status: 1}),
+                    ]
+                )
+            except ClientError as e:
+                if not _cancelled_by_condition(e) or attempt == STATUS_RETRIES - 1:
+                    raise
+                # changed or deleted concurrently - back off (jittered, so racing writers spread out) and re-read
+                time.sleep(random.uniform(0, 0.02 * 2 ** attempt))
+                continue
+            media["status"] = status
+            return media
+
+    def save_analysis(self, media_id, analysis):
+        try:
+            self.table.update_item(
+                Key={"id": media_id},
+                UpdateExpression="SET analysis = :a",
+                ExpressionAttributeValues={":a": json.dumps(analysis)},
+                ConditionExpression="attribute_exists(id)",
+            )
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+
+    def delete(self, media_id):
+        media = self.get(media_id)
+        if media is None:
+            return None
+        try:
+            self.table.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Delete": {
+                            "TableName": self.table.name,
+                            "Key": {"id": media_id},
+                            "ConditionExpression": "attribute_exists(id)",
+                        }
+                    },
+                    self._bump(media["email"], {media["status"]: -1}),
+                ]
+            )
+        except ClientError as e:
+            if _is_conditional_failure(e):
+                return None
+            raise
+        return media
+
+    def delete_many(self, media_ids):
+        """
+        One BatchGetItem for the records, then one transaction per ~90 of
+        them (the conditional deletes plus one counter update per owner).
+        A chunk that loses a race with another delete is redone item by item.
+        """
+        records = self.get_many(media_ids)
+        deleted = []
+        step = TRANSACT_MAX - 10  # leave room for the counter updates
+        for i in range(0, len(records), step):
+            chunk = records[i:i + step]
+            deltas = {}
+            for media in chunk:
+                owner = deltas.setdefault(media["email"], {})
+                owner[media["status"]] = owner.get(media["status"], 0) - 1
+            if len(deltas) > TRANSACT_MAX - len(chunk):
+                deleted.extend(m for m in (self.delete(media["id"]) for media in chunk) if m is not None)
+                continue
+            items = [
+                {
+                    "Delete": {
+                        "TableName": self.table.name,
+                        "Key": {"id": media["id"]},
+                        "ConditionExpression": "attribute_exists(id)",
+                    }
+                }
+                for media in chunk
+            ]
+            items.extend(self._bump(email, owner_deltas) for email, owner_deltas in deltas.items())
+            try:
+                self.table.meta.client.transact_write_items(TransactItems=items)
+            except ClientError as e:
+                if not _is_conditional_failure(e):
+                    raise
+                deleted.extend(m for m in (self.delete(media["id"]) for media in chunk) if m is not None)
+                continue
+            deleted.extend(chunk)
+        return deleted
+
+    def set_tags_many(self, tags_by_id):
+        media_ids = list(tags_by_id)
+        for i in range(0, len(media_ids), TRANSACT_MAX):
+            chunk = media_ids[i:i + TRANSACT_MAX]
+            items = [
+                {
+                    "Update": {
+                        "TableName": self.table.name,
+                        "Key": {"id": media_id},
+                        "UpdateExpression": "SET tags = :t",
+                        "ConditionExpression": "attribute_exists(id)",
+                        "ExpressionAttributeValues": {":t": list(tags_by_id[media_id])},
+                    }
+                }
+                for media_id in chunk
+            ]
+            try:
+                self.table.meta.client.transact_write_items(TransactItems=items)
+            except ClientError as e:
+                if not _is_conditional_failure(e):
+                    raise
+                for update in items:  # one was deleted meanwhile - update the rest one by one
+                    update = update["Update"]
+                    try:
+                        self.table.update_item(
+                            Key=update["Key"],
+                            UpdateExpression=update["UpdateExpression"],
+                            ConditionExpression=update["ConditionExpression"],
+                            ExpressionAttributeValues=update["ExpressionAttributeValues"],
+                        )
+                    except ClientError as e:
+                        if not _is_conditional_failure(e):
+                            raise
+        return self.get_many(media_ids)
+
+    def delete_owner(self, email):
+        removed = self.list_owner(email)
+        batch_delete(self.table, [{"id": m["id"]} for m in removed])
+        self.counters.delete_item(Key={"pk": f"media#{email}"})
+        return removed
+
+    # ---------- reads ----------
+    def get(self, media_id, email=None):
+        item = self.table.get_item(Key={"id": media_id}).get("Item")
+        if item is None or (email is not None and item["email"] != email):
+            return None
+        return _media(item)
+
+    def get_many(self, media_ids, email=None):
+        media_ids = list(dict.fromkeys(media_ids))
+        found = {i["id"]: i for i in batch_get(self.table, [{"id": media_id} for media_id in media_ids])}
+        return [
+            _media(found[media_id])
+            for media_id in media_ids
+            if media_id in found and (email is None or found[media_id]["email"] == email)
+        ]
+
+    def get_analysis(self, media_id):
+        item = self.table.get_item(Key={"id": media_id}, ProjectionExpression="analysis").get("Item")
+        return json.loads(item["analysis"]) if item and "analysis" in item else None
+
+    def page(self, email, limit=None, cursor=None):
+        items, next_cursor = _page_query(self.table, MEDIA_INDEX, email, "created", limit, cursor)
+        return [_media(i) for i in items], next_cursor
+
+    # ---------- internal ----------
+    def _counts(self, email):
+        item = self.counters.get_item(Key={"pk": f"media#{email}"}).get("Item") or {}
+        return {status: int(item[status]) for status in self.STATUSES if status in item}
+
+    def _bump(self, email, deltas):
+        """Counter update as a TransactWriteItems entry."""
+        names = {f"#s{i}": status for i, status in enumerate(deltas)}
+        values = {f":d{i}": delta for i, delta in enumerate(deltas.values())}
+        return {
+            "Update": {
+                "TableName": self.counters.name,
+                "Key": {"pk": f"media#{email}"},
+                "UpdateExpression": "ADD " + ", ".join(f"#s{i} :d{i}" for i in range(len(deltas))),
+                "ExpressionAttributeNames": names,
+                "ExpressionAttributeValues": values,
+            }
+        }
+
+
+class NotificationStore(base.NotificationStore):
+    """
+    ``add`` takes the next ``seq`` from the inbox item (also bumping the
+    unread counter) and then writes the note. Every ``TRIM_EVERY`` adds the
+    inbox is trimmed back to ``retention`` with one batched delete.
+    """
+
+    def __init__(self, table, counters, retention=500):
+        super().__init__(retention)
+        self.table = table
+        self.counters = counters
+
+    # ---------- writes ----------
+    def add(self, note, on_stored=None):
+        email = note["email"]
+        res = self.counters.update_item(
+            Key={"pk": f"inbox#{email}"},
+            UpdateExpression="ADD next_seq :one, unread :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="ALL_NEW",
+        )
+        inbox = res["Attributes"]
+        seq = int(inbox["next_seq"])
+
+        item = {k: v for k, v in note.items() if k != "status"}
+        self.table.put_item(Item=dict(item, seq=seq))
+
+        if seq > self.retention and seq % TRIM_EVERY == 0:
+            self._trim(email, seq - self.retention, int(inbox.get("read_upto", 0)))
+
+        if on_stored is not None:
+            on_stored(seq)
+        return seq
+
+    def mark_all_read(self, email):
+        try:
+            self.counters.update_item(
+                Key={"pk": f"inbox#{email}"},
+                UpdateExpression="SET read_upto = next_seq, unread = :zero",
+                ExpressionAttributeValues={":zero": 0},
+                ConditionExpression="attribute_exists(pk)",
+            )
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+
+    def clear(self, email):
+        self._delete_upto(email, None)
+        # keep next_seq so SSE event ids never go backwards for this user
+        self.mark_all_read(email)
+
+    # ---------- reads ----------
+    def page(self, email, limit=None, cursor=None):
+        items, next_cursor = _page_query(self.table, NOTIFICATION_INDEX, email, "seq", limit, cursor)
+        read_upto = self._inbox(email).get("read_upto", 0)
+        return [self._note(i, read_upto) for i in items], next_cursor
+
+    def since(self, email, after_seq, limit):
+        res = self.table.query(
+            IndexName=NOTIFICATION_INDEX,
+            KeyConditionExpression=Key("email").eq(email) & Key("seq").gt(after_seq),
+            ScanIndexForward=False,
+            Limit=limit,
+        )
+        read_upto = self._inbox(email).get("read_upto", 0)
+        return [(int(i["seq"]), self._note(i, read_upto)) for i in reversed(res["Items"])]
+
+    def unread_count(self, email):
+        return int(self._inbox(email).get("unread", 0))
+
+    # ---------- internal ----------
+    def _inbox(self, email):
+        return self.counters.get_item(Key={"pk": f"inbox#{email}"}).get("Item") or {}
+
+    def _note(self, item, read_upto):
+        note = {k: v for k, v in item.items() if k != "seq"}
+        note["status"] = "Read" if item["seq"] <= read_upto else "Unread"
+        return note
+
+    def _trim(self, email, cutoff, read_upto):
+        dropped_unread = self._delete_upto(email, cutoff, read_upto)
+        if dropped_unread:
+            self.counters.update_item(
+                Key={"pk": f"inbox#{email}"},
+                UpdateExpression="ADD unread :minus",
+                ExpressionAttributeValues={":minus": -dropped_unread},
+            )
+
+    def _delete_upto(self, email, cutoff, read_upto=0):
+        """Delete notes with ``seq <= cutoff`` (all if None); returns how many were unread."""
+        condition = Key("email").eq(email)
+        if cutoff is not None:
+            condition &= Key("seq").lte(cutoff)
+        params = {
+            "IndexName": NOTIFICATION_INDEX,
+            "KeyConditionExpression": condition,
+            "ProjectionExpression": "id, seq",
+        }
+
+        unread = 0
+        while True:
+            res = self.table.query(**params)
+            batch_delete(self.table, [{"id": item["id"]} for item in res["Items"]])
+            unread += sum(item["seq"] > read_upto for item in res["Items"])
+            if "LastEvaluatedKey" not in res:
+                break
+            params["ExclusiveStartKey"] = res["LastEvaluatedKey"]
+        return unread
@@ -0,0 +1,452 @@
+"""
+In-memory stores: the default for local mode, one process only.
+"""
+
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+
+from storage import base
+
+
+class UserStore(base.UserStore):
+    def __init__(self):
+        self._users = {}  # email -> {username,email,password}
+
+    def get(self, email, consistent=False):
+        return self._users.get(email)
+
+    def add(self, user):
+        return self._users.setdefault(user["email"], user) is user
+
+    def update(self, email, **fields):
+        user = self._users.get(email)
+        if user is not None:
+            user.update(fields)
+        return user
+
+    def delete(self, email):
+        return self._users.pop(email, None) is not None
+
+
+class ReclaimJobs(base.ReclaimJobs):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # email -> [job, worker, lease_until]
+
+    def start(self, job):
+        with self._lock:
+            if job["email"] in self._jobs:
+                return False
+            self._jobs[job["email"]] = [dict(job), None, 0]
+            return True
+
+    def get(self, email):
+        with self._lock:
+            entry = self._jobs.get(email)
+            return dict(entry[0]) if entry else None
+
+    def pending(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def claim(self, email, worker, lease_until):
+        with self._lock:
+            entry = self._jobs.get(email)
+            if entry is None or (entry[1] != worker and entry[2] > time.time()):
+                return None
+            entry[1], entry[2] = worker, lease_until
+            return dict(entry[0])
+
+    def save(self, job, worker, lease_until):
+        with self._lock:
+            entry = self._jobs.get(job["email"])
+            if entry is None or entry[1] != worker:
+                return False
+            entry[0], entry[2] = dict(job), lease_until
+            return True
+
+    def finish(self, email):
+        with self._lock:
+            self._jobs.pop(email, None)
+
+
+class BlobRefs(base.BlobRefs):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refs = {}
+        self._tombstones = {}  # key -> deleting until (epoch seconds)
+
+    def incr(self, key):
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+            return self._refs[key]
+
+    def decr(self, key):
+        with self._lock:
+            count = self._refs.get(key, 0) - 1
+            if count > 0:
+                self._refs[key] = count
+                return count
+            self._refs.pop(key, None)
+            self._tombstones[key] = time.time() + base.BLOB_DELETE_LEASE
+            return 0
+
+    def deleting(self, key):
+        with self._lock:
+            return self._tombstones.get(key, 0) > time.time()
+
+    def finish_delete(self, key):
+        with self._lock:
+            self._tombstones.pop(key, None)
+
+    def get(self, key):
+        return self._refs.get(key, 0)
+
+
+class Versions(base.Versions):
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]  # a restart starts counting from 0 again
+        self._lock = threading.Lock()
+        self._versions = {}  # email -> {kind: version}
+        self._changes = {}  # (email, kind, slot) -> (version, ids)
+
+    def get(self, email):
+        with self._lock:
+            return dict(self._versions.get(email, {}))
+
+    def bump(self, email, kind, changed=None):
+        with self._lock:
+            versions = self._versions.setdefault(email, {})
+            version = versions[kind] = versions.get(kind, 0) + 1
+            if changed is not None:
+                self._changes[(email, kind, version % self.CHANGE_LOG)] = (version, list(changed))
+            return version
+
+    def changes(self, email, kind, versions):
+        found = {}
+        with self._lock:
+            for version in versions:
+                entry = self._changes.get((email, kind, version % self.CHANGE_LOG))
+                if entry is not None and entry[0] == version:
+                    found[version] = list(entry[1])
+        return found
+
+
+class Sessions(base.Sessions):
+    """LRU of at most ``max_entries`` records; the least recently used go first, expired ones on sight."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # key -> record, least recently used first
+
+    def get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records.move_to_end(key)
+            return record
+
+    def put(self, key, record):
+        now = time.time()
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while self._records:
+                oldest_key, oldest = next(iter(self._records.items()))
+                if len(self._records) <= self.max_entries and oldest["expires_at"] > now:
+                    break
+                del self._records[oldest_key]
+
+    def touch(self, key, expires_at):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self._records[key] = dict(record, expires_at=expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class MediaStore(base.MediaStore):
+    """
+    Media repository with an id -> record map and a per-owner index.
+
+    Each owner keeps an append-only list of ``[seq, media_id]`` entries in
+    upload order. Deleting a record only blanks its entry (``media_id`` set
+    to None), so lookup, insert and delete are all O(1); the list is
+    compacted once more than half of it is dead.
+
+    Per-owner status counters are kept in step with every write so
+    ``stats()`` is O(1).
+    """
+
+    COMPACT_MIN_DEAD = 32
+
+    def __init__(self, check_counters=False):
+        super().__init__(check_counters)
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._by_id = {}  # media_id -> media dict
+        self._entry = {}  # media_id -> [seq, media_id] entry in owner list
+        self._by_owner = {}  # email -> [[seq, media_id|None], ...] oldest first
+        self._dead = {}  # email -> number of blanked entries
+        self._counts_by_owner = {}  # email -> {status: count}
+        self._analysis = {}  # media_id -> analysis result
+
+    # ---------- writes ----------
+    def add(self, media):
+        with self._lock:
+            self._seq += 1
+            entry = [self._seq, media["id"]]
+            self._by_owner.setdefault(media["email"], []).append(entry)
+            self._entry[media["id"]] = entry
+            self._by_id[media["id"]] = media
+            self._bump(media["email"], media["status"], 1)
+            return media
+
+    def set_status(self, media_id, status):
+        with self._lock:
+            media = self._by_id.get(media_id)
+            if media is None or media["status"] == status:
+                return media
+            self._bump(media["email"], media["status"], -1)
+            media["status"] = status
+            self._bump(media["email"], status, 1)
+            return media
+
+    def save_analysis(self, media_id, analysis):
+        with self._lock:
+            if media_id in self._by_id:
+                self._analysis[media_id] = analysis
+
+    def delete(self, media_id):
+        with self._lock:
+            media = self._by_id.pop(media_id, None)
+            if media is None:
+                return None
+            self._analysis.pop(media_id, None)
+
+            entry = self._entry.pop(media_id)
+            entry[1] = None
+
+            email = media["email"]
+            self._bump(email, media["status"], -1)
+            dead = self._dead.get(email, 0) + 1
+            entries = self._by_owner[email]
+
+            if dead >= self.COMPACT_MIN_DEAD and dead * 2 > len(entries):
+                entries[:] = [e for e in entries if e[1] is not None]
+                dead = 0
+
+            if not self._entry_count(email, dead):
+                self._by_owner.pop(email, None)
+                self._dead.pop(email, None)
+                self._counts_by_owner.pop(email, None)
+            else:
+                self._dead[email] = dead
+            return media
+
+    def delete_many(self, media_ids):
+        with self._lock:
+            return super().delete_many(media_ids)
+
+    def set_tags_many(self, tags_by_id):
+        with self._lock:
+            updated = []
+            for media_id, tags in tags_by_id.items():
+                media = self._by_id.get(media_id)
+                if media is not None:
+                    media["tags"] = list(tags)
+                    updated.append(media)
+            return updated
+
+    def delete_owner(self, email):
+        with self._lock:
+            removed = self.list_owner(email)
+            for media in removed:
+                self._by_id.pop(media["id"], None)
+                self._entry.pop(media["id"], None)
+                self._analysis.pop(media["id"], None)
+            self._by_owner.pop(email, None)
+            self._dead.pop(email, None)
+            self._counts_by_owner.pop(email, None)
+            return removed
+
+    # ---------- reads ----------
+    def get(self, media_id, email=None):
+        media = self._by_id.get(media_id)
+        if media is None or (email is not None and media["email"] != email):
+            return None
+        return media
+
+    def get_analysis(self, media_id):
+        return self._analysis.get(media_id)
+
+    def count(self, email):
+        with self._lock:
+            return self._entry_count(email, self._dead.get(email, 0))
+
+    def stats(self, email):
+        with self._lock:
+            return super().stats(email)
+
+    def page(self, email, limit=None, cursor=None):
+        """
+        The cursor is the ``seq`` of the last entry returned. Only the
+        returned entries plus any dead ones in between are visited, so a
+        page costs O(limit) regardless of history size.
+        """
+        before_seq = base.parse_seq_cursor(cursor)
+        with self._lock:
+            items, next_seq = _page_entries(self._by_owner.get(email, []), self._by_id, limit, before_seq)
+            return items, base.seq_cursor(next_seq)
+
+    # ---------- internal ----------
+    def _bump(self, email, status, delta):
+        counts = self._counts_by_owner.setdefault(email, {})
+        counts[status] = counts.get(status, 0) + delta
+
+    def _entry_count(self, email, dead):
+        return len(self._by_owner.get(email, ())) - dead
+
+    def _counts(self, email):
+        return self._counts_by_owner.get(email, {})
+
+
+class _Ring:
+    """Fixed-capacity sequence; appending to a full ring evicts the oldest item in O(1)."""
+
+    def __init__(self, capacity):
+        self._slots = [None] * capacity
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        return self._slots[(self._start + i) % len(self._slots)]
+
+    def append(self, item):
+        """Append and return the evicted item (or None)."""
+        cap = len(self._slots)
+        if self._len < cap:
+            self._slots[(self._start + self._len) % cap] = item
+            self._len += 1
+            return None
+        evicted = self._slots[self._start]
+        self._slots[self._start] = item
+        self._start = (self._start + 1) % cap
+        return evicted
+
+
+class _Inbox:
+    __slots__ = ("ring", "read_upto", "unread")
+
+    def __init__(self, retention):
+        self.ring = _Ring(retention)  # [seq, note] oldest first
+        self.read_upto = 0  # every seq <= read_upto is read
+        self.unread = 0
+
+
+class NotificationStore(base.NotificationStore):
+    """
+    Per-user notification inboxes capped at ``retention`` entries (oldest
+    dropped first), so memory stays flat however long the server runs.
+
+    Each inbox keeps a read watermark and an unread counter: "mark all read"
+    only moves the watermark, and the unread count is O(1). The stored
+    notification dicts are never mutated; ``status`` is derived from the
+    watermark when a page is read.
+    """
+
+    def __init__(self, retention=500):
+        super().__init__(retention)
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._inboxes = {}  # email -> _Inbox
+
+    def add(self, note, on_stored=None):
+        with self._lock:
+            self._seq += 1
+            inbox = self._inboxes.get(note["email"])
+            if inbox is None:
+                inbox = self._inboxes[note["email"]] = _Inbox(self.retention)
+
+            evicted = inbox.ring.append([self._seq, note])
+            if evicted is not None and evicted[0] > inbox.read_upto:
+                inbox.unread -= 1
+            inbox.unread += 1
+            seq = self._seq
+
+        if on_stored is not None:
+            on_stored(seq)
+        return seq
+
+    def page(self, email, limit=None, cursor=None):
+        before_seq = base.parse_seq_cursor(cursor)
+        with self._lock:
+            inbox = self._inboxes.get(email)
+            if inbox is None:
+                return [], None
+
+            ring = inbox.ring
+            end = len(ring) if before_seq is None else bisect_left(ring, [before_seq])
+            start = 0 if limit is None else max(0, end - limit)
+
+            items = [self._view(inbox, seq, note) for seq, note in (ring[i] for i in range(end - 1, start - 1, -1))]
+            next_seq = ring[start][0] if start > 0 else None
+            return items, base.seq_cursor(next_seq)
+
+    def since(self, email, after_seq, limit):
+        with self._lock:
+            inbox = self._inboxes.get(email)
+            if inbox is None:
+                return []
+            ring = inbox.ring
+            start = max(bisect_left(ring, [after_seq + 1]), len(ring) - limit)
+            return [(ring[i][0], self._view(inbox, *ring[i])) for i in range(start, len(ring))]
+
+    def unread_count(self, email):
+        inbox = self._inboxes.get(email)
+        return inbox.unread if inbox else 0
+
+    def mark_all_read(self, email):
+        with self._lock:
+            inbox = self._inboxes.get(email)
+            if inbox is not None:
+                inbox.read_upto = self._seq
+                inbox.unread = 0
+
+    def clear(self, email):
+        with self._lock:
+            self._inboxes.pop(email, None)
+
+    def _view(self, inbox, seq, note):
+        return dict(note, status="Read" if seq <= inbox.read_upto else "Unread")
+
+
+def _page_entries(entries, records, limit, before_seq):
+    """Walk ``[seq, id]`` entries backwards from ``before_seq`` and collect one page."""
+    end = len(entries) if before_seq is None else bisect_left(entries, [before_seq])
+
+    items = []
+    last_seq = None
+    for i in range(end - 1, -1, -1):
+        seq, record_id = entries[i]
+        if record_id is None:
+            continue
+        if limit is not None and len(items) >= limit:
+            return items, last_seq
+        items.append(records[record_id])
+        last_seq = seq
+    return items, None
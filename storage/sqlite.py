@@ -0,0 +1,665 @@
+"""
+SQLite backend (WAL mode) for running several Gunicorn workers against one
+consistent on-disk store.
+
+Same interface as ``storage.memory``. Each thread gets its own connection;
+statements are parameterised so sqlite3's per-connection statement cache
+reuses the prepared plans. Notification inserts go through a single writer
+thread that group-commits everything queued while the previous transaction
+was running (one fsync for many logins/uploads).
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from storage import base
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS media (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- upload order, used as the page cursor
+    id TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    stored_name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size_kb REAL NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '[]',
+    analysis TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_media_email_seq ON media (email, seq);
+DROP INDEX IF EXISTS idx_media_email_uploaded;  -- the same index under its old name
+
+CREATE TABLE IF NOT EXISTS media_stats (
+    email TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (email, status)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS notifications (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_email_seq ON notifications (email, seq);
+DROP INDEX IF EXISTS idx_notifications_email_time;  -- the same index under its old name
+
+CREATE TABLE IF NOT EXISTS inbox (
+    email TEXT PRIMARY KEY,
+    read_upto INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS blob_refs (
+    key TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL,
+    deleting_until REAL NOT NULL DEFAULT 0  -- tombstone, see base.BlobRefs
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS versions (
+    email TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (email, kind)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS version_changes (
+    email TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    slot INTEGER NOT NULL,  -- version % Versions.CHANGE_LOG: a ring, overwritten in place
+    version INTEGER NOT NULL,
+    ids TEXT NOT NULL,  -- JSON list
+    PRIMARY KEY (email, kind, slot)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reclaim_jobs (
+    email TEXT PRIMARY KEY,
+    job TEXT NOT NULL,  -- JSON progress
+    worker TEXT,
+    lease_until REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sessions (
+    key TEXT PRIMARY KEY,  -- hash of the session id
+    data TEXT NOT NULL,  -- JSON
+    generation INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+"""
+
+# columns added to existing tables since they were first created: (table, column, definition)
+ADDED_COLUMNS = [
+    ("blob_refs", "deleting_until", "REAL NOT NULL DEFAULT 0"),
+]
+
+MEDIA_COLUMNS = "id, email, filename, stored_name, type, size_kb, uploaded_at, status, tags"
+NOTE_COLUMNS = "seq, id, email, title, message, time"
+
+
+class Database:
+    """Thread-local connections to one WAL-mode database file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self.conn()
+        conn.executescript(SCHEMA)
+        for table, column, definition in ADDED_COLUMNS:
+            if column in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):  # another worker added it first
+                    raise
+
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class UserStore(base.UserStore):
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, email, consistent=False):
+        row = self.db.conn().execute("SELECT email, username, password FROM users WHERE email = ?", (email,)).fetchone()
+        return dict(row) if row else None
+
+    def add(self, user):
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO users (email, username, password) VALUES (?, ?, ?)",
+                (user["email"], user["username"], user["password"]),
+            )
+            return cur.rowcount == 1
+
+    def update(self, email, **fields):
+        allowed = {k: v for k, v in fields.items() if k in ("username", "password")}
+        if allowed:
+            assignments = ", ".join(f"{k} = ?" for k in allowed)
+            with self.db.transaction() as conn:
+                conn.execute(f"UPDATE users SET {assignments} WHERE email = ?", (*allowed.values(), email))
+        return self.get(email)
+
+    def delete(self, email):
+        with self.db.transaction() as conn:
+            return conn.execute("DELETE FROM users WHERE email = ?", (email,)).rowcount == 1
+
+
+class ReclaimJobs(base.ReclaimJobs):
+    def __init__(self, db):
+        self.db = db
+
+    def start(self, job):
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO reclaim_jobs (email, job) VALUES (?, ?)", (job["email"], json.dumps(job))
+            )
+            return cur.rowcount == 1
+
+    def get(self, email):
+        row = self.db.conn().execute("SELECT job FROM reclaim_jobs WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending(self):
+        return [r[0] for r in self.db.conn().execute("SELECT email FROM reclaim_jobs").fetchall()]
+
+    def claim(self, email, worker, lease_until):
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "UPDATE reclaim_jobs SET worker = ?, lease_until = ? "
+                "WHERE email = ? AND (worker IS NULL OR worker = ? OR lease_until < ?) RETURNING job",
+                (worker, lease_until, email, worker, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, job, worker, lease_until):
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE reclaim_jobs SET job = ?, lease_until = ? WHERE email = ? AND worker = ?",
+                (json.dumps(job), lease_until, job["email"], worker),
+            )
+            return cur.rowcount == 1
+
+    def finish(self, email):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM reclaim_jobs WHERE email = ?", (email,))
+
+
+class BlobRefs(base.BlobRefs):
+    def __init__(self, db):
+        self.db = db
+
+    def incr(self, key):
+        with self.db.transaction() as conn:
+            return conn.execute(
+                "INSERT INTO blob_refs (key, refs) VALUES (?, 1) "
+                "ON CONFLICT (key) DO UPDATE SET refs = refs + 1 RETURNING refs",
+                (key,),
+            ).fetchone()[0]
+
+    def decr(self, key):
+        with self.db.transaction() as conn:
+            row = conn.execute("UPDATE blob_refs SET refs = refs - 1 WHERE key = ? RETURNING refs", (key,)).fetchone()
+            if row is not None and row[0] > 0:
+                return row[0]
+            # same transaction: a new reference either came before (count > 0) or sees the tombstone
+            conn.execute(
+                "INSERT OR REPLACE INTO blob_refs (key, refs, deleting_until) VALUES (?, 0, ?)",
+                (key, time.time() + base.BLOB_DELETE_LEASE),
+            )
+            return 0
+
+    def deleting(self, key):
+        row = self.db.conn().execute("SELECT deleting_until FROM blob_refs WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def finish_delete(self, key):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM blob_refs WHERE key = ? AND refs <= 0", (key,))
+            conn.execute("UPDATE blob_refs SET deleting_until = 0 WHERE key = ?", (key,))
+
+    def get(self, key):
+        row = self.db.conn().execute("SELECT refs FROM blob_refs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+
+class Versions(base.Versions):
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, email):
+        rows = self.db.conn().execute("SELECT kind, version FROM versions WHERE email = ?", (email,))
+        return {kind: version for kind, version in rows}
+
+    def bump(self, email, kind, changed=None):
+        sql = (
+            "INSERT INTO versions (email, kind, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (email, kind) DO UPDATE SET version = version + 1 RETURNING version"
+        )
+        if changed is None:
+            return self.db.conn().execute(sql, (email, kind)).fetchone()[0]
+        # one transaction: a reader that sees the version also sees its ids
+        with self.db.transaction() as conn:
+            version = conn.execute(sql, (email, kind)).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO version_changes (email, kind, slot, version, ids) VALUES (?, ?, ?, ?, ?)",
+                (email, kind, version % self.CHANGE_LOG, version, json.dumps(list(changed))),
+            )
+        return version
+
+    def changes(self, email, kind, versions):
+        versions = list(versions)
+        if not versions:
+            return {}
+        rows = self.db.conn().execute(
+            f"SELECT version, ids FROM version_changes WHERE email = ? AND kind = ? "
+            f"AND version IN ({','.join('?' * len(versions))})",
+            [email, kind, *versions],
+        )
+        return {version: json.loads(ids) for version, ids in rows}
+
+
+class Sessions(base.Sessions):
+    """One row per session; every ``PURGE_EVERY`` writes also delete the expired ones."""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, db):
+        self.db = db
+        self._puts = 0
+
+    def get(self, key):
+        row = self.db.conn().execute(
+            "SELECT data, generation, expires_at FROM sessions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"data": json.loads(row["data"]), "generation": row["generation"], "expires_at": row["expires_at"]}
+
+    def put(self, key, record):
+        conn = self.db.conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (key, data, generation, expires_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(record["data"]), record["generation"], record["expires_at"]),
+        )
+        self._puts += 1
+        if self._puts % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def touch(self, key, expires_at):
+        self.db.conn().execute("UPDATE sessions SET expires_at = ? WHERE key = ?", (expires_at, key))
+
+    def delete(self, key):
+        self.db.conn().execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+
+def _media(row):
+    media = dict(row)
+    media["tags"] = json.loads(media["tags"])
+    media.pop("seq", None)
+    return media
+
+
+class MediaStore(base.MediaStore):
+    """
+    Media rows plus a ``media_stats`` counter table that is updated in the
+    same transaction as every insert / status change / delete, so stats are
+    a primary-key lookup. ``check_counters`` recomputes with GROUP BY.
+    """
+
+    def __init__(self, db, check_counters=False):
+        super().__init__(check_counters)
+        self.db = db
+
+    # ---------- writes ----------
+    def add(self, media):
+        with self.db.transaction() as conn:
+            conn.execute(
+                f"INSERT INTO media ({MEDIA_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    media["id"], media["email"], media["filename"], media["stored_name"], media["type"],
+                    media["size_kb"], media["uploaded_at"], media["status"], json.dumps(media["tags"]),
+                ),
+            )
+            self._bump(conn, media["email"], media["status"], 1)
+        return media
+
+    def set_status(self, media_id, status):
+        with self.db.transaction() as conn:
+            row = conn.execute(f"SELECT {MEDIA_COLUMNS} FROM media WHERE id = ?", (media_id,)).fetchone()
+            if row is None:
+                return None
+            media = _media(row)
+            if media["status"] != status:
+                conn.execute("UPDATE media SET status = ? WHERE id = ?", (status, media_id))
+                self._bump(conn, media["email"], media["status"], -1)
+                self._bump(conn, media["email"], status, 1)
+                media["status"] = status
+            return media
+
+    def save_analysis(self, media_id, analysis):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE media SET analysis = ? WHERE id = ?", (json.dumps(analysis), media_id))
+
+    def delete(self, media_id):
+        with self.db.transaction() as conn:
+            row = conn.execute(f"DELETE FROM media WHERE id = ? RETURNING {MEDIA_COLUMNS}", (media_id,)).fetchone()
+            if row is None:
+                return None
+            media = _media(row)
+            self._bump(conn, media["email"], media["status"], -1)
+            return media
+
+    def delete_many(self, media_ids):
+        media_ids = list(dict.fromkeys(media_ids))
+        deleted = {}
+        with self.db.transaction() as conn:
+            for i in range(0, len(media_ids), 500):  # stay under SQLITE_MAX_VARIABLE_NUMBER
+                chunk = media_ids[i:i + 500]
+                rows = conn.execute(
+                    f"DELETE FROM media WHERE id IN ({','.join('?' * len(chunk))}) RETURNING {MEDIA_COLUMNS}", chunk
+                ).fetchall()
+                deleted.update((r["id"], _media(r)) for r in rows)
+
+            deltas = {}
+            for media in deleted.values():
+                key = (media["email"], media["status"])
+                deltas[key] = deltas.get(key, 0) - 1
+            for (email, status), delta in deltas.items():
+                self._bump(conn, email, status, delta)
+        return [deleted[media_id] for media_id in media_ids if media_id in deleted]
+
+    def set_tags_many(self, tags_by_id):
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "UPDATE media SET tags = ? WHERE id = ?",
+                [(json.dumps(list(tags)), media_id) for media_id, tags in tags_by_id.items()],
+            )
+        return self.get_many(tags_by_id)
+
+    def delete_owner(self, email):
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                f"DELETE FROM media WHERE email = ? RETURNING seq, {MEDIA_COLUMNS}", (email,)
+            ).fetchall()
+            conn.execute("DELETE FROM media_stats WHERE email = ?", (email,))
+        rows.sort(key=lambda r: r["seq"], reverse=True)
+        return [_media(r) for r in rows]
+
+    # ---------- reads ----------
+    def get(self, media_id, email=None):
+        row = self.db.conn().execute(f"SELECT {MEDIA_COLUMNS} FROM media WHERE id = ?", (media_id,)).fetchone()
+        if row is None or (email is not None and row["email"] != email):
+            return None
+        return _media(row)
+
+    def get_many(self, media_ids, email=None):
+        media_ids = list(dict.fromkeys(media_ids))
+        found = {}
+        for i in range(0, len(media_ids), 500):  # stay under SQLITE_MAX_VARIABLE_NUMBER
+            chunk = media_ids[i:i + 500]
+            rows = self.db.conn().execute(
+                f"SELECT {MEDIA_COLUMNS} FROM media WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((r["id"], r) for r in rows)
+        return [
+            _media(found[media_id])
+            for media_id in media_ids
+            if media_id in found and (email is None or found[media_id]["email"] == email)
+        ]
+
+    def get_analysis(self, media_id):
+        row = self.db.conn().execute("SELECT analysis FROM media WHERE id = ?", (media_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def recompute_stats(self, email):
+        rows = self.db.conn().execute(
+            "SELECT status, COUNT(*) AS count FROM media WHERE email = ? GROUP BY status", (email,)
+        ).fetchall()
+        return self._stats_from({r["status"]: r["count"] for r in rows})
+
+    def page(self, email, limit=None, cursor=None):
+        before_seq = base.parse_seq_cursor(cursor)
+        rows = self.db.conn().execute(
+            f"SELECT seq, {MEDIA_COLUMNS} FROM media WHERE email = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (email, before_seq if before_seq is not None else 2**63 - 1, -1 if limit is None else limit + 1),
+        ).fetchall()
+        next_seq = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_seq = rows[-1]["seq"]
+        return [_media(r) for r in rows], base.seq_cursor(next_seq)
+
+    # ---------- internal ----------
+    def _counts(self, email):
+        rows = self.db.conn().execute("SELECT status, count FROM media_stats WHERE email = ?", (email,)).fetchall()
+        return {r["status"]: r["count"] for r in rows}
+
+    def _bump(self, conn, email, status, delta):
+        conn.execute(
+            "INSERT INTO media_stats (email, status, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (email, status) DO UPDATE SET count = count + excluded.count",
+            (email, status, delta),
+        )
+
+
+class NotificationStore(base.NotificationStore):
+    """
+    Notifications table plus a per-user ``inbox`` row holding the read
+    watermark and unread counter (see ``storage.memory.NotificationStore``).
+
+    ``add`` only enqueues; the writer thread inserts a whole batch, trims
+    each touched inbox back to ``retention`` rows and commits once, then
+    calls each note's ``on_stored(seq)``. ``flush`` waits until everything
+    queued before it is committed. List/count reads only flush when the
+    calling thread still has notes queued, so they see its own earlier
+    writes without queueing behind everyone else's.
+
+    A batch that fails to commit is retried one note at a time; notes that
+    still fail are logged and counted in ``stats()["dropped"]``.
+    """
+
+    def __init__(self, db, retention=500, batch_size=200):
+        super().__init__(retention)
+        self.db = db
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = 0  # ticket of the latest add / flush, in queue order
+        self._written = 0  # every ticket up to this one has been processed
+        self._local = threading.local()  # .ticket: this thread's latest add
+        self._counts = {"batches_failed": 0, "dropped": 0}
+        self._writer = threading.Thread(target=self._write_loop, name="notification-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- writes ----------
+    def add(self, note, on_stored=None):
+        self._local.ticket = self._enqueue(note, on_stored)
+
+    def flush(self):
+        done = threading.Event()
+        self._enqueue(None, lambda seq: done.set())
+        done.wait()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def mark_all_read(self, email):
+        self.flush()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE inbox SET unread = 0, "
+                "read_upto = (SELECT COALESCE(MAX(seq), 0) FROM notifications WHERE email = ?) WHERE email = ?",
+                (email, email),
+            )
+
+    def clear(self, email):
+        self.flush()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM notifications WHERE email = ?", (email,))
+            conn.execute("DELETE FROM inbox WHERE email = ?", (email,))
+
+    # ---------- reads ----------
+    def page(self, email, limit=None, cursor=None):
+        before_seq = base.parse_seq_cursor(cursor)
+        self._flush_own()
+        conn = self.db.conn()
+        read_upto = self._read_upto(conn, email)
+        rows = conn.execute(
+            f"SELECT {NOTE_COLUMNS} FROM notifications WHERE email = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (email, before_seq if before_seq is not None else 2**63 - 1, -1 if limit is None else limit + 1),
+        ).fetchall()
+        next_seq = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_seq = rows[-1]["seq"]
+        return [self._note(r, read_upto) for r in rows], base.seq_cursor(next_seq)
+
+    def since(self, email, after_seq, limit):
+        conn = self.db.conn()
+        read_upto = self._read_upto(conn, email)
+        rows = conn.execute(
+            f"SELECT {NOTE_COLUMNS} FROM notifications WHERE email = ? AND seq > ? ORDER BY seq DESC LIMIT ?",
+            (email, after_seq, limit),
+        ).fetchall()
+        return [(r["seq"], self._note(r, read_upto)) for r in reversed(rows)]
+
+    def unread_count(self, email):
+        self._flush_own()
+        row = self.db.conn().execute("SELECT unread FROM inbox WHERE email = ?", (email,)).fetchone()
+        return row[0] if row else 0
+
+    # ---------- internal ----------
+    def _enqueue(self, note, on_stored):
+        with self._lock:  # tickets must follow queue order
+            self._queued += 1
+            ticket = self._queued
+            self._queue.put((ticket, note, on_stored))
+        return ticket
+
+    def _flush_own(self):
+        """Flush only if a note this thread added may still be queued."""
+        if getattr(self._local, "ticket", 0) > self._written:
+            self.flush()
+
+    def _read_upto(self, conn, email):
+        row = conn.execute("SELECT read_upto FROM inbox WHERE email = ?", (email,)).fetchone()
+        return row[0] if row else 0
+
+    def _note(self, row, read_upto):
+        note = dict(row)
+        note["status"] = "Read" if note.pop("seq") <= read_upto else "Unread"
+        return note
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                stored = self._write_batch(batch)
+            except Exception as e:
+                print("Notification batch failed, retrying one by one:", e)
+                with self._lock:
+                    self._counts["batches_failed"] += 1
+                stored = []
+                for item in batch:
+                    _, note, on_stored = item
+                    if note is None:
+                        stored.append((None, on_stored))  # keep flush() waiters moving
+                        continue
+                    try:
+                        stored.extend(self._write_batch([item]))
+                    except Exception as e:
+                        print("Notification dropped:", note["email"], note["title"], e)
+                        with self._lock:
+                            self._counts["dropped"] += 1
+
+            self._written = batch[-1][0]
+            for seq, on_stored in stored:
+                if on_stored is not None:
+                    try:
+                        on_stored(seq)
+                    except Exception as e:
+                        print("Notification callback error:", e)
+
+    def _write_batch(self, batch):
+        stored = []
+        added = {}  # email -> rows inserted
+        with self.db.transaction() as conn:
+            for _, note, on_stored in batch:
+                if note is None:  # flush() marker
+                    stored.append((None, on_stored))
+                    continue
+                cur = conn.execute(
+                    "INSERT INTO notifications (id, email, title, message, time) VALUES (?, ?, ?, ?, ?)",
+                    (note["id"], note["email"], note["title"], note["message"], note["time"]),
+                )
+                stored.append((cur.lastrowid, on_stored))
+                added[note["email"]] = added.get(note["email"], 0) + 1
+
+            for email, count in added.items():
+                conn.execute(
+                    "INSERT INTO inbox (email, unread) VALUES (?, ?) "
+                    "ON CONFLICT (email) DO UPDATE SET unread = unread + excluded.unread",
+                    (email, count),
+                )
+                self._trim(conn, email)
+        return stored
+
+    def _trim(self, conn, email):
+        cutoff = conn.execute(
+            "SELECT seq FROM notifications WHERE email = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+            (email, self.retention),
+        ).fetchone()
+        if cutoff is None:
+            return
+        read_upto = self._read_upto(conn, email)
+        dropped_unread = conn.execute(
+            "SELECT COUNT(*) FROM notifications WHERE email = ? AND seq > ? AND seq <= ?",
+            (email, read_upto, cutoff[0]),
+        ).fetchone()[0]
+        conn.execute("DELETE FROM notifications WHERE email = ? AND seq <= ?", (email, cutoff[0]))
+        if dropped_unread:
+            conn.execute("UPDATE inbox SET unread = unread - ? WHERE email = ?", (dropped_unread, email))
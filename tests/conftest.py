@@ -0,0 +1,130 @@
+"""
+Every API test runs once per storage backend: memory://, sqlite:/// and
+DynamoDB + S3 (moto, skipped when it isn't installed). Uploads, spools,
+thumbnails and built assets go to a per-test temporary directory.
+"""
+
+import io
+import os
+import time
+import uuid
+
+import pytest
+
+import app as snapstream
+from chunked_upload import StreamingRequest
+
+BACKENDS = ["memory", "sqlite", "dynamodb"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    """``(STORAGE_URL, OBJECT_STORAGE_URL)`` for one backend, inside moto for DynamoDB / S3."""
+    if request.param == "memory":
+        yield "memory://", ""
+    elif request.param == "sqlite":
+        yield f"sqlite:///{tmp_path / 'snapstream.db'}", ""
+    else:
+        moto = pytest.importorskip("moto")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        with moto.mock_aws():
+            import boto3
+
+            boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="snapstream-test")
+            yield "dynamodb://us-east-1?create_tables=1", "s3://snapstream-test/media"
+
+
+@pytest.fixture
+def app(backend, tmp_path, monkeypatch):
+    storage_url, objects_url = backend
+    uploads = tmp_path / "uploads"
+    monkeypatch.setattr(snapstream, "UPLOAD_FOLDER", str(uploads))
+    monkeypatch.setattr(snapstream, "INCOMING_FOLDER", str(uploads / ".incoming"))
+    monkeypatch.setattr(snapstream, "DERIVATIVE_FOLDER", str(tmp_path / "derivatives"))
+    monkeypatch.setattr(snapstream, "OBJECT_CACHE_FOLDER", str(tmp_path / "objects"))
+    monkeypatch.setattr(snapstream, "ASSET_FOLDER", str(tmp_path / "dist"))
+    monkeypatch.setattr(StreamingRequest, "incoming_dir", str(uploads / ".incoming"))
+    os.makedirs(uploads / ".incoming", exist_ok=True)
+
+    flask_app = snapstream.create_app(
+        {
+            "TESTING": True,
+            "STORAGE_URL": storage_url,
+            "OBJECT_STORAGE_URL": objects_url,
+            "ANALYSIS_WORKERS": 1,
+            "ASSETS_BUILD_ON_STARTUP": False,
+            "STATS_CONSISTENCY_CHECK": True,
+            "UPLOAD_CHUNK_SIZE": 1024,
+            "RECLAIM_BATCH": 2,
+            "RECLAIM_PAUSE": 0,
+        }
+    )
+    yield flask_app
+    snapstream.reclaimer.close()
+    snapstream.analysis_pipeline.shutdown()
+
+
+@pytest.fixture
+def register(app):
+    """register(client=None) -> (client, email): a new account, logged in."""
+
+    def register(client=None):
+        client = client or app.test_client()
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        res = client.post("/api/register", json={"username": "tester", "email": email, "password": "secret1"})
+        assert res.status_code == 201, res.get_json()
+        res = client.post("/api/login", json={"email": email, "password": "secret1"})
+        assert res.status_code == 200, res.get_json()
+        return client, email
+
+    return register
+
+
+@pytest.fixture
+def client(register):
+    return register()[0]
+
+
+@pytest.fixture
+def upload():
+    """upload(client, body, filename="photo.png", tags="") -> the stored media record."""
+
+    def upload(client, body, filename="photo.png", tags=""):
+        res = client.post("/api/upload", data={"file": (io.BytesIO(body), filename), "custom_tags": tags})
+        assert res.status_code == 201, res.get_json()
+        return res.get_json()["media"]
+
+    return upload
+
+
+def wait_for(condition, timeout=15):
+    """Poll ``condition()`` until it returns something truthy; background work (analysis, reclaim)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = condition()
+        if value or time.monotonic() > deadline:
+            return value
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def settled():
+    """settled(client, media_id): wait until analysis has finished with that upload."""
+
+    def settled(client, media_id):
+        def done():
+            media = client.get(f"/api/media/{media_id}").get_json()["media"]
+            return media if media["status"] != "Processing" else None
+
+        media = wait_for(done)
+        assert media is not None, f"{media_id} still processing"
+        return media
+
+    return settled
+
+
+@pytest.fixture
+def wait():
+    return wait_for
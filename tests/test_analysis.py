@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import analysis
+from analysis import AnalysisPipeline
+
+
+class FakePool:
+    """Stands in for ProcessPoolExecutor; runs jobs inline unless told to break."""
+
+    created = []
+
+    def __init__(self, max_workers):
+        self.broken = False
+        self.crash_next = False
+        self.closed = False
+        FakePool.created.append(self)
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("a worker died")
+        future = Future()
+        if self.crash_next:
+            # the job was running when its worker died
+            self.broken = True
+            future.set_exception(BrokenProcessPool("a worker died"))
+        else:
+            future.set_result({"ran": args[0]})
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.closed = True
+
+
+def pipeline(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(analysis, "ProcessPoolExecutor", FakePool)
+    done = []
+    lock = threading.Lock()
+
+    def on_done(media_id, result, error):
+        with lock:
+            done.append((media_id, result, error))
+
+    return AnalysisPipeline(1, on_done), done
+
+
+def test_jobs_run_and_report(monkeypatch):
+    pipe, done = pipeline(monkeypatch)
+    pipe.submit("a", "a.png", "png", {})
+    pipe.submit("b", "b.png", "png", {})
+    assert done == [("a", {"ran": "a.png"}, None), ("b", {"ran": "b.png"}, None)]
+    assert len(FakePool.created) == 1
+    assert pipe.pending() == 0
+
+
+def test_broken_pool_is_replaced_and_job_retried(monkeypatch):
+    pipe, done = pipeline(monkeypatch)
+    pipe.submit("a", "a.png", "png", {})
+    FakePool.created[0].broken = True
+
+    pipe.submit("b", "b.png", "png", {})
+    assert done[-1] == ("b", {"ran": "b.png"}, None)
+    assert len(FakePool.created) == 2
+    assert FakePool.created[0].closed
+
+
+def test_job_in_flight_when_worker_dies_is_retried(monkeypatch):
+    pipe, done = pipeline(monkeypatch)
+    pipe.submit("a", "a.png", "png", {})
+    FakePool.created[0].crash_next = True
+
+    pipe.submit("b", "b.png", "png", {})
+    assert done[-1] == ("b", {"ran": "b.png"}, None)
+    assert len(FakePool.created) == 2
+
+    # and the pipeline keeps working for the next upload
+    pipe.submit("c", "c.png", "png", {})
+    assert done[-1] == ("c", {"ran": "c.png"}, None)
+
+
+def test_job_fails_after_one_retry(monkeypatch):
+    pipe, done = pipeline(monkeypatch)
+    real_init = FakePool.__init__
+
+    def always_crash(self, max_workers):
+        real_init(self, max_workers)
+        self.crash_next = True
+
+    monkeypatch.setattr(FakePool, "__init__", always_crash)
+    pipe.submit("a", "a.png", "png", {})
+    assert len(done) == 1
+    media_id, result, error = done[0]
+    assert media_id == "a" and result is None
+    assert isinstance(error, BrokenProcessPool)
+    assert len(FakePool.created) == 2
+    assert pipe.pending() == 0
+
+
+def test_shutdown_stops_new_work(monkeypatch):
+    pipe, done = pipeline(monkeypatch)
+    pipe.submit("a", "a.png", "png", {})
+    pipe.shutdown()
+    pipe.submit("b", "b.png", "png", {})
+    assert [d[0] for d in done] == ["a"]
+    assert len(FakePool.created) == 1
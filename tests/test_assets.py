@@ -0,0 +1,83 @@
+import gzip
+import json
+import re
+
+import pytest
+
+import app as snapstream
+from assets import Assets
+
+
+@pytest.fixture
+def sources(tmp_path):
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "js" / "a.js").write_text("// first\nvar a = 1;\n" + "var padding = 'compressible';\n" * 50)
+    (static / "js" / "b.js").write_text("function b() {\n  return a + 1;\n}\n")
+    return static
+
+
+def test_bundles_are_fingerprinted_by_content(sources, tmp_path):
+    out = tmp_path / "dist"
+    assets = Assets(str(sources), str(out), {"js/all.js": ["js/a.js", "js/b.js"]})
+    manifest = assets.build()
+
+    built = manifest["js/all.js"]
+    assert re.fullmatch(r"js/all\.[0-9a-f]{12}\.js", built)
+    body = (out / built).read_text()
+    assert "// first" not in body and "function b(){" in body
+    assert gzip.decompress((out / (built + ".gz")).read_bytes()).decode() == body
+    assert json.loads((out / "manifest.json").read_text()) == manifest
+
+    # unchanged sources keep their URL; a change gets a new one, and prune drops the old file
+    assert Assets(str(sources), str(out), assets.bundles).build() == manifest
+    (sources / "js" / "b.js").write_text("function b() { return 2; }\n")
+    rebuilt = assets.build()["js/all.js"]
+    assert rebuilt != built
+    assert assets.prune() >= 2  # the old bundle and its variants
+    assert not (out / built).exists() and (out / rebuilt).exists()
+
+
+def test_watch_rebuilds_changed_sources(sources, tmp_path):
+    assets = Assets(str(sources), str(tmp_path / "dist"), {"js/b.js": ["js/b.js"]})
+    first = assets.url_path("js/b.js")
+    (sources / "js" / "b.js").write_text("function b() { return 3; }\n")
+    assert assets.url_path("js/b.js") == first
+    assert assets.url_path("js/b.js", watch=True) != first
+
+
+def built_url(app, name):
+    with app.test_request_context():
+        return snapstream.asset_url(name)
+
+
+def test_assets_are_served_immutable(app, client):
+    url = built_url(app, "js/core.js")
+    assert re.fullmatch(r"/assets/js/core\.[0-9a-f]{12}\.js", url)
+
+    res = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert res.status_code == 200
+    assert res.mimetype == "text/javascript"
+    assert "Content-Encoding" not in res.headers
+    cache = res.headers["Cache-Control"]
+    assert "immutable" in cache and "public" in cache and "max-age=31536000" in cache
+    assert "Accept-Encoding" in res.headers["Vary"]
+
+    assert client.get("/assets/js/core.000000000000.js").status_code == 404
+
+
+def test_precompressed_variant_is_negotiated(app, client):
+    url = built_url(app, "css/style.css")
+    plain = client.get(url, headers={"Accept-Encoding": "identity"}).data
+
+    res = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(res.data) == plain
+
+    brotli = pytest.importorskip("brotli")
+    res = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert res.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(res.data) == plain
+
+    res = client.get(url, headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
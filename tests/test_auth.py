@@ -0,0 +1,36 @@
+def test_register_and_login(app):
+    client = app.test_client()
+    user = {"username": "alice", "email": "Alice@Example.com", "password": "secret1"}
+
+    assert client.post("/api/register", json=user).status_code == 201
+    assert client.post("/api/register", json=user).status_code == 409
+    assert client.get("/api/me").status_code == 401
+
+    res = client.post("/api/login", json={"email": "alice@example.com", "password": "wrong"})
+    assert res.status_code == 401
+    res = client.post("/api/login", json={"email": "nobody@example.com", "password": "secret1"})
+    assert res.status_code == 404
+
+    res = client.post("/api/login", json={"email": "alice@example.com", "password": "secret1"})
+    assert res.status_code == 200
+    assert client.get("/api/me").get_json()["user"] == {"email": "alice@example.com", "username": "alice"}
+
+
+def test_password_change_applies_to_next_login(app, register):
+    client, email = register()
+    res = client.post("/api/profile/change-password", json={"currentPassword": "secret1", "newPassword": "secret2"})
+    assert res.status_code == 200
+
+    other = app.test_client()
+    assert other.post("/api/login", json={"email": email, "password": "secret1"}).status_code == 401
+    assert other.post("/api/login", json={"email": email, "password": "secret2"}).status_code == 200
+
+
+def test_logout_ends_every_session(app, register):
+    client, email = register()
+    other = app.test_client()
+    assert other.post("/api/login", json={"email": email, "password": "secret1"}).status_code == 200
+
+    assert client.post("/api/logout").status_code == 200
+    assert client.get("/api/me").status_code == 401
+    assert other.get("/api/me").status_code == 401
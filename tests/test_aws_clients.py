@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import aws_clients  # noqa: E402  (needs boto3, which moto brings)
+from aws_clients import AWSClients  # noqa: E402
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        yield AWSClients(region="us-east-1", max_pool_connections=7)
+
+
+def test_clients_are_created_on_first_use_and_reused(aws):
+    assert aws._session is None and aws._made == {}
+
+    s3 = aws.client("s3")
+    assert aws.client("s3") is s3
+    assert s3.meta.config.max_pool_connections == 7
+    assert aws.client("s3", endpoint_url="http://localhost:9000") is not s3
+    assert aws.client("sns") is not s3
+
+    table = aws.resource("dynamodb")
+    assert aws.resource("dynamodb") is table
+    assert aws.client("dynamodb") is not table.meta.client
+    assert len(aws._made) == 5
+
+
+def test_concurrent_first_use_builds_one_client(aws):
+    got = []
+    start = threading.Barrier(8)
+
+    def use():
+        start.wait()
+        got.append(aws.client("s3"))
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(c) for c in got}) == 1
+
+
+def test_a_forked_process_builds_its_own_clients(aws, monkeypatch):
+    s3 = aws.client("s3")
+    session = aws._session
+    child_pid = os.getpid() + 1
+    monkeypatch.setattr(aws_clients.os, "getpid", lambda: child_pid)
+
+    child = aws.client("s3")
+    assert child is not s3
+    assert aws._session is not session
+    assert aws.client("s3") is child
+
+
+def test_calls_are_counted(aws):
+    s3 = aws.client("s3")
+    s3.create_bucket(Bucket="counted")
+    s3.list_objects_v2(Bucket="counted")
+    with pytest.raises(s3.exceptions.NoSuchBucket):
+        s3.list_objects_v2(Bucket="missing")
+
+    stats = aws.stats()
+    assert stats["operations"]["s3.ListObjectsV2"]["calls"] == 2
+    assert stats["operations"]["s3.ListObjectsV2"]["errors"] == 1
+    assert stats["operations"]["s3.CreateBucket"]["calls"] == 1
+    assert stats["pools"]["s3"]["in_flight"] == 0
+    assert stats["pools"]["s3"]["max_pool_connections"] == 7
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("SNAPSTREAM_AWS_MAX_POOL", "12")
+    monkeypatch.setenv("SNAPSTREAM_AWS_READ_TIMEOUT", "2.5")
+    monkeypatch.setenv("SNAPSTREAM_AWS_RETRY_MODE", "standard")
+    aws = AWSClients.from_env(region="eu-west-1")
+    assert aws.region == "eu-west-1"
+    assert aws.max_pool_connections == 12
+    assert aws.config.read_timeout == 2.5
+    assert aws.config.retries == {"max_attempts": 5, "mode": "standard"}
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import app as snapstream
+
+
+@pytest.fixture
+def served_locally(app):
+    """Skip on S3: there the client is redirected to the bucket, which does Range and caching."""
+    if snapstream.blob_store.download_url("probe.png", "probe.png") is not None:
+        pytest.skip("S3 serves content itself")
+
+
+def test_s3_content_is_a_presigned_redirect(app, client, upload):
+    media = upload(client, os.urandom(256))
+    res = client.get(f"/api/media/{media['id']}/content?download=1")
+    if snapstream.blob_store.download_url(media["stored_name"], media["filename"]) is None:
+        assert res.status_code == 200
+    else:
+        assert res.status_code == 302
+        assert "response-content-disposition=attachment" in res.headers["Location"]
+
+
+def test_range_request_returns_partial_content(served_locally, client, upload):
+    body = os.urandom(4096)
+    media = upload(client, body)
+
+    res = client.get(f"/api/media/{media['id']}/content", headers={"Range": "bytes=100-199"})
+    assert res.status_code == 206
+    assert res.data == body[100:200]
+    assert res.headers["Content-Range"] == f"bytes 100-199/{len(body)}"
+
+    full = client.get(f"/api/media/{media['id']}/content")
+    assert full.status_code == 200
+    assert full.data == body
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert "private" in full.headers["Cache-Control"]
+
+
+def test_unchanged_content_revalidates_with_304(served_locally, client, upload):
+    media = upload(client, os.urandom(512))
+    res = client.get(f"/api/media/{media['id']}/content")
+    etag = res.headers["ETag"]
+    assert os.path.basename(media["stored_name"]).split(".", 1)[0] in etag  # the content digest
+
+    res = client.get(f"/api/media/{media['id']}/content", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.data == b""
+
+
+def test_x_accel_redirect_hands_the_file_to_the_proxy(app, served_locally, client, upload):
+    app.config["MEDIA_X_ACCEL_PREFIX"] = "/_protected/"
+    media = upload(client, os.urandom(512), "holiday.png")
+
+    res = client.get(f"/api/media/{media['id']}/content?download=1")
+    assert res.status_code == 200
+    assert res.headers["X-Accel-Redirect"] == "/_protected/" + media["stored_name"]
+    assert res.headers["Content-Disposition"] == 'attachment; filename="holiday.png"'
+    assert res.data == b""
+
+
+def test_other_users_media_is_not_found(client, register, upload):
+    media = upload(client, os.urandom(256))
+    stranger, _ = register()
+
+    assert stranger.get(f"/api/media/{media['id']}/content").status_code == 404
+    assert stranger.get(f"/api/media/{media['id']}/content", headers={"Range": "bytes=0-9"}).status_code == 404
+    assert client.get(f"/api/media/{media['id']}/content").status_code in (200, 302)
@@ -0,0 +1,103 @@
+import io
+import os
+import time
+
+import pytest
+
+import app as snapstream
+from derivatives import DerivativeCache
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def png(width=800, height=600):
+    buf = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.png"
+    path.write_bytes(png())
+    return str(path)
+
+
+def test_thumbnails_are_rendered_to_size(tmp_path, source, wait):
+    cache = DerivativeCache(str(tmp_path / "thumbs"), 10**9)
+    cache.generate("m1", source, "png")
+
+    for size, edge in (("sm", 320), ("md", 640)):
+        path = wait(lambda: cache.get("m1", size))
+        assert path == cache.path("m1", size)
+        with Image.open(path) as img:
+            assert img.format == "JPEG"
+            assert max(img.size) == edge
+
+    cache.drop("m1")
+    assert cache.get("m1", "sm") is None
+    assert os.listdir(tmp_path / "thumbs") == []
+
+
+def test_least_recently_used_thumbnail_is_evicted(tmp_path, source, wait):
+    cache = DerivativeCache(str(tmp_path / "thumbs"), 10**9, workers=1)
+    cache.generate("a", source, "png", ["sm"])
+    cache.generate("b", source, "png", ["sm"])
+    assert wait(lambda: cache.get("a", "sm") and cache.get("b", "sm"))
+
+    # room for two; "a" is older but served again, so "b" is the least recently used
+    cache.max_bytes = 2 * os.path.getsize(cache.path("a", "sm"))
+    past = time.time() - 60
+    os.utime(cache.path("a", "sm"), (past - 10, past - 10))
+    os.utime(cache.path("b", "sm"), (past, past))
+    assert cache.get("a", "sm")
+
+    cache.generate("c", source, "png", ["sm"])
+    assert wait(lambda: not os.path.exists(cache.path("b", "sm")))
+    assert cache.get("b", "sm") is None
+    assert cache.get("a", "sm") and cache.get("c", "sm")
+
+
+def test_unrenderable_types_have_no_thumbnail(tmp_path, source):
+    cache = DerivativeCache(str(tmp_path / "thumbs"), 10**9)
+    cache.generate("doc", source, "pdf")
+    assert cache._pending == set()
+    assert cache.get("doc", "sm") is None
+
+
+def test_thumbnail_endpoint(client, register, upload, wait):
+    media = upload(client, png(), "photo.png")
+    url = f"/api/media/{media['id']}/thumbnail?size=md"
+
+    res = wait(lambda: (r := client.get(url)).status_code == 200 and r)
+    assert res.mimetype == "image/jpeg"
+    with Image.open(io.BytesIO(res.data)) as img:
+        assert max(img.size) == 640
+    assert "private" in res.headers["Cache-Control"]
+
+    assert client.get(f"/api/media/{media['id']}/thumbnail?size=xl").status_code == 400
+    stranger, _ = register()
+    assert stranger.get(url).status_code == 404
+
+    assert client.delete(f"/api/media/{media['id']}").status_code == 200
+    assert snapstream.derivative_cache.get(media["id"], "md") is None
+
+
+def test_failed_render_leaves_no_temp_file(tmp_path, source, monkeypatch, wait):
+    root = tmp_path / "thumbs"
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"\x89PNG not really")
+    cache = DerivativeCache(str(root), 10**9, workers=1)
+
+    cache.generate("bad", str(broken), "png", ["sm"])
+    assert wait(lambda: not cache._pending)
+    assert os.listdir(root) == []
+
+    # fails after the JPEG was written
+    def no_replace(src, dst):
+        raise OSError("disk went away")
+
+    monkeypatch.setattr(os, "replace", no_replace)
+    cache.generate("late", source, "png", ["sm"])
+    assert wait(lambda: not cache._pending)
+    assert os.listdir(root) == []
@@ -0,0 +1,79 @@
+import os
+
+MEDIA_READS = ["/api/media", "/api/media/search?q=photo", "/api/dashboard/stats", "/api/dashboard/activity"]
+
+
+def quiet(client, upload, settled, wait):
+    """One analysed upload, with its notifications written: nothing changes in the background after this."""
+    media = upload(client, os.urandom(64))
+    settled(client, media["id"])
+    assert wait(lambda: client.get("/api/notifications/unread-count").get_json()["unread"] == 4)
+    return media
+
+
+def revalidate(client, url):
+    """(etag, the response to a revalidation with it)"""
+    etag = client.get(url).headers["ETag"]
+    res = client.get(url, headers={"If-None-Match": etag})
+    return etag, res
+
+
+def test_unchanged_reads_are_304(client, upload, settled, wait):
+    media = quiet(client, upload, settled, wait)
+
+    for url in MEDIA_READS + [f"/api/media/{media['id']}", "/api/notifications", "/api/notifications/unread-count"]:
+        etag, res = revalidate(client, url)
+        assert res.status_code == 304, url
+        assert res.data == b""
+        assert res.headers["ETag"] == etag
+        assert res.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_writes_change_the_etag(client, upload, settled, wait):
+    media = quiet(client, upload, settled, wait)
+
+    media_tags = {url: client.get(url).headers["ETag"] for url in MEDIA_READS}
+    inbox_tag = client.get("/api/notifications").headers["ETag"]
+
+    res = client.post("/api/media/bulk/tags", json={"ids": [media["id"]], "add": "beach"})
+    assert res.status_code == 200
+    for url, etag in media_tags.items():
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200, url
+        assert res.headers["ETag"] != etag
+
+    # the tag change also posted a notification
+    res = client.get("/api/notifications", headers={"If-None-Match": inbox_tag})
+    assert res.status_code == 200
+    inbox_tag = res.headers["ETag"]
+    assert client.post("/api/notifications/read-all").status_code == 200
+    assert client.get("/api/notifications", headers={"If-None-Match": inbox_tag}).status_code == 200
+
+
+def test_notification_writes_leave_media_etags_alone(client):
+    etag = client.get("/api/media").headers["ETag"]
+    assert client.post("/api/notifications/clear-all").status_code == 200
+    assert client.get("/api/media", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_etag_never_validates_another_users_data(client, register):
+    etag = client.get("/api/media").headers["ETag"]
+    stranger, _ = register()
+    res = stranger.get("/api/media", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+    other_page = client.get("/api/media?limit=1", headers={"If-None-Match": etag})
+    assert other_page.status_code == 200
+
+
+def test_salt_change_invalidates_every_etag(app, client):
+    etag = client.get("/api/media").headers["ETag"]
+    app.config["ETAG_SALT"] = "v2"
+    assert client.get("/api/media", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_logged_out_reads_are_not_tagged(app):
+    res = app.test_client().get("/api/media")
+    assert res.status_code == 401
+    assert "ETag" not in res.headers
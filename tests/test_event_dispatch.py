@@ -0,0 +1,142 @@
+import json
+import threading
+
+import pytest
+
+from event_dispatch import EventDispatcher
+
+
+class Sender:
+    """send_batch stand-in: records batches; ``fail`` events are returned for retry."""
+
+    def __init__(self, hold=False):
+        self.batches = []
+        self.fail = {}  # subject -> times to fail
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self, events):
+        self.release.wait(10)
+        self.batches.append([e["subject"] for e in events])
+        failed = []
+        for e in events:
+            if self.fail.get(e["subject"], 0):
+                self.fail[e["subject"]] -= 1
+                failed.append(e)
+        return failed
+
+    def sent(self):
+        return [s for batch in self.batches for s in batch]
+
+
+@pytest.fixture
+def dispatcher():
+    made = []
+
+    def make(sender, **kw):
+        made.append(EventDispatcher(sender, retry_base=0.01, **kw))
+        return made[-1]
+
+    yield make
+    for d in made:
+        d.close()
+
+
+def test_events_are_sent_in_batches(dispatcher, wait):
+    sender = Sender(hold=True)
+    events = dispatcher(sender, batch_size=10)
+    events.publish("e0", "first")
+    assert wait(lambda: events.stats()["queued"] == 0)  # the sender holds e0
+    for i in range(1, 26):
+        assert events.publish(f"e{i}", "body")
+    sender.release.set()
+
+    assert wait(lambda: events.stats()["sent"] == 26)
+    assert sorted(sender.sent(), key=lambda s: int(s[1:])) == [f"e{i}" for i in range(26)]
+    assert [len(b) for b in sender.batches] == [1, 10, 10, 5]
+
+
+def test_failed_events_are_retried(dispatcher, wait):
+    sender = Sender()
+    sender.fail = {"flaky": 2}
+    events = dispatcher(sender)
+    events.publish("flaky", "body")
+
+    assert wait(lambda: events.stats()["sent"] == 1)
+    assert sender.sent() == ["flaky"] * 3
+    stats = events.stats()
+    assert stats["retried"] == 2
+    assert stats["spilled"] == stats["dropped"] == 0
+
+
+def test_send_errors_are_retried(dispatcher, wait):
+    calls = []
+
+    def send_batch(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("endpoint down")
+        return []
+
+    events = dispatcher(send_batch)
+    events.publish("x", "body")
+    assert wait(lambda: events.stats()["sent"] == 1)
+    assert events.stats()["retried"] == 1
+
+
+def test_exhausted_events_are_spilled_and_replayed(dispatcher, tmp_path, wait):
+    spill = tmp_path / "events.jsonl"
+    sender = Sender()
+    sender.fail = {"stuck": 3}
+    events = dispatcher(sender, max_retries=1, spill_path=str(spill))
+    events.publish("stuck", "body")
+
+    # a retry, then spilled; replayed once the sender is idle with a fresh retry budget
+    assert wait(lambda: events.stats()["sent"] == 1)
+    stats = events.stats()
+    assert stats["spilled"] == 1 and stats["replayed"] == 1
+    assert spill.read_text() == ""
+    assert sender.sent() == ["stuck"] * 4
+
+
+def test_full_queue_spills_instead_of_blocking(dispatcher, tmp_path, wait):
+    spill = tmp_path / "events.jsonl"
+    sender = Sender(hold=True)
+    events = dispatcher(sender, queue_size=1, spill_path=str(spill))
+    events.publish("a", "held by the sender")
+    assert wait(lambda: events.stats()["queued"] == 0)
+    assert events.publish("b", "queued")
+    assert not events.publish("c", "no room")
+
+    assert [json.loads(line) for line in spill.read_text().splitlines()] == [{"subject": "c", "message": "no room"}]
+    assert events.stats()["spilled"] == 1
+
+    sender.release.set()
+    assert wait(lambda: events.stats()["sent"] == 3)
+    assert sorted(sender.sent()) == ["a", "b", "c"]
+    assert events.stats()["replayed"] == 1
+
+
+def test_without_spill_file_overflow_is_dropped(dispatcher, wait):
+    sender = Sender(hold=True)
+    events = dispatcher(sender, queue_size=1)
+    events.publish("a", "held")
+    assert wait(lambda: events.stats()["queued"] == 0)
+    events.publish("b", "queued")
+    assert not events.publish("c", "dropped")
+    assert events.stats()["dropped"] == 1
+    sender.release.set()
+    assert wait(lambda: events.stats()["sent"] == 2)
+
+
+def test_counts_are_exact_under_concurrent_publishers(dispatcher, wait):
+    events = dispatcher(Sender(), queue_size=5)
+    threads = [
+        threading.Thread(target=lambda: [events.publish("e", "body") for _ in range(200)]) for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert wait(lambda: (s := events.stats())["sent"] + s["dropped"] == 800)
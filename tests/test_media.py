@@ -0,0 +1,79 @@
+import os
+
+import app as snapstream
+
+
+def test_upload_deduplicates_identical_content(client, upload, settled):
+    body = os.urandom(2048)
+    first = upload(client, body, "a.png")
+    second = upload(client, body, "b.png")
+    assert first["stored_name"] == second["stored_name"]
+    assert snapstream.blob_store.refcount(first["stored_name"]) == 2
+    settled(client, first["id"])
+    settled(client, second["id"])
+
+    res = client.get(f"/api/media/{first['id']}/content")
+    assert res.status_code in (200, 302)
+    if res.status_code == 200:
+        assert res.data == body
+
+    assert client.delete(f"/api/media/{first['id']}").status_code == 200
+    assert snapstream.blob_store.objects.exists(first["stored_name"])
+    assert client.delete(f"/api/media/{second['id']}").status_code == 200
+    assert snapstream.blob_store.refcount(first["stored_name"]) == 0
+    assert not snapstream.blob_store.objects.exists(first["stored_name"])
+
+
+def test_pagination_cursors(client, upload):
+    uploaded = [upload(client, os.urandom(64), f"p{i}.png")["id"] for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/media?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).get_json()
+        assert len(page["media"]) <= 2
+        seen += [m["id"] for m in page["media"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == uploaded[::-1]  # newest first, each exactly once
+    assert client.get("/api/media?limit=2&cursor=not-a-cursor").status_code == 400
+
+
+def test_bulk_tags_and_delete(client, register, upload, settled):
+    ids = [upload(client, os.urandom(64), f"b{i}.png", "old")["id"] for i in range(3)]
+    stranger, _ = register()
+    foreign = upload(stranger, os.urandom(64), "theirs.png")["id"]
+
+    res = client.post("/api/media/bulk/tags", json={"ids": ids[:2] + [foreign], "add": "trip", "remove": "old"})
+    assert res.status_code == 200
+    assert sorted(m["id"] for m in res.get_json()["media"]) == sorted(ids[:2])
+    assert all(m["tags"] == ["trip"] for m in res.get_json()["media"])
+    found = client.get("/api/media/search?tags=trip").get_json()["media"]
+    assert sorted(m["id"] for m in found) == sorted(ids[:2])
+
+    for media_id in ids:
+        settled(client, media_id)
+    res = client.post("/api/media/bulk/delete", json={"ids": ids[1:] + [foreign, "missing"]})
+    body = res.get_json()
+    assert res.status_code == 200
+    assert body["deleted"] == ids[1:]
+    assert body["not_found"] == [foreign, "missing"]
+    assert [m["id"] for m in client.get("/api/media").get_json()["media"]] == ids[:1]
+    assert client.get(f"/api/media/{foreign}").status_code == 404
+    assert stranger.get(f"/api/media/{foreign}").status_code == 200
+
+
+def test_etag_revalidation(client, upload):
+    res = client.get("/api/media")
+    etag = res.headers["ETag"]
+    assert client.get("/api/media", headers={"If-None-Match": etag}).status_code == 304
+    # the URL is part of the tag: one page's tag never validates another's
+    assert client.get("/api/dashboard/stats", headers={"If-None-Match": etag}).status_code == 200
+
+    upload(client, os.urandom(64))
+    res = client.get("/api/media", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert len(res.get_json()["media"]) == 1
@@ -0,0 +1,64 @@
+import time
+
+from metrics import Metrics, SlowRequestProfiler
+
+
+def test_metrics_endpoint_reports_requests_and_backend_calls(app, client):
+    client.get("/api/media")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert "# TYPE snapstream_http_requests_total counter" in text
+    assert 'snapstream_http_requests_total{method="GET",route="/api/media",status="200"} 1' in text
+    assert "# TYPE snapstream_http_request_duration_seconds histogram" in text
+    assert 'snapstream_http_request_duration_seconds_bucket{method="GET",route="/api/media",le="+Inf"} 1' in text
+    assert 'snapstream_backend_call_seconds_count{backend="' in text
+    assert "# TYPE snapstream_reclaim_" in text  # registered collectors are exported as gauges
+
+
+def test_metrics_token(app, client):
+    app.config["METRICS_TOKEN"] = "s3cret"
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    res = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+
+
+def test_exposition_format():
+    metrics = Metrics()
+    metrics.incr("snapstream_things_total", 2, kind='say "hi"')
+    metrics.observe_call("sqlite", "media", "get", 0.002)
+    metrics.add_collector("queue", lambda: {"depth": 3, "per_worker": {"w1": 1.5}})
+    metrics.add_collector("broken", lambda: 1 / 0)
+
+    lines = metrics.render().splitlines()
+    assert 'snapstream_things_total{kind="say \\"hi\\""} 2' in lines
+    assert 'snapstream_backend_call_seconds_count{backend="sqlite",store="media",op="get"} 1' in lines
+    assert "# TYPE snapstream_queue_depth gauge" in lines
+    assert "snapstream_queue_depth 3" in lines
+    assert "# collector broken failed: ZeroDivisionError" in lines
+
+
+def test_profiler_keeps_only_requests_over_the_threshold(tmp_path):
+    out = tmp_path / "profiles" / "slow.folded"
+    profiler = SlowRequestProfiler(50, str(out), interval_ms=1)
+
+    def handle(label, seconds):
+        token = profiler.begin()
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            sum(range(1000))  # busy, so there is a stack to sample
+        profiler.end(token, label, time.perf_counter() - started)
+
+    handle("GET /fast", 0.02)
+    assert not out.exists()
+    handle("GET /slow", 0.1)
+
+    lines = out.read_text().splitlines()
+    assert lines and all(line.startswith("GET_/slow;") for line in lines)
+    assert any("test_metrics:handle" in line for line in lines)
+    stats = profiler.stats()
+    assert stats["sampled_requests"] == 2
+    assert stats["profiled_requests"] == 1
+    assert stats["threshold_ms"] == 50
+    assert stats["in_flight"] == 0
@@ -0,0 +1,50 @@
+import os
+import re
+
+
+def titles(client, query=""):
+    return [n["title"] for n in client.get("/api/notifications" + query).get_json()["notifications"]]
+
+
+def test_inbox_unread_and_clear(client, upload, wait):
+    upload(client, os.urandom(64))
+    expected = ["Analysis Complete", "Upload Completed", "Login Success", "Welcome!"]
+    assert wait(lambda: titles(client) == expected), titles(client)
+    assert client.get("/api/notifications/unread-count").get_json()["unread"] == 4
+
+    page = client.get("/api/notifications?limit=1").get_json()
+    rest = client.get(f"/api/notifications?limit=10&cursor={page['next_cursor']}").get_json()
+    assert [n["title"] for n in page["notifications"] + rest["notifications"]] == titles(client)
+
+    assert client.post("/api/notifications/read-all").status_code == 200
+    assert client.get("/api/notifications/unread-count").get_json()["unread"] == 0
+    assert all(n["status"] == "Read" for n in client.get("/api/notifications").get_json()["notifications"])
+
+    assert client.post("/api/notifications/clear-all").status_code == 200
+    assert titles(client) == []
+
+
+def test_stream_replays_from_last_event_id(app, client):
+    app.config["SSE_HEARTBEAT_SECONDS"] = 0.1
+
+    def event_ids(last_id, count):
+        """The ids of the first ``count`` events a stream resumed from ``last_id`` sends."""
+        res = client.get("/api/notifications/stream", headers={"Last-Event-ID": str(last_id)}, buffered=False)
+        ids = []
+        try:
+            for chunk in res.response:
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+                ids += [int(i) for i in re.findall(r"^id: (\d+)$", chunk, re.M)]
+                if len(ids) >= count:
+                    break
+        finally:
+            res.close()
+        return ids
+
+    ids = event_ids(0, 2)  # Welcome! and Login Success
+    assert ids[0] < ids[1]
+    assert event_ids(ids[0], 1) == ids[1:]
+
+    client.post("/api/profile/update", json={"username": "renamed"})  # raises a notification
+    newest = event_ids(ids[1], 1)
+    assert newest[0] > ids[1]
@@ -0,0 +1,51 @@
+import os
+
+import app as snapstream
+
+
+def test_deleted_account_is_reclaimed(app, register, upload, settled, wait):
+    client, email = register()
+    media = [upload(client, os.urandom(64), f"r{i}.png") for i in range(5)]
+    for m in media:
+        settled(client, m["id"])
+    keys = [m["stored_name"] for m in media]
+
+    assert client.post("/api/profile/delete-account").status_code == 200
+    assert client.get("/api/me").status_code == 401
+
+    assert wait(lambda: snapstream.reclaimer.status(email) is None)
+    assert snapstream.media_store.list_owner(email) == []
+    assert snapstream.media_store.stats(email)["total"] == 0
+    assert all(snapstream.blob_store.refcount(key) == 0 for key in keys)
+    assert not any(snapstream.blob_store.objects.exists(key) for key in keys)
+    assert snapstream.notification_store.page(email)[0] == []
+
+    # the address can be used again, starting empty
+    client.post("/api/register", json={"username": "again", "email": email, "password": "secret1"})
+    assert client.post("/api/login", json={"email": email, "password": "secret1"}).status_code == 200
+    assert client.get("/api/media").get_json()["media"] == []
+
+
+def test_deleting_a_missing_account_queues_nothing(app, register):
+    client, email = register()
+    snapstream.users.delete(email)  # gone behind this session's back
+
+    assert client.post("/api/profile/delete-account").status_code == 404
+    assert snapstream.reclaimer.status(email) is None
+    res = app.test_client().post("/api/register", json={"username": "again", "email": email, "password": "secret1"})
+    assert res.status_code == 201
+
+
+def test_register_backs_out_when_the_account_is_deleted_meanwhile(app, monkeypatch):
+    email = "racing@example.com"
+    add = snapstream.users.add
+
+    def add_after_a_delete(user):
+        # the old account's deletion recorded its job between the check and the insert
+        snapstream.reclaimer.submit(email)
+        return add(user)
+
+    monkeypatch.setattr(snapstream.users, "add", add_after_a_delete)
+    res = app.test_client().post("/api/register", json={"username": "new", "email": email, "password": "secret1"})
+    assert res.status_code == 409
+    assert snapstream.users.get(email, consistent=True) is None
@@ -0,0 +1,177 @@
+import os
+import uuid
+
+import pytest
+
+from search_index import SearchIndex
+from storage import create_storage
+
+
+def found(client, query):
+    res = client.get("/api/media/search?" + query)
+    assert res.status_code == 200, res.get_json()
+    return sorted(m["filename"] for m in res.get_json()["media"])
+
+
+@pytest.fixture
+def library(client, upload):
+    for filename, tags in [
+        ("sunset-beach.jpg", "trip,summer"),
+        ("sunrise.png", "trip"),
+        ("sunday-lunch.mp4", "family"),
+        ("beach-party.mp3", "summer,family"),
+        ("notes.wav", ""),
+    ]:
+        upload(client, os.urandom(64), filename, tags)
+    return client
+
+
+def test_prefix_and_or_terms(library):
+    assert found(library, "q=sun*") == ["sunday-lunch.mp4", "sunrise.png", "sunset-beach.jpg"]
+    assert found(library, "q=sun* beach") == ["sunset-beach.jpg"]
+    assert found(library, "q=sunrise|party") == ["beach-party.mp3", "sunrise.png"]
+    assert found(library, "q=sunset-beach") == ["sunset-beach.jpg"]  # punctuation splits like filenames
+    assert found(library, "q=summ*") == ["beach-party.mp3", "sunset-beach.jpg"]  # tag tokens too
+    assert found(library, "q=nothing*") == []
+
+
+def test_tags_all_or_any(library):
+    assert found(library, "tags=trip,summer") == ["sunset-beach.jpg"]
+    assert found(library, "tags=trip,family&match=any") == [
+        "beach-party.mp3", "sunday-lunch.mp4", "sunrise.png", "sunset-beach.jpg",
+    ]
+    assert found(library, "tags=TRIP") == ["sunrise.png", "sunset-beach.jpg"]
+    assert found(library, "q=beach&tags=family") == ["beach-party.mp3"]
+
+
+def test_facets_only_when_asked(library):
+    body = library.get("/api/media/search?q=sun*|beach").get_json()
+    assert body["facets"] is None
+    assert body["total"] == 4
+
+    body = library.get("/api/media/search?q=sun*|beach&type=image&facets=1").get_json()
+    assert body["total"] == 2
+    assert body["facets"]["type"] == {"image": 2, "video": 1, "audio": 1}  # before the type filter
+    assert sum(body["facets"]["month"].values()) == 4
+
+    assert library.get("/api/media/search?type=document").status_code == 400
+
+
+def test_cursor_paging(library):
+    seen, cursor = [], None
+    while True:
+        url = "/api/media/search?q=sun*|beach&limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = library.get(url).get_json()
+        assert len(page["media"]) <= 2 and page["total"] == 4
+        seen += [m["id"] for m in page["media"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    newest_first = [m["id"] for m in library.get("/api/media/search?q=sun*|beach").get_json()["media"]]
+    assert seen == newest_first
+    oldest_first = [m["id"] for m in library.get("/api/media/search?q=sun*|beach&sort=oldest").get_json()["media"]]
+    assert oldest_first == newest_first[::-1]
+    assert library.get("/api/media/search?cursor=bogus").status_code == 400
+
+
+def test_searches_are_per_owner(library, register, upload):
+    stranger, _ = register()
+    upload(stranger, os.urandom(64), "sunflower.png", "trip")
+    assert found(stranger, "q=sun*") == ["sunflower.png"]
+    assert "sunflower.png" not in found(library, "q=sun*")
+
+
+# ---------- two workers sharing one backend ----------
+class CountingMedia:
+    """The media store, counting full-library listings."""
+
+    def __init__(self, store):
+        self.store = store
+        self.listings = 0
+
+    def list_owner(self, email, limit=None):
+        self.listings += 1
+        return self.store.list_owner(email, limit)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+class Worker:
+    def __init__(self, storage):
+        self.storage = storage
+        self.media = CountingMedia(storage.media)
+        versions = storage.versions
+        self.index = SearchIndex(
+            self.media,
+            lambda email: versions.get(email).get("media", 0),
+            lambda email, wanted: versions.changes(email, "media", wanted),
+        )
+
+    def changed(self, email, media_ids):
+        self.index.seen(email, self.storage.versions.bump(email, "media", media_ids))
+
+    def upload(self, email, filename, tags=()):
+        media = {
+            "id": str(uuid.uuid4()), "email": email, "filename": filename, "stored_name": "x",
+            "type": filename.rsplit(".", 1)[1], "size_kb": 1, "uploaded_at": "2024-05-01 10:00:00",
+            "status": "Processing", "tags": list(tags),
+        }
+        self.storage.media.add(media)
+        self.index.add(media)
+        self.changed(email, [media["id"]])
+        return media
+
+    def names(self, email, q=""):
+        return sorted(m["filename"] for m in self.index.search(email, q)[0])
+
+
+@pytest.fixture
+def workers(backend):
+    storage = create_storage(backend[0])
+    return Worker(storage), Worker(storage)
+
+
+def test_other_workers_writes_are_applied_without_a_reload(workers):
+    one, two = workers
+    email = "a@example.com"
+    one.upload(email, "first.png")
+    assert two.names(email) == ["first.png"]
+    assert two.media.listings == 1
+
+    second = one.upload(email, "second.png")
+    one.storage.media.set_tags_many({second["id"]: ["kept"]})
+    one.changed(email, [second["id"]])
+    first = one.index.search(email, "first")[0][0]
+    one.storage.media.delete_many([first["id"]])
+    one.changed(email, [first["id"]])
+
+    assert two.names(email) == ["second.png"]
+    assert two.names(email, "kept") == ["second.png"]
+    assert two.media.listings == 1
+    assert two.index.stats()["catch_ups"] == 1
+    assert two.index.stats()["caught_up_media"] == 2
+
+    # its own writes keep its index current without asking the log
+    two.upload(email, "third.png")
+    assert two.names(email) == ["second.png", "third.png"]
+    assert two.index.stats()["catch_ups"] == 1
+
+
+def test_unknown_changes_fall_back_to_a_reload(workers):
+    one, two = workers
+    email = "b@example.com"
+    one.upload(email, "first.png")
+    assert two.names(email) == ["first.png"]
+
+    # a bump without ids
+    one.storage.versions.bump(email, "media")
+    assert two.names(email) == ["first.png"]
+    assert two.media.listings == 2
+
+    # further behind than the change log reaches
+    for i in range(one.storage.versions.CHANGE_LOG + 1):
+        one.upload(email, f"bulk{i}.png")
+    assert len(two.names(email)) == one.storage.versions.CHANGE_LOG + 2
+    assert two.media.listings == 3
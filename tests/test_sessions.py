@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from flask import Flask, session
+
+from sessions import ServerSessionInterface
+from storage.memory import Sessions
+
+
+def test_unchanged_requests_write_nothing(app, register):
+    client, _ = register()
+    client.get("/api/me")
+    before = app.session_interface.stats()
+
+    for _ in range(5):
+        res = client.get("/api/me")
+        assert res.status_code == 200
+        assert "Set-Cookie" not in res.headers
+    after = app.session_interface.stats()
+
+    for count in ("created", "saved", "touched", "deleted"):
+        assert after[count] == before[count], count
+    assert after["loaded"] == before["loaded"] + 5
+    assert after["generation_reads"] == before["generation_reads"]  # served from this worker's copy
+
+
+def test_anonymous_requests_get_no_session(app):
+    res = app.test_client().get("/api/media")
+    assert "Set-Cookie" not in res.headers
+
+
+class Worker:
+    """A minimal app on its own ServerSessionInterface: one Gunicorn worker."""
+
+    def __init__(self, store, generations, generation_ttl):
+        self.generations = generations
+        generation = lambda email: generations.get(email, 0)  # noqa: E731
+        self.interface = ServerSessionInterface(store, generation, generation_ttl=generation_ttl)
+        app = Flask(__name__)
+        app.session_interface = self.interface
+
+        @app.post("/login")
+        def login():
+            session["user_email"] = "a@example.com"
+            return "ok"
+
+        @app.get("/me")
+        def me():
+            return session.get("user_email") or ("", 401)
+
+        @app.post("/logout-everywhere")
+        def logout_everywhere():
+            generations["a@example.com"] = generations.get("a@example.com", 0) + 1
+            self.interface.forget("a@example.com")
+            session.clear()
+            return "ok"
+
+        self.app = app
+
+    def client(self, cookie=None):
+        client = self.app.test_client()
+        if cookie:
+            client.set_cookie("session", cookie)
+        return client
+
+
+@pytest.fixture
+def workers():
+    store, generations = Sessions(), {}
+    return [Worker(store, generations, generation_ttl=0.3) for _ in range(2)]
+
+
+def login(worker):
+    client = worker.client()
+    client.post("/login")
+    return client, client.get_cookie("session").value
+
+
+def test_end_sessions_applies_at_once_on_its_worker_and_within_the_ttl_elsewhere(workers):
+    one, two = workers
+    _, cookie = login(one)
+    on_one, on_two = one.client(cookie), two.client(cookie)
+    assert on_one.get("/me").status_code == 200
+    assert on_two.get("/me").status_code == 200
+
+    other, _ = login(one)
+    assert other.post("/logout-everywhere").status_code == 200
+    assert on_one.get("/me").status_code == 401
+
+    time.sleep(0.35)
+    assert on_two.get("/me").status_code == 401
+    assert two.interface.stats()["revoked"] == 0  # the record was already deleted by worker one
+
+
+def test_login_after_end_sessions_is_not_revoked_by_a_stale_copy(workers):
+    one, two = workers
+    _, cookie = login(one)
+    assert two.client(cookie).get("/me").status_code == 200  # worker two caches generation 0
+
+    one.client(cookie).post("/logout-everywhere")
+    _, fresh = login(one)  # stamped with generation 1
+    assert two.client(fresh).get("/me").status_code == 200
+    assert two.client(fresh).get("/me").status_code == 200
+    assert two.interface.stats()["revoked"] == 0
+
+
+def test_stale_session_is_revoked_once_the_copy_expires(workers):
+    one, two = workers
+    _, cookie = login(one)
+    assert two.client(cookie).get("/me").status_code == 200
+
+    # bumped by some third worker: neither of these forgot their copy
+    one.generations["a@example.com"] = 1
+    assert two.client(cookie).get("/me").status_code == 200
+    time.sleep(0.35)
+    assert two.client(cookie).get("/me").status_code == 401
+    assert two.interface.stats()["revoked"] == 1
@@ -0,0 +1,61 @@
+import io
+import os
+
+import app as snapstream
+from chunked_upload import StreamingRequest
+
+
+def test_chunked_upload_resumes_and_completes(client, settled):
+    body = os.urandom(3000)  # 3 chunks of 1024 bytes (UPLOAD_CHUNK_SIZE in conftest)
+    res = client.post("/api/upload/init", json={"filename": "clip.png", "size": len(body), "custom_tags": "a,b"})
+    assert res.status_code == 201
+    upload = res.get_json()
+    upload_id, size = upload["upload_id"], upload["chunk_size"]
+    assert upload["total_chunks"] == 3
+
+    def put(index):
+        chunk = body[index * size:(index + 1) * size]
+        return client.put(f"/api/upload/{upload_id}/chunks/{index}", data=chunk)
+
+    assert put(2).status_code == 200
+    assert put(0).status_code == 200
+    status = client.get(f"/api/upload/{upload_id}").get_json()
+    assert status["received"] == [0, 2]
+    assert status["missing"] == [1]
+    assert client.post(f"/api/upload/{upload_id}/complete").status_code == 409  # chunk 1 missing
+
+    assert put(1).status_code == 200
+    res = client.post(f"/api/upload/{upload_id}/complete")
+    assert res.status_code == 201
+    media = res.get_json()["media"]
+    assert media["tags"] == ["a", "b"]
+    assert client.get(f"/api/upload/{upload_id}").status_code == 404
+
+    with open(snapstream.blob_store.local_path(media["stored_name"]), "rb") as f:
+        assert f.read() == body
+    assert settled(client, media["id"])["status"] == "Completed"
+
+
+def test_chunked_upload_is_private_to_its_owner(client, register):
+    res = client.post("/api/upload/init", json={"filename": "x.png", "size": 10})
+    upload_id = res.get_json()["upload_id"]
+    stranger, _ = register()
+    assert stranger.get(f"/api/upload/{upload_id}").status_code == 404
+    assert stranger.put(f"/api/upload/{upload_id}/chunks/0", data=b"0123456789").status_code == 404
+
+
+def test_failed_upload_leaves_no_copy_behind(app, client, upload, monkeypatch):
+    # without the spooling request class the view falls back to file.save() into INCOMING_FOLDER
+    monkeypatch.setattr(StreamingRequest, "incoming_dir", None)
+    incoming = snapstream.INCOMING_FOLDER
+
+    upload(client, os.urandom(256), "kept.png")
+    assert os.listdir(incoming) == []
+
+    def unavailable(*args, **kwargs):
+        raise OSError("object store unavailable")
+
+    monkeypatch.setattr(snapstream.blob_store, "put_file", unavailable)
+    res = client.post("/api/upload", data={"file": (io.BytesIO(os.urandom(256)), "lost.png")})
+    assert res.status_code == 500
+    assert os.listdir(incoming) == []
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from storage.cache import CachedUserStore
+from storage.memory import UserStore
+
+
+class SlowUsers(UserStore):
+    """Memory store whose reads take ``delay`` seconds and are counted."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.reads = 0
+
+    def get(self, email, consistent=False):
+        self.reads += 1
+        user = super().get(email, consistent)
+        user = dict(user) if user else None  # a copy, like a real backend
+        time.sleep(self.delay)  # the value was read at the start
+        return user
+
+
+def user(email, password="secret1"):
+    return {"email": email, "username": "u", "password": password}
+
+
+def in_threads(n, fn):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_hits_and_negative_entries():
+    inner = SlowUsers()
+    inner.add(user("a@x"))
+    cache = CachedUserStore(inner, ttl=60, negative_ttl=60)
+
+    assert cache.get("a@x")["username"] == "u"
+    assert cache.get("a@x")["username"] == "u"
+    assert cache.get("nobody@x") is None
+    assert cache.get("nobody@x") is None
+    assert inner.reads == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_entries_expire():
+    inner = SlowUsers()
+    cache = CachedUserStore(inner, ttl=60, negative_ttl=0.05)
+    assert cache.get("late@x") is None
+    inner.add(user("late@x"))
+    assert cache.get("late@x") is None  # negative entry still fresh
+    time.sleep(0.1)
+    assert cache.get("late@x") is not None
+
+
+def test_concurrent_misses_share_one_read():
+    inner = SlowUsers(delay=0.2)
+    inner.add(user("a@x"))
+    cache = CachedUserStore(inner)
+
+    results = in_threads(20, lambda: cache.get("a@x"))
+    assert all(r["email"] == "a@x" for r in results)
+    assert inner.reads == 1
+    assert cache.stats()["coalesced"] == 19
+
+
+def test_concurrent_consistent_reads_share_at_most_two_reads():
+    inner = SlowUsers(delay=0.2)
+    inner.add(user("a@x"))
+    cache = CachedUserStore(inner)
+
+    results = in_threads(20, lambda: cache.get("a@x", consistent=True))
+    assert all(r["email"] == "a@x" for r in results)
+    assert inner.reads <= 2
+    assert cache.get("a@x") is not None and inner.reads <= 2  # refreshed the entry
+
+
+def test_consistent_read_sees_a_write_made_after_a_read_started():
+    inner = SlowUsers(delay=0.3)
+    inner.add(user("a@x", "old"))
+    cache = CachedUserStore(inner)
+
+    first = []
+    reader = threading.Thread(target=lambda: first.append(cache.get("a@x", consistent=True)))
+    reader.start()
+    time.sleep(0.1)  # the first read is running and has seen "old"
+    inner.update("a@x", password="new")  # e.g. another worker
+    assert cache.get("a@x", consistent=True)["password"] == "new"
+    reader.join()
+    assert first[0]["password"] == "old"
+
+
+def test_writes_invalidate_the_entry():
+    inner = SlowUsers()
+    cache = CachedUserStore(inner, ttl=60, negative_ttl=60)
+    assert cache.get("a@x") is None
+
+    cache.add(user("a@x"))
+    assert cache.get("a@x")["password"] == "secret1"
+    cache.update("a@x", password="changed")
+    assert cache.get("a@x")["password"] == "changed"
+    cache.delete("a@x")
+    assert cache.get("a@x") is None
+
+
+def test_write_during_a_consistent_read_is_not_cached_over():
+    inner = SlowUsers(delay=0.2)
+    inner.add(user("a@x", "old"))
+    cache = CachedUserStore(inner, ttl=60)
+
+    reader = threading.Thread(target=lambda: cache.get("a@x", consistent=True))
+    reader.start()
+    time.sleep(0.05)
+    cache.update("a@x", password="new")
+    reader.join()
+    assert cache.get("a@x")["password"] == "new"